@@ -0,0 +1,153 @@
+import threading
+import time
+from collections import deque
+
+# What happens when a bind fires while another action is queued or running
+POLICY_QUEUE = "queue"                  # FIFO until the queue is full
+POLICY_DROP_IF_BUSY = "drop_if_busy"    # ignore the new action unless idle
+POLICY_COALESCE = "coalesce"            # ignore it if the same bind is already waiting
+POLICY_PREEMPT = "preempt"              # discard pending work and cancel the running action
+
+EXECUTOR_POLICIES = [
+    POLICY_QUEUE,
+    POLICY_DROP_IF_BUSY,
+    POLICY_COALESCE,
+    POLICY_PREEMPT
+]
+
+
+class ActionExecutor:
+    # Runs actions on a dedicated thread so the pynput listener callback only
+    # has to enqueue and return.
+
+    def __init__(self, policy=POLICY_COALESCE, max_queue=16):
+        if policy not in EXECUTOR_POLICIES:
+            print(f"Unknown executor policy '{policy}', using '{POLICY_COALESCE}'")
+            policy = POLICY_COALESCE
+        self.policy = policy
+        self.max_queue = max(1, int(max_queue))
+
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._pending = {}  # bind key -> number of queued entries
+        self._busy = False
+        self._stopped = False
+        self._thread = None
+
+        # Set to interrupt the running action's waits (see wait())
+        self.cancel_event = threading.Event()
+
+        self.submitted = 0
+        self.executed = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.preempted = 0
+        self.failed = 0
+        self.max_depth = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="ActionExecutor", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        with self._cond:
+            self._stopped = True
+            self._queue.clear()
+            self._pending.clear()
+            self.cancel_event.set()
+            self._cond.notify_all()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def submit(self, key, func, *args):
+        # Returns True if the action was queued
+        now = time.perf_counter()
+        with self._cond:
+            if self._stopped:
+                return False
+            self.submitted += 1
+
+            if self.policy == POLICY_DROP_IF_BUSY and (self._busy or self._queue):
+                self.dropped += 1
+                return False
+
+            if self.policy == POLICY_COALESCE and key in self._pending:
+                self.coalesced += 1
+                return False
+
+            if self.policy == POLICY_PREEMPT:
+                if self._queue:
+                    self.preempted += len(self._queue)
+                    self._queue.clear()
+                    self._pending.clear()
+                if self._busy:
+                    self.preempted += 1
+                    self.cancel_event.set()
+
+            if len(self._queue) >= self.max_queue:
+                self.dropped += 1
+                return False
+
+            self._queue.append((key, func, args, now))
+            self._pending[key] = self._pending.get(key, 0) + 1
+            if len(self._queue) > self.max_depth:
+                self.max_depth = len(self._queue)
+            self._cond.notify()
+        return True
+
+    def wait(self, seconds):
+        # Sleep used inside actions. Returns True early if the action was preempted.
+        if seconds <= 0:
+            return self.cancel_event.is_set()
+        return self.cancel_event.wait(seconds)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                key, func, args, queued_at = self._queue.popleft()
+                count = self._pending.get(key, 0) - 1
+                if count > 0:
+                    self._pending[key] = count
+                else:
+                    self._pending.pop(key, None)
+                self._busy = True
+                self.cancel_event.clear()
+
+                waited = time.perf_counter() - queued_at
+                self.total_wait += waited
+                if waited > self.max_wait:
+                    self.max_wait = waited
+
+            try:
+                func(*args)
+            except Exception as e:
+                self.failed += 1
+                print(f"Action failed: {e}")
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self.executed += 1
+
+    def stats(self):
+        with self._cond:
+            started = self.executed + (1 if self._busy else 0)
+            return {
+                "policy": self.policy,
+                "busy": self._busy,
+                "depth": len(self._queue),
+                "max_depth": self.max_depth,
+                "submitted": self.submitted,
+                "executed": self.executed,
+                "dropped": self.dropped,
+                "coalesced": self.coalesced,
+                "preempted": self.preempted,
+                "failed": self.failed,
+                "avg_wait_ms": (self.total_wait / started * 1000.0) if started else 0.0,
+                "max_wait_ms": self.max_wait * 1000.0,
+            }
@@ -0,0 +1,33 @@
+# Action types and their defaults, shared by the engine, the window and the
+# bind list. Plain constants with no imports, so anything can use them
+# without pulling in the engine.
+
+# Action Types Constant
+ACTION_CLICK_RETURN = "Click & Return"
+ACTION_CLICK_STAY = "Click & Stay"
+ACTION_DOUBLE_CLICK_RETURN = "Double Click & Return"
+ACTION_DRAG_RETURN = "Drag & Return"
+ACTION_MACRO = "Macro"
+ACTION_FIND_IMAGE = "Find Image & Click"
+
+ACTION_TYPES = [
+    ACTION_CLICK_RETURN,
+    ACTION_CLICK_STAY,
+    ACTION_DOUBLE_CLICK_RETURN,
+    ACTION_DRAG_RETURN,
+    ACTION_MACRO,
+    ACTION_FIND_IMAGE
+]
+
+# Binds that carry their own target instead of a captured location
+LOCATIONLESS_ACTIONS = (ACTION_MACRO, ACTION_FIND_IMAGE)
+
+# Seconds between the steps of each action (e.g. click -> return, press -> release).
+# Overridable per action type through "action_delays" in settings.json.
+DEFAULT_ACTION_DELAYS = {
+    ACTION_CLICK_RETURN: 0.0,
+    ACTION_CLICK_STAY: 0.0,
+    ACTION_DOUBLE_CLICK_RETURN: 0.0,
+    ACTION_DRAG_RETURN: 0.1,
+    ACTION_FIND_IMAGE: 0.0
+}
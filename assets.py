@@ -0,0 +1,37 @@
+import os
+import sys
+import threading
+
+# Icon shared by the window and the tray. PIL is imported and icon.ico decoded
+# on first use only, and just once even though both ask for it.
+
+_lock = threading.Lock()
+_icon = None
+
+
+def icon_path():
+    if getattr(sys, 'frozen', False):
+        return os.path.join(sys._MEIPASS, 'icon.ico')
+    return 'icon.ico'
+
+
+def load_icon():
+    # Returns the decoded PIL image, or None if there is no icon file
+    global _icon
+    with _lock:
+        if _icon is None:
+            path = icon_path()
+            if os.path.exists(path):
+                from PIL import Image
+                image = Image.open(path)
+                image.load()
+                _icon = image
+        return _icon
+
+
+def tray_image():
+    icon = load_icon()
+    if icon is not None:
+        return icon
+    from PIL import Image
+    return Image.new('RGB', (64, 64), color='red')
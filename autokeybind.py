@@ -1,46 +1,49 @@
-import pyautogui
 from pynput.keyboard import Listener, Key, KeyCode
-from pynput.mouse import Listener as MouseListener, Button as MouseButton, Controller as MouseController
+from pynput.mouse import Listener as MouseListener
 import tkinter as tk
-from tkinter import Entry, Listbox, messagebox, simpledialog, ttk
+from tkinter import Entry, Listbox, filedialog, messagebox, simpledialog, ttk
 import tkinter as tk
 from tkinter.ttk import Button, Label, Frame, Style
 import threading
-import pystray
-from PIL import Image, ImageTk
+import functools
 import os
 import sys
 import json
 import time
-from key_utils import get_key_name, get_key_combo_string
-
-# Action Types Constant
-ACTION_CLICK_RETURN = "Click & Return"
-ACTION_CLICK_STAY = "Click & Stay"
-ACTION_DOUBLE_CLICK_RETURN = "Double Click & Return"
-ACTION_DRAG_RETURN = "Drag & Return"
-
-ACTION_TYPES = [
-    ACTION_CLICK_RETURN,
-    ACTION_CLICK_STAY,
-    ACTION_DOUBLE_CLICK_RETURN,
-    ACTION_DRAG_RETURN
-]
-
-
-
+from key_utils import get_key_name, get_key_combo_string, SEQUENCE_SEPARATOR
+from settings import load_settings
+from stats_window import StatsWindow
+from binds_window import BindsWindow
+from ui_bus import UIEventBus
+from diagnostics import Diagnostics
+from triggers import TRIGGER_MODES, TRIGGER_PRESS, TRIGGER_REPEAT, TRIGGER_DOUBLE_TAP, TRIGGER_LONG_PRESS, DEFAULT_REPEAT_HZ
+from macro import MacroError, parse_macro_text, format_macro_steps
+from pixel_guard import GuardError, parse_guard_text, format_guards
+from motion import MotionError, MOTION_PROFILES, MOTION_INSTANT, DEFAULT_DURATION_MS, DEFAULT_RATE_HZ, compile_motion
+from profile_layers import LayerError, get_layers, parse_layer_text, rename_layer
+from engine import DispatchEngine
+from actions import (ACTION_CLICK_RETURN, ACTION_CLICK_STAY, ACTION_DOUBLE_CLICK_RETURN, ACTION_DRAG_RETURN,
+                     ACTION_MACRO, ACTION_FIND_IMAGE, ACTION_TYPES, LOCATIONLESS_ACTIONS, DEFAULT_ACTION_DELAYS)
+from assets import load_icon, tray_image
+from control import start_control_server, ControlError
+from window_rules import start_window_watcher
+from capture import CaptureSession, MouseHookStats, CAPTURE_CLICKED, CAPTURE_TIMED_OUT
 
 
 class KeybindEditorDialog(tk.Toplevel):
-    def __init__(self, parent, edit_mode=False, current_key=None, current_data=None):
+    def __init__(self, parent, ui, edit_mode=False, current_key=None, current_data=None):
         super().__init__(parent)
+        self.ui = ui  # UIEventBus the recorder thread posts to
         self.title("Edit Keybind" if edit_mode else "Add Keybind")
-        self.geometry("400x450")
+        self.geometry("400x700")
         self.resizable(False, True)
         self.result = None
         self.edit_mode = edit_mode
         
         self.pressed_keys = set()
+        self.held_keys = set()
+        self.sequence_steps = []  # chords recorded so far in sequence mode
+        self.recording_sequence = False
         self.listener = None
         
         # Main Frame
@@ -55,7 +58,10 @@ class KeybindEditorDialog(tk.Toplevel):
         self.display_lbl.grid(row=1, column=0, columnspan=2, sticky="ew", pady=(0, 10), ipady=10)
         
         self.record_btn = Button(main_frame, text="Record Key", command=self.toggle_recording)
-        self.record_btn.grid(row=2, column=0, columnspan=2, sticky="ew", pady=(0, 20))
+        self.record_btn.grid(row=2, column=0, sticky="ew", pady=(0, 20))
+        # Sequence mode: every chord ends when all its keys are released ("G, 3")
+        self.sequence_var = tk.BooleanVar(value=SEQUENCE_SEPARATOR in (current_key or ""))
+        ttk.Checkbutton(main_frame, text="Sequence", variable=self.sequence_var).grid(row=2, column=1, sticky="w", padx=(10, 0), pady=(0, 20))
         
         # 2. Action Section
         Label(main_frame, text="Action Type:", style="Header.TLabel").grid(row=3, column=0, columnspan=2, sticky="w", pady=(0, 10))
@@ -64,6 +70,7 @@ class KeybindEditorDialog(tk.Toplevel):
         self.action_var = tk.StringVar(value=initial_action)
         self.type_combo = ttk.Combobox(main_frame, textvariable=self.action_var, values=ACTION_TYPES, state="readonly", font=("Segoe UI", 10))
         self.type_combo.grid(row=4, column=0, columnspan=2, sticky="ew", pady=(0, 20))
+        self.action_var.trace_add("write", lambda *args: self.update_macro_visibility())
         
         # 3. Location info
         current_coords = current_data.get('coords') if current_data else None
@@ -75,6 +82,75 @@ class KeybindEditorDialog(tk.Toplevel):
         if edit_mode:
             ttk.Checkbutton(main_frame, text="Update/Reset Location (Click on Save)", variable=self.update_loc_var).grid(row=6, column=0, columnspan=2, sticky="w", pady=(0, 10))
 
+        # 5. Macro steps (Only for Macro action), one per line
+        self.macro_frame = Frame(main_frame)
+        self.macro_frame.grid(row=7, column=0, columnspan=2, sticky="nsew")
+        main_frame.rowconfigure(7, weight=1)
+        main_frame.columnconfigure(0, weight=1)
+        Label(self.macro_frame, text="Macro Steps:", style="Header.TLabel").pack(anchor=tk.W, pady=(0, 5))
+        Label(self.macro_frame, text="click X Y, double_click X Y, move X Y, drag X1 Y1 X2 Y2,\nwait MS, mouse_down, mouse_up, key_down/key_up/key_tap KEY", foreground="#666").pack(anchor=tk.W, pady=(0, 5))
+        self.macro_text = tk.Text(self.macro_frame, height=8, width=40, font=("Consolas", 10))
+        self.macro_text.pack(fill=tk.BOTH, expand=True)
+        if current_data and current_data.get('steps'):
+            self.macro_text.insert("1.0", format_macro_steps(current_data['steps']))
+
+        # 5b. Template image and search area (Only for Find Image & Click), same row as the macro steps
+        image_data = current_data or {}
+        self.image_frame = Frame(main_frame)
+        self.image_frame.grid(row=7, column=0, columnspan=2, sticky="new")
+        Label(self.image_frame, text="Template Image:", style="Header.TLabel").grid(row=0, column=0, columnspan=2, sticky="w", pady=(0, 5))
+        self.image_var = tk.StringVar(value=image_data.get('image', ""))
+        Entry(self.image_frame, textvariable=self.image_var, width=30).grid(row=1, column=0, sticky="ew")
+        Button(self.image_frame, text="Browse...", command=self.browse_image).grid(row=1, column=1, padx=(5, 0))
+        self.image_frame.columnconfigure(0, weight=1)
+        region = image_data.get('region')
+        offset = image_data.get('offset')
+        self.region_var = tk.StringVar(value=" ".join(str(v) for v in region) if region else "")
+        self.threshold_var = tk.StringVar(value=str(image_data.get('threshold', "")))
+        self.offset_var = tk.StringVar(value=" ".join(str(v) for v in offset) if offset else "")
+        for row, (text, var) in enumerate((("Search region X Y W H (empty = whole screen)", self.region_var),
+                                           ("Match threshold 0-1 (empty = default)", self.threshold_var),
+                                           ("Click offset DX DY from the centre", self.offset_var)), 2):
+            Label(self.image_frame, text=text, foreground="#666").grid(row=row * 2, column=0, columnspan=2, sticky="w", pady=(5, 0))
+            Entry(self.image_frame, textvariable=var, width=30).grid(row=row * 2 + 1, column=0, columnspan=2, sticky="ew")
+
+        # 5c. Cursor movement (clicks and drags), same row again
+        motion = (current_data or {}).get('motion')
+        if isinstance(motion, str):
+            motion = {"profile": motion}
+        motion = motion if isinstance(motion, dict) else {}
+        self.motion_frame = Frame(main_frame)
+        self.motion_frame.grid(row=7, column=0, columnspan=2, sticky="new")
+        Label(self.motion_frame, text="Mouse Movement:", style="Header.TLabel").grid(row=0, column=0, columnspan=3, sticky="w", pady=(0, 5))
+        self.motion_var = tk.StringVar(value=motion.get('profile', MOTION_INSTANT))
+        ttk.Combobox(self.motion_frame, textvariable=self.motion_var, values=MOTION_PROFILES, state="readonly", width=10).grid(row=1, column=0, rowspan=2, sticky="w", padx=(0, 10))
+        self.motion_duration_var = tk.StringVar(value=str(motion.get('duration_ms', DEFAULT_DURATION_MS)))
+        self.motion_rate_var = tk.StringVar(value=str(motion.get('rate_hz', DEFAULT_RATE_HZ)))
+        for column, (text, var) in enumerate((("Duration ms", self.motion_duration_var), ("Steps/s", self.motion_rate_var)), 1):
+            Label(self.motion_frame, text=text, foreground="#666").grid(row=1, column=column, sticky="w")
+            Entry(self.motion_frame, textvariable=var, width=8).grid(row=2, column=column, sticky="w", padx=(0, 10))
+        self.update_macro_visibility()
+
+        # 6. Trigger: when the bind fires, with optional rate limit and debounce
+        current_data = current_data or {}
+        trigger_frame = Frame(main_frame)
+        trigger_frame.grid(row=8, column=0, columnspan=2, sticky="ew", pady=(10, 0))
+        Label(trigger_frame, text="Trigger:", style="Header.TLabel").grid(row=0, column=0, sticky="w")
+        self.trigger_var = tk.StringVar(value=current_data.get('trigger', TRIGGER_PRESS))
+        ttk.Combobox(trigger_frame, textvariable=self.trigger_var, values=TRIGGER_MODES, state="readonly", width=10).grid(row=0, column=1, columnspan=3, sticky="w", padx=(10, 0))
+        self.repeat_hz_var = tk.StringVar(value=str(current_data.get('repeat_hz', DEFAULT_REPEAT_HZ)))
+        self.min_interval_var = tk.StringVar(value=str(current_data.get('min_interval_ms', 0)))
+        self.debounce_var = tk.StringVar(value=str(current_data.get('debounce_ms', 0)))
+        # Second press window for double_tap, hold time for long_press; empty = default
+        self.tap_hold_var = tk.StringVar(value=str(current_data.get('hold_ms', current_data.get('tap_ms', ""))))
+        for column, (text, var) in enumerate((("Repeat Hz", self.repeat_hz_var), ("Min ms", self.min_interval_var), ("Debounce ms", self.debounce_var), ("Tap/Hold ms", self.tap_hold_var))):
+            Label(trigger_frame, text=text, foreground="#666").grid(row=1, column=column, sticky="w", pady=(5, 0))
+            Entry(trigger_frame, textvariable=var, width=8).grid(row=2, column=column, sticky="w", padx=(0, 10))
+        # Only fire while these pixels have these colours
+        Label(trigger_frame, text="Only if pixels match: X Y #RRGGBB [TOL]; ...", foreground="#666").grid(row=3, column=0, columnspan=4, sticky="w", pady=(5, 0))
+        self.guards_var = tk.StringVar(value=format_guards(current_data.get('guards')))
+        Entry(trigger_frame, textvariable=self.guards_var, width=40).grid(row=4, column=0, columnspan=4, sticky="ew")
+
         # Bottom Buttons
         btn_frame = Frame(self)
         btn_frame.pack(fill=tk.X, padx=20, pady=20)
@@ -90,6 +166,55 @@ class KeybindEditorDialog(tk.Toplevel):
         # If editing, we just wait. If adding, we wait.
         self.wait_window(self)
 
+    def update_macro_visibility(self):
+        if self.action_var.get() == ACTION_MACRO:
+            self.macro_frame.grid()
+        else:
+            self.macro_frame.grid_remove()
+        if self.action_var.get() == ACTION_FIND_IMAGE:
+            self.image_frame.grid()
+        else:
+            self.image_frame.grid_remove()
+        if self.action_var.get() in LOCATIONLESS_ACTIONS:
+            self.motion_frame.grid_remove()
+        else:
+            self.motion_frame.grid()
+
+    def browse_image(self):
+        path = filedialog.askopenfilename(parent=self, title="Template Image",
+                                          filetypes=[("Images", "*.png *.bmp *.jpg *.jpeg"), ("All files", "*.*")])
+        if path:
+            self.image_var.set(path)
+
+    def parse_image_fields(self):
+        # Returns the image bind fields, or None after warning the user
+        fields = {'image': self.image_var.get().strip()}
+        if not fields['image']:
+            messagebox.showwarning("Invalid Image", "Please choose a template image.", parent=self)
+            return None
+        try:
+            region = [int(v) for v in self.region_var.get().split()]
+            offset = [int(v) for v in self.offset_var.get().split()]
+            threshold = self.threshold_var.get().strip()
+            if region and (len(region) != 4 or region[2] <= 0 or region[3] <= 0):
+                raise ValueError
+            if offset and len(offset) != 2:
+                raise ValueError
+            if threshold:
+                threshold = float(threshold)
+                if not 0 < threshold <= 1:
+                    raise ValueError
+        except ValueError:
+            messagebox.showwarning("Invalid Image", "Region needs X Y W H, offset DX DY and the threshold a number between 0 and 1.", parent=self)
+            return None
+        if region:
+            fields['region'] = region
+        if offset:
+            fields['offset'] = offset
+        if threshold:
+            fields['threshold'] = threshold
+        return fields
+
     def toggle_recording(self):
         if self.listener:
             self.stop_recording()
@@ -98,6 +223,9 @@ class KeybindEditorDialog(tk.Toplevel):
 
     def start_recording(self):
         self.pressed_keys.clear()
+        self.held_keys.clear()
+        self.sequence_steps = []
+        self.recording_sequence = self.sequence_var.get()
         self.key_display_var.set("Press keys...")
         self.record_btn.configure(text="Stop Recording") # Style change handled by theme usually, or we can use state
         
@@ -112,17 +240,26 @@ class KeybindEditorDialog(tk.Toplevel):
         
     def on_press(self, key):
         self.pressed_keys.add(key)
+        self.held_keys.add(key)
         self.update_display()
         
     def on_release(self, key):
-        if key in self.pressed_keys:
-            # Optional: Auto-stop on full release? For now, manual stop is safer for complex combos.
-            pass
+        self.held_keys.discard(key)
+        # Single combos: manual stop is safer for complex combos. Sequences
+        # close a step once the whole chord is released.
+        if self.recording_sequence and not self.held_keys and self.pressed_keys:
+            combo = get_key_combo_string(self.pressed_keys)
+            self.pressed_keys.clear()
+            if combo:
+                self.sequence_steps.append(combo)
+            self.update_display()
         
     def update_display(self):
         combo = get_key_combo_string(self.pressed_keys)
+        if self.recording_sequence:
+            combo = SEQUENCE_SEPARATOR.join(self.sequence_steps + ([combo] if combo else []))
         if combo:
-            self.display_lbl.after(0, lambda: self.key_display_var.set(combo))
+            self.ui.post("record_display", self.key_display_var.set, combo)
 
     def on_close(self):
         self.stop_recording()
@@ -141,16 +278,74 @@ class KeybindEditorDialog(tk.Toplevel):
         # The current flow "Set Location & Save" implies re-setting location.
         # Let's assume OK always returns data, and App handles what to do.
         
-        # Return format: (Key, Action, ShouldUpdateLocation)
+        # Return format: (Key, Action, ShouldUpdateLocation, Extra bind fields)
         # For Add mode, ShouldUpdateLocation is implicitly True usually, but we can make it explicit.
         should_update = self.update_loc_var.get() if self.edit_mode else True
+        extra = {}
         
-        self.result = (key, self.action_var.get(), should_update)
+        if self.action_var.get() == ACTION_MACRO:
+            # Macros carry their own coordinates, no location to capture
+            try:
+                extra['steps'] = parse_macro_text(self.macro_text.get("1.0", tk.END))
+            except MacroError as e:
+                messagebox.showwarning("Invalid Macro", str(e), parent=self)
+                return
+            should_update = False
+        elif self.action_var.get() == ACTION_FIND_IMAGE:
+            # The click location is wherever the template is found
+            image_fields = self.parse_image_fields()
+            if image_fields is None:
+                return
+            extra.update(image_fields)
+            should_update = False
+        elif self.motion_var.get() != MOTION_INSTANT:
+            motion = {"profile": self.motion_var.get(), "duration_ms": self.motion_duration_var.get(),
+                      "rate_hz": self.motion_rate_var.get()}
+            try:
+                spec = compile_motion(motion)
+            except MotionError as e:
+                messagebox.showwarning("Invalid Mouse Movement", str(e), parent=self)
+                return
+            extra['motion'] = {"profile": spec.profile, "duration_ms": spec.duration_ms, "rate_hz": spec.rate_hz}
+
+        try:
+            repeat_hz = float(self.repeat_hz_var.get())
+            min_interval = float(self.min_interval_var.get())
+            debounce = float(self.debounce_var.get())
+            tap_hold = float(self.tap_hold_var.get()) if self.tap_hold_var.get().strip() else None
+            if repeat_hz <= 0 or min_interval < 0 or debounce < 0 or (tap_hold is not None and tap_hold <= 0):
+                raise ValueError
+        except ValueError:
+            messagebox.showwarning("Invalid Trigger", "Repeat rate and tap/hold time must be positive and intervals must be zero or more.", parent=self)
+            return
+        try:
+            guards = parse_guard_text(self.guards_var.get())
+        except GuardError as e:
+            messagebox.showwarning("Invalid Pixel Guard", str(e), parent=self)
+            return
+        # Only store what differs from the defaults
+        if guards:
+            extra['guards'] = guards
+        if self.trigger_var.get() != TRIGGER_PRESS:
+            extra['trigger'] = self.trigger_var.get()
+        if self.trigger_var.get() == TRIGGER_REPEAT:
+            extra['repeat_hz'] = repeat_hz
+        if self.trigger_var.get() == TRIGGER_DOUBLE_TAP and tap_hold is not None:
+            extra['tap_ms'] = tap_hold
+        if self.trigger_var.get() == TRIGGER_LONG_PRESS and tap_hold is not None:
+            extra['hold_ms'] = tap_hold
+        if min_interval:
+            extra['min_interval_ms'] = min_interval
+        if debounce:
+            extra['debounce_ms'] = debounce
+        
+        self.result = (key, self.action_var.get(), should_update, extra)
         self.destroy()
 
 class KeybindApp:
-    def __init__(self, root):
+    def __init__(self, root, startup_timer=None):
         self.root = root
+        self.startup_timer = startup_timer
         self.root.title("XvG Auto Keybind")
         self.root.wm_attributes("-topmost", 1)
         
@@ -168,62 +363,112 @@ class KeybindApp:
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
         # Application State
-        self.profiles = {}
         self.coords = []
-        self.active_profile = None
         self.add_keybind_mode = False
         self.pending_action_type = None
+        self.pending_extra = {}
+        self.pending_profile = None  # where the captured bind is saved (a layer when edited from one)
         self.mini_mode = False
         self.normal_geometry = "300x550"
-        
-        self.current_pressed_keys = set()
-        
-        # Mouse Controller for advanced actions
-        self.mouse = MouseController()
+        self.stats_window = None
+        self.tray_icon = None
+        self.closing = False
+        
+        # Location capture; the mouse is only hooked while one is in progress
+        self.capture = None
+        self.mouse_hook_stats = MouseHookStats()
+        
+        # Hotkeys are armed right after the main window is built, before any
+        # tray or icon work; pystray and PIL are only imported once the
+        # window is up (see finish_startup)
+        self.engine = DispatchEngine(load_settings())
+        self.settings = self.engine.settings
+        # Everything other threads want from the window goes through here
+        self.ui = UIEventBus(self.root, self.settings['ui_tick_ms'])
+        # CPU profiler and memory snapshots from the tray; idle until used
+        self.diagnostics = Diagnostics(self.settings['diagnostics_dir'], self.settings['profiler_interval_ms'])
+        self.mark_startup("settings + dispatch")
         
         # Load Data
-        self.load_profiles()
+        warnings = self.engine.open_store()
+        self.load_warning = "; ".join(warnings) if warnings else None
+        if self.load_warning:
+            print(self.load_warning)
+        self.engine.load_profiles()
+        self.mark_startup("profiles + bind index")
 
         # Setup UI
         self.setup_ui()
-
-        # Setup System Tray
+        self.mark_startup("window built")
+
+        # Start Input Listeners and the save worker, now that the status bar
+        # their results are posted to exists
+        self.engine.on_saved = self.on_profiles_saved
+        self.engine.start()
+        self.mark_startup("listeners armed")
+        self.ui.start()
+        if self.load_warning:
+            self.update_status(self.load_warning)
+
+        # Optional local control API; its changes are applied on the Tk thread
+        self.control = start_control_server(self.engine, self.run_on_ui_thread, self.on_external_change)
+
+        # Optional profile switching by foreground window, polled off the listener thread
+        self.window_watcher = start_window_watcher(self.settings, lambda profile: self.ui.post("window_rule", self.switch_profile, profile))
+
+        # Icon and System Tray once the window has been drawn
+        self.root.after_idle(self.finish_startup)
+
+    def mark_startup(self, phase):
+        if self.startup_timer is not None:
+            self.startup_timer.mark(phase)
+
+    def finish_startup(self):
+        if self.startup_timer is not None:
+            self.startup_timer.defer("tray")
+            self.startup_timer.defer("window")
+        self.mark_startup("first idle")
         self.setup_tray_icon()
+        self.set_window_icon()
+        self.mark_startup("window icon")
+        if self.startup_timer is not None:
+            self.startup_timer.done("window")
+
+    # Profiles, the active profile and the bind index belong to the engine
+    @property
+    def store(self):
+        return self.engine.store
+
+    @property
+    def profiles(self):
+        return self.engine.profiles
+
+    @property
+    def active_profile(self):
+        return self.engine.active_profile
+
+    @active_profile.setter
+    def active_profile(self, name):
+        self.engine.active_profile = name
+
+    def rebuild_bind_index(self):
+        self.engine.rebuild_bind_index()
+
+    def on_profiles_saved(self, written, elapsed, error):
+        # Persistence worker thread
+        if error is not None:
+            message = f"Save failed: {error}"
+        elif written:
+            message = f"Saved ({elapsed * 1000:.1f} ms)"
+        else:
+            return
+        self.ui.post("save_status", self.show_save_status, message)
 
-        # Start Input Listeners
-        self.start_listeners()
-
-    def load_profiles(self):
-        self.profiles = {}
-        default_profile_name = "Default"
-        
-        if os.path.exists('profiles.json'):
-            try:
-                with open('profiles.json', 'r') as file:
-                    self.profiles = json.load(file)
-            except (FileNotFoundError, json.JSONDecodeError):
-                pass # Handle empty or corrupt file gracefully
-
-        if not self.profiles:
-             self.profiles = {default_profile_name: {'keybinds': {}}}
-        
-        # Ensure active profile is valid
-        if self.active_profile not in self.profiles:
-            if default_profile_name in self.profiles:
-                self.active_profile = default_profile_name
-            else:
-                self.active_profile = list(self.profiles.keys())[0]
-        
-        self.save_profiles() # Ensure consistent state on disk
-
-    def save_profiles(self):
-        with open('profiles.json', 'w') as file:
-            json.dump(self.profiles, file, indent=4)
+    def show_save_status(self, message):
+        # Tk thread
+        self.save_status_var.set(message)
 
     def setup_ui(self):
-        # Icon
-        self.set_window_icon()
-
         # Main Layout Frame
         self.main_frame = Frame(self.root, padding=20)
         self.main_frame.pack(fill=tk.BOTH, expand=True)
@@ -261,7 +506,8 @@ class KeybindApp:
 
         ttk.Button(profile_btn_frame, text="New", width=6, command=self.add_profile_action).pack(side=tk.LEFT, padx=(0, 5))
         ttk.Button(profile_btn_frame, text="Rename", width=8, command=self.rename_profile_action).pack(side=tk.LEFT, padx=(0, 5))
-        ttk.Button(profile_btn_frame, text="Delete", width=8, command=self.remove_profile_action).pack(side=tk.LEFT)
+        ttk.Button(profile_btn_frame, text="Delete", width=8, command=self.remove_profile_action).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(profile_btn_frame, text="Layers", width=7, command=self.set_layers_action).pack(side=tk.LEFT)
         
         # Mini Mode / Reset
         bottom_frame = Frame(self.main_frame)
@@ -270,11 +516,19 @@ class KeybindApp:
         ttk.Button(bottom_frame, text="Toggle Mini Mode", command=self.toggle_mini_mode).pack(side=tk.LEFT)
         ttk.Button(bottom_frame, text="Clear All", command=self.clear_keybinds).pack(side=tk.RIGHT)
 
+        # Mini mode frame, built the first time it is shown
+        self.mini_frame = None
+        self.mini_profile_var = tk.StringVar(value=f"Active: {self.active_profile}")
+
         # Status Bar
         self.status_var = tk.StringVar()
         self.status_var.set(f"Active Profile: {self.active_profile}")
-        self.status_label = Label(self.root, textvariable=self.status_var, relief=tk.SUNKEN, anchor=tk.W)
-        self.status_label.pack(side=tk.BOTTOM, fill=tk.X)
+        self.status_frame = Frame(self.root, relief=tk.SUNKEN)
+        self.status_frame.pack(side=tk.BOTTOM, fill=tk.X)
+        self.save_status_var = tk.StringVar()
+        Label(self.status_frame, textvariable=self.save_status_var, foreground="#666", anchor=tk.E).pack(side=tk.RIGHT)
+        self.status_label = Label(self.status_frame, textvariable=self.status_var, anchor=tk.W)
+        self.status_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
         
     def toggle_mini_mode(self):
         if not self.mini_mode:
@@ -283,33 +537,30 @@ class KeybindApp:
             self.root.geometry("250x100")
             self.main_frame.pack_forget()
             
-            self.mini_frame = Frame(self.root, padding=10)
+            # Built once and then only shown and hidden; its label is kept up to date in place
+            if self.mini_frame is None:
+                self.mini_frame = Frame(self.root, padding=10)
+                ttk.Label(self.mini_frame, textvariable=self.mini_profile_var, font=("Segoe UI", 12, "bold")).pack(pady=(5, 10))
+                ttk.Button(self.mini_frame, text="Expand to Normal View", command=self.toggle_mini_mode).pack(fill=tk.X)
             self.mini_frame.pack(fill=tk.BOTH, expand=True)
             
-            ttk.Label(self.mini_frame, text=f"Active: {self.active_profile}", font=("Segoe UI", 12, "bold")).pack(pady=(5, 10))
-            ttk.Button(self.mini_frame, text="Expand to Normal View", command=self.toggle_mini_mode).pack(fill=tk.X)
-            
-            self.status_label.pack_forget() # Hide status bar in mini mode
+            self.status_frame.pack_forget() # Hide status bar in mini mode
             self.mini_mode = True
         else:
             # Switch to Normal
-            self.mini_frame.destroy()
+            self.mini_frame.pack_forget()
             self.main_frame.pack(fill=tk.BOTH, expand=True)
-            self.status_label.pack(side=tk.BOTTOM, fill=tk.X)
+            self.status_frame.pack(side=tk.BOTTOM, fill=tk.X)
             self.root.geometry(self.normal_geometry)
             self.mini_mode = False
 
     def set_window_icon(self):
         try:
-            if getattr(sys, 'frozen', False):
-                icon_path = os.path.join(sys._MEIPASS, 'icon.ico')
-            else:
-                icon_path = 'icon.ico'
-            
-            if os.path.exists(icon_path):
-                icon = Image.open(icon_path)
-                icon_photo = ImageTk.PhotoImage(icon)
-                self.root.tk.call('wm', 'iconphoto', self.root._w, icon_photo)
+            icon = load_icon()
+            if icon is not None:
+                from PIL import ImageTk
+                self.icon_photo = ImageTk.PhotoImage(icon) # Keep a reference, Tk does not
+                self.root.tk.call('wm', 'iconphoto', self.root._w, self.icon_photo)
         except Exception as e:
             print(f"Failed to load icon: {e}")
 
@@ -321,97 +572,83 @@ class KeybindApp:
                 self.profile_listbox.selection_set(tk.END)
 
     def update_status(self, message):
-         self.status_var.set(message)
+        # Tk thread; other threads post to self.ui
+        if self.status_var.get() != message:
+            self.status_var.set(message)
+
+    def show_active_profile(self, reason=None):
+        # Updates the existing widgets in place after the active profile changed
+        message = f"Active Profile: {self.active_profile}"
+        self.update_status(f"{message} ({reason})" if reason else message)
+        self.mini_profile_var.set(f"Active: {self.active_profile}")
+        if self.active_profile in self.profiles:
+            index = list(self.profiles.keys()).index(self.active_profile)
+            self.profile_listbox.selection_clear(0, tk.END)
+            self.profile_listbox.selection_set(index)
+
+    def switch_profile(self, name):
+        # Window rule matched (Tk thread)
+        if name != self.active_profile and self.engine.activate_profile(name):
+            self.show_active_profile("window rule")
 
     # --- Logic Methods ---
 
     def add_keybind(self):
         # Pass nothing for new bind
-        dialog = KeybindEditorDialog(self.root)
+        dialog = KeybindEditorDialog(self.root, self.ui)
         if dialog.result:
-            key, action_type, should_update_loc = dialog.result
-            self.pending_key = key
-            self.pending_action_type = action_type
-            
-            self.add_keybind_mode = True
-            # Update button to show state
-            self.add_button.config(state=tk.DISABLED, text="Click on Screen...")
-            self.update_status(f"Click anywhere to bind '{key}' ({action_type})...")
-
-    def perform_action(self, x, y, action_type):
-        original_position = pyautogui.position()
-        
-        if action_type == ACTION_CLICK_RETURN:
-            pyautogui.click(x, y)
-            pyautogui.moveTo(original_position)
-            
-        elif action_type == ACTION_CLICK_STAY:
-            pyautogui.click(x, y)
-            # Do not return
-            
-        elif action_type == ACTION_DOUBLE_CLICK_RETURN:
-            pyautogui.doubleClick(x, y)
-            pyautogui.moveTo(original_position)
-            
-        elif action_type == ACTION_DRAG_RETURN:
-            # Move to target, hold down, move back, release
-            pyautogui.moveTo(x, y)
-            pyautogui.mouseDown()
-            time.sleep(0.1) # Small delay for stability
-            pyautogui.moveTo(original_position)
-            pyautogui.mouseUp()
-            
-        else:
-            # Fallback
-            pyautogui.click(x, y)
-            pyautogui.moveTo(original_position)
-
-    def on_key_press(self, key):
-        self.current_pressed_keys.add(key)
-        self.check_and_perform_action()
-
-    def on_key_release(self, key):
-        if key in self.current_pressed_keys:
-            self.current_pressed_keys.remove(key)
-
-    def check_and_perform_action(self):
-        if not self.active_profile:
+            key, action_type, should_update_loc, extra = dialog.result
+            if not should_update_loc:
+                # Macro: nothing to click, save right away
+                self.store.set_bind(self.active_profile, key, dict(extra, type=action_type))
+                self.rebuild_bind_index()
+                self.update_status(f"Bound '{key}' ({action_type})")
+                return
+            self.begin_capture(key, action_type, extra, f"Click anywhere to bind '{key}' ({action_type})...")
+
+    def begin_capture(self, key, action_type, extra, message, profile=None):
+        if self.capture is not None:
+            self.capture.cancel()
+        self.pending_profile = profile or self.active_profile
+        self.pending_key = key
+        self.pending_action_type = action_type
+        self.pending_extra = extra
+        self.add_keybind_mode = True
+
+        synthetic = self.engine.synthetic
+        session = CaptureSession(functools.partial(MouseListener, **synthetic.listener_kwargs("mouse")),
+                                 lambda result, x, y: self.ui.call(self.end_capture, session, result, x, y),
+                                 self.settings['capture_timeout_s'], self.mouse_hook_stats, synthetic.is_own_click)
+        self.capture = session
+        self.engine.escape_handler = session.cancel
+        session.start()
+        # Update button to show state
+        self.add_button.config(state=tk.DISABLED, text="Click on Screen...")
+        self.update_status(message + " (Esc to cancel)")
+
+    def end_capture(self, session, result, x, y):
+        # Main thread, once per session
+        if session is not self.capture:
+            return # Superseded by a newer capture
+        self.capture = None
+        self.engine.escape_handler = None
+        if result == CAPTURE_CLICKED:
+            self.handle_click_main_thread(x, y)
             return
-
-        current_combo_str = get_key_combo_string(self.current_pressed_keys)
-        
-        # Check against binds
-        # We also need to check "Legacy" single keys just in case, but get_key_combo_string should handle single keys too (e.g. "A")
-        
-        binds = self.profiles[self.active_profile]['keybinds']
-        
-        if current_combo_str in binds:
-             self.execute_bind(binds[current_combo_str])
-             return
-        
-        # Fallback for legacy binds (often lowercase)
-        # Note: This might match "a" when "A" is pressed, which is usually desired for simple binds.
-        if current_combo_str.lower() in binds:
-             self.execute_bind(binds[current_combo_str.lower()])
-             return
-             
-        # Fallback check for single keys if combo string includes modifiers but bind is simple?
-        # No, strict matching is better.
-        
-    def execute_bind(self, bind_data):
-        if isinstance(bind_data, list):
-            coords = bind_data
-            action_type = ACTION_CLICK_RETURN
+        key = self.pending_key
+        self.reset_capture()
+        if result == CAPTURE_TIMED_OUT:
+            self.update_status(f"Timed out waiting for a click, '{key}' not bound")
         else:
-            coords = bind_data.get('coords')
-            action_type = bind_data.get('type', ACTION_CLICK_RETURN)
-        
-        if coords and len(coords) == 2:
-            self.perform_action(coords[0], coords[1], action_type)
+            self.update_status(f"Cancelled binding '{key}'")
 
-    def on_click(self, x, y, button, pressed):
-        if pressed and self.add_keybind_mode and self.pending_key:
-             self.root.after(0, lambda: self.handle_click_main_thread(x, y))
+    def reset_capture(self):
+        self.add_keybind_mode = False
+        self.pending_key = None
+        self.pending_action_type = None
+        self.pending_extra = {}
+        self.pending_profile = None
+        self.add_button.config(state=tk.NORMAL, text="Add Keybind")
 
     def handle_click_main_thread(self, x, y):
         # Data Structure: { "coords": [x, y], "type": "Action Name" }
@@ -419,26 +656,17 @@ class KeybindApp:
             "coords": [x, y],
             "type": self.pending_action_type
         }
+        bind_data.update(self.pending_extra)
         
         # Save bind
-        profile_data = self.profiles[self.active_profile]
-        profile_data['keybinds'][self.pending_key] = bind_data
-        self.save_profiles()
+        profile = self.pending_profile or self.active_profile
+        self.store.set_bind(profile, self.pending_key, bind_data)
+        if self.engine.uses_profile(profile):
+            self.rebuild_bind_index()
         
         # Reset UI
-        self.add_keybind_mode = False
-        self.pending_key = None
-        self.pending_action_type = None
-        self.add_button.config(state=tk.NORMAL, text="Add Keybind")
-        self.update_status(f"Bound '{self.active_profile}' to ({x}, {y})")
-
-    # Connect listeners
-    def start_listeners(self):
-        self.keyboard_listener = Listener(on_press=self.on_key_press, on_release=self.on_key_release)
-        self.mouse_listener = MouseListener(on_click=self.on_click)
-        
-        self.keyboard_listener.start()
-        self.mouse_listener.start()
+        self.reset_capture()
+        self.update_status(f"Bound '{profile}' to ({x}, {y})")
 
     # Profile Management methods
     def add_profile_action(self):
@@ -447,8 +675,7 @@ class KeybindApp:
             if name in self.profiles:
                 messagebox.showerror("Error", "Profile already exists.")
                 return
-            self.profiles[name] = {'keybinds': {}}
-            self.save_profiles()
+            self.store.add_profile(name)
             self.refresh_profile_list()
             self.update_status(f"Created profile '{name}'")
 
@@ -460,12 +687,14 @@ class KeybindApp:
                 return
             
             if messagebox.askyesno("Confirm", f"Remove profile '{name}'?"):
-                del self.profiles[name]
+                self.store.remove_profile(name)
                 
                 if self.active_profile == name:
                     self.active_profile = list(self.profiles.keys())[0] # Switch to another
+                    self.rebuild_bind_index()
+                elif self.engine.uses_profile(name):
+                    self.rebuild_bind_index() # Was one of the active layers
                 
-                self.save_profiles()
                 self.refresh_profile_list()
                 self.update_status(f"Removed profile '{name}'")
 
@@ -474,13 +703,36 @@ class KeybindApp:
         if name:
             new_name = simpledialog.askstring("Rename", f"New name for '{name}':")
             if new_name and new_name not in self.profiles:
-                self.profiles[new_name] = self.profiles.pop(name)
+                self.store.rename_profile(name, new_name)
+                for profile, layers in rename_layer(self.profiles, name, new_name).items():
+                    self.store.set_profile_field(profile, 'layers', layers)
                 if self.active_profile == name:
                     self.active_profile = new_name
-                self.save_profiles()
+                if self.engine.uses_profile(name):
+                    self.rebuild_bind_index()
                 self.refresh_profile_list()
                 self.update_status(f"Renamed '{name}' to '{new_name}'")
 
+    def set_layers_action(self):
+        # Profiles the selected one is stacked on, bottom first
+        name = self.get_selected_profile()
+        if not name:
+            return
+        current = ", ".join(get_layers(self.profiles[name]))
+        text = simpledialog.askstring("Layers", f"Profiles under '{name}', bottom first, separated by commas:",
+                                      initialvalue=current)
+        if text is None:
+            return
+        try:
+            layers = parse_layer_text(text, self.profiles, name)
+        except LayerError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.store.set_profile_field(name, 'layers', layers)
+        if self.engine.uses_profile(name):
+            self.rebuild_bind_index()
+        self.update_status(f"'{name}' layers: {', '.join(layers) or 'none'}")
+
     def get_selected_profile(self):
         selection = self.profile_listbox.curselection()
         if selection:
@@ -490,149 +742,201 @@ class KeybindApp:
     def activate_profile(self, event):
         selection = self.get_selected_profile()
         if selection:
-            self.active_profile = selection
-            self.update_status(f"Active Profile: {self.active_profile}")
-            # Update mini mode label if active
-            if self.mini_mode:
-                # Re-render or just update? Simple approach: toggle back and forth or update widget children.
-                # Since I used a hardcoded label in toggle_mini_mode, I should probably store it.
-                # Or just lazy refresh:
-                self.toggle_mini_mode() # To Normal
-                self.toggle_mini_mode() # Back to Mini (updates label)
+            self.engine.activate_profile(selection)
+            self.show_active_profile()
 
     def clear_keybinds(self):
         if messagebox.askyesno("Confirm", f"Clear all keybinds in '{self.active_profile}'?"):
-            self.profiles[self.active_profile]['keybinds'].clear()
-            self.save_profiles()
+            self.store.clear_binds(self.active_profile)
+            self.rebuild_bind_index()
             self.update_status("Keybinds cleared.")
 
     def show_keybinds(self):
-        win = tk.Toplevel(self.root)
-        win.title(f"Keybinds: {self.active_profile}")
-        win.geometry("600x400")
-        
-        # Frame for Treeview and Scrollbar
-        list_frame = Frame(win, padding=10)
-        list_frame.pack(fill=tk.BOTH, expand=True)
-
-        columns = ("key", "action", "coords")
-        tree = ttk.Treeview(list_frame, columns=columns, show="headings", selectmode="browse")
-        
-        tree.heading("key", text="Key Combination")
-        tree.heading("action", text="Action Type")
-        tree.heading("coords", text="Coordinates")
-        
-        tree.column("key", width=150)
-        tree.column("action", width=150)
-        tree.column("coords", width=150)
-        
-        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=tree.yview)
-        tree.configure(yscroll=scrollbar.set)
-        
-        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        # The effective binds of the whole layer stack; each is edited in the
+        # profile it comes from, so shared binds change everywhere at once
+        win = BindsWindow(self.root, f"Keybinds: {' > '.join(self.engine.active_stack)}", self.engine.effective_binds,
+                          lambda key: self.edit_listed_bind(win, key),
+                          lambda key: self.delete_listed_bind(win, key),
+                          self.engine.bind_sources)
+
+    def refresh_listed_bind(self, win, key):
+        # After key changed in some layer: show what is in effect for it now
+        if key in self.engine.effective_binds:
+            win.update_bind(key, self.engine.effective_binds[key], layer=self.engine.bind_sources[key])
+        else:
+            win.remove_bind(key)
 
-        def populate_tree():
-            for item in tree.get_children():
-                tree.delete(item)
-                
-            current_binds = self.profiles[self.active_profile]['keybinds']
-            for key, val in current_binds.items():
-                if isinstance(val, list):
-                    action = "Legacy (Click & Return)"
-                    coords = str(val)
-                else:
-                    action = val.get('type')
-                    coords = str(val.get('coords'))
-                
-                tree.insert("", tk.END, iid=key, values=(key, action, coords))
+    def edit_listed_bind(self, win, key):
+        # Get current data
+        profile = self.engine.bind_sources.get(key, self.active_profile)
+        binds = self.profiles[profile]['keybinds']
+        if key not in binds: return # Should not happen
 
-        populate_tree()
+        current_data = binds[key]
+        # Normalize data if legacy
+        if isinstance(current_data, list):
+             current_data = {"coords": current_data, "type": ACTION_CLICK_RETURN}
 
-        # Action Buttons
-        btn_frame = Frame(win, padding=10)
-        btn_frame.pack(fill=tk.X)
+        # Open Dialog in Edit Mode
+        dialog = KeybindEditorDialog(win, self.ui, edit_mode=True, current_key=key, current_data=current_data)
 
-        def on_edit():
-            selected = tree.selection()
-            if not selected: return
-            key = selected[0]
-            
-            # Get current data
-            binds = self.profiles[self.active_profile]['keybinds']
-            if key not in binds: return # Should not happen
-            
-            current_data = binds[key]
-            # Normalize data if legacy
-            if isinstance(current_data, list):
-                 current_data = {"coords": current_data, "type": ACTION_CLICK_RETURN}
-            
-            # Open Dialog in Edit Mode
-            dialog = KeybindEditorDialog(win, edit_mode=True, current_key=key, current_data=current_data)
-            
-            if dialog.result:
-                new_key, new_action, should_update_loc = dialog.result
-                
-                # If key changed, we need to remove old entry
-                if new_key != key:
-                    del self.profiles[self.active_profile]['keybinds'][key]
-                
-                # Decide next steps
-                if should_update_loc:
-                     # Enter "Click to Set" mode
-                     self.pending_key = new_key
-                     self.pending_action_type = new_action
-                     self.add_keybind_mode = True
-                     self.add_button.config(state=tk.DISABLED, text="Click on Screen...")
-                     self.update_status(f"Click anywhere to update '{new_key}'...")
-                     # Close this window so they can click
-                     win.destroy() 
-                else:
-                    # Just update data in place
-                    new_data = {
-                        "coords": current_data['coords'], # Keep existing coords
-                        "type": new_action
-                    }
-                    self.profiles[self.active_profile]['keybinds'][new_key] = new_data
-                    self.save_profiles()
-                    populate_tree()
-
-        def on_delete():
-            selected = tree.selection()
-            if not selected: return
-            key = selected[0]
-            if messagebox.askyesno("Confirm", f"Delete bind for '{key}'?", parent=win):
-                 del self.profiles[self.active_profile]['keybinds'][key]
-                 self.save_profiles()
-                 populate_tree()
-
-        ttk.Button(btn_frame, text="Edit Selected", command=on_edit).pack(side=tk.LEFT, padx=5)
-        ttk.Button(btn_frame, text="Delete Selected", command=on_delete).pack(side=tk.LEFT, padx=5)
-        ttk.Button(btn_frame, text="Close", command=win.destroy).pack(side=tk.RIGHT)
-
-        tree.bind("<Double-1>", lambda e: on_edit())
+        if dialog.result:
+            new_key, new_action, should_update_loc, extra = dialog.result
+            if new_action not in LOCATIONLESS_ACTIONS and not current_data.get('coords'):
+                should_update_loc = True # e.g. a macro turned into a click, needs a location
+
+            # If key changed, we need to remove old entry
+            if new_key != key:
+                self.store.delete_bind(profile, key)
+                self.rebuild_bind_index()
+                self.refresh_listed_bind(win, key)  # May uncover the same key from a lower layer
+
+            # Decide next steps
+            if should_update_loc:
+                 # Enter "Click to Set" mode
+                 self.begin_capture(new_key, new_action, extra, f"Click anywhere to update '{new_key}'...", profile)
+                 # Close this window so they can click
+                 win.destroy()
+                 return
+            elif new_action in LOCATIONLESS_ACTIONS:
+                new_data = dict(extra, type=new_action)
+            else:
+                # Just update data in place
+                new_data = {
+                    "coords": current_data['coords'], # Keep existing coords
+                    "type": new_action
+                }
+                new_data.update(extra)
+            self.store.set_bind(profile, new_key, new_data)
+            self.rebuild_bind_index()
+            self.refresh_listed_bind(win, new_key)
+
+    def delete_listed_bind(self, win, key):
+        profile = self.engine.bind_sources.get(key, self.active_profile)
+        if messagebox.askyesno("Confirm", f"Delete bind for '{key}' from '{profile}'?", parent=win):
+             self.store.delete_bind(profile, key)
+             self.rebuild_bind_index()
+             self.refresh_listed_bind(win, key)
+
+    def show_stats(self):
+        if self.stats_window and self.stats_window.winfo_exists():
+            self.stats_window.lift()
+            return
+        self.stats_window = StatsWindow(self.root, self.engine.latency, self.get_pipeline_counters)
+
+    def get_pipeline_counters(self):
+        counters = self.engine.stats()
+        counters["Mouse Hook"] = self.mouse_hook_stats.summary()
+        counters["UI Bus"] = self.ui.stats()
+        if self.window_watcher is not None:
+            counters["Window Rules"] = self.window_watcher.stats()
+        return counters
+
+    def run_on_ui_thread(self, fn, timeout=5.0):
+        # Control server threads: run fn on the Tk thread and wait for its result
+        done = threading.Event()
+        outcome = []
+
+        def call():
+            try:
+                outcome.append((True, fn()))
+            except Exception as e:
+                outcome.append((False, e))
+            finally:
+                done.set()
+
+        self.ui.call(call)
+        if not done.wait(timeout):
+            raise ControlError("window did not respond")
+        ok, value = outcome[0]
+        if not ok:
+            raise value
+        return value
+
+    def on_external_change(self):
+        # Profiles or binds changed through the control socket (Tk thread)
+        self.refresh_profile_list()
+        self.show_active_profile("control socket")
 
     def on_close(self):
-        self.keyboard_listener.stop()
-        self.mouse_listener.stop()
-        self.tray_icon.stop()
+        if self.control is not None:
+            self.control.stop()
+        if self.window_watcher is not None:
+            self.window_watcher.stop()
+        if self.capture is not None:
+            self.capture.cancel()
+        self.engine.stop() # Writes anything still pending
+        self.diagnostics.stop() # Writes a running profile
+        self.ui.stop()
+        self.closing = True
+        if self.tray_icon is not None:
+            self.tray_icon.stop()
         self.root.destroy()
         sys.exit(0)
 
+    # Diagnostics (tray thread)
+    def toggle_profiler(self):
+        if self.diagnostics.profiling:
+            try:
+                path = self.diagnostics.stop_profiler()
+            except OSError as e:
+                self.ui.post("diagnostics", self.update_status, f"Profile not written: {e}")
+                return
+            self.ui.post("diagnostics", self.update_status, f"CPU profile written to {path}")
+        else:
+            self.diagnostics.start_profiler()
+            self.ui.post("diagnostics", self.update_status, "CPU profiler running (tray menu to stop)")
+
+    def take_memory_snapshot(self):
+        state = {
+            "keys held (KeyState tokens)": len(self.engine.key_state.tokens),
+            "latency samples": len(self.engine.latency.samples()),
+            "executor queue": self.engine.executor.stats()["depth"],
+            "UI bus pending": self.ui.stats()["pending"],
+        }
+        try:
+            path = self.diagnostics.memory_snapshot(state)
+        except OSError as e:
+            self.ui.post("diagnostics", self.update_status, f"Snapshot not written: {e}")
+            return
+        if path is None:
+            self.ui.post("diagnostics", self.update_status, "Memory tracking on; take another snapshot to see growth")
+        else:
+            self.ui.post("diagnostics", self.update_status, f"Memory snapshot written to {path}")
+
+    def stop_memory_tracking(self):
+        self.diagnostics.stop_memory()
+        self.ui.post("diagnostics", self.update_status, "Memory tracking off")
+
     # System Tray
     def setup_tray_icon(self):
-        if getattr(sys, 'frozen', False):
-            icon_path = os.path.join(sys._MEIPASS, 'icon.ico')
-        else:
-            icon_path = 'icon.ico'
-        
-        image = Image.open(icon_path) if os.path.exists(icon_path) else Image.new('RGB', (64, 64), color='red')
-        
-        menu = (pystray.MenuItem('Exit', lambda: self.root.after(0, self.on_close)),)
-        self.tray_icon = pystray.Icon("AutoKeybind", image, "XvG AutoKeybind", menu)
-        
-        # Run in separate thread so it doesn't block TK
-        threading.Thread(target=self.tray_icon.run, daemon=True).start()
+        # Importing pystray and decoding the icon happen on the tray thread too,
+        # so neither holds up the window
+        threading.Thread(target=self.run_tray_icon, name="TrayIcon", daemon=True).start()
+
+    def run_tray_icon(self):
+        started = time.perf_counter()
+        try:
+            import pystray
+            menu = (
+                pystray.MenuItem('Latency Stats', lambda: self.ui.call(self.show_stats)),
+                pystray.MenuItem('CPU Profiler', self.toggle_profiler, checked=lambda item: self.diagnostics.profiling),
+                pystray.MenuItem('Memory Snapshot', self.take_memory_snapshot),
+                pystray.MenuItem('Stop Memory Tracking', self.stop_memory_tracking,
+                                 enabled=lambda item: self.diagnostics.tracing_memory),
+                pystray.MenuItem('Exit', lambda: self.ui.call(self.on_close)),
+            )
+            tray_icon = pystray.Icon("AutoKeybind", tray_image(), "XvG AutoKeybind", menu)
+        except Exception as e:
+            print(f"Failed to create tray icon: {e}")
+            tray_icon = None
+        if self.startup_timer is not None:
+            self.startup_timer.mark_since("tray (background)", started)
+            self.startup_timer.done("tray")
+        if tray_icon is None or self.closing:
+            return
+        self.tray_icon = tray_icon
+        tray_icon.run()
 
 if __name__ == "__main__":
     root = tk.Tk()
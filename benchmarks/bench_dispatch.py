@@ -0,0 +1,291 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from array import array
+
+# Headless benchmark for the key -> action dispatch path:
+#   on_key_press/on_key_release -> check_and_perform_action -> execute_bind
+#   -> executor -> action handler -> (recording) injection backend
+#
+# Usage: python benchmarks/bench_dispatch.py [--events N] [--output results.json]
+# Prints one JSON document so runs can be diffed across commits.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_pynput
+fake_pynput.install()
+
+from fake_pynput import Key, KeyCode
+
+from engine import DispatchEngine
+from actions import ACTION_TYPES, ACTION_CLICK_RETURN, ACTION_MACRO, ACTION_FIND_IMAGE
+from settings import DEFAULT_SETTINGS
+from latency import percentile
+
+LETTERS = [chr(c) for c in range(ord('a'), ord('z') + 1)]
+
+# Image binds need template files and a screen; see bench_image_match.py
+BENCH_ACTION_TYPES = [t for t in ACTION_TYPES if t != ACTION_FIND_IMAGE]
+
+
+def make_app(binds, settings):
+    # The engine on an in-memory profile: no store, no persistence, no listener thread
+    app = DispatchEngine(settings)
+    app.profiles = {"Bench": {"keybinds": binds}}
+    app.active_profile = "Bench"
+    start = time.perf_counter()
+    app.rebuild_bind_index()
+    app.index_build_ms = (time.perf_counter() - start) * 1000.0
+    app.executor.start()
+    app.triggers.start()
+    return app
+
+
+def tap(key):
+    return [(True, key), (False, key)]
+
+
+def chord(modifiers, key):
+    events = [(True, m) for m in modifiers] + tap(key)
+    return events + [(False, m) for m in reversed(modifiers)]
+
+
+# --- Scenarios: each returns (binds, one cycle of events) ---
+
+def scenario_single_keys():
+    binds = {c.upper(): {"coords": [i, i], "type": BENCH_ACTION_TYPES[i % len(BENCH_ACTION_TYPES)]} for i, c in enumerate(LETTERS)}
+    events = []
+    for c in LETTERS:
+        events += tap(KeyCode.from_char(c))
+    return binds, events
+
+
+def scenario_modifier_chords():
+    binds = {}
+    events = []
+    combos = [[Key.ctrl_l], [Key.shift_l], [Key.ctrl_l, Key.shift_l], [Key.ctrl_l, Key.alt_l]]
+    for mods in combos:
+        prefix = "+".join(m.name.title() for m in mods)
+        for i, c in enumerate(LETTERS):
+            binds[f"{prefix}+{c.upper()}"] = {"coords": [i, i], "type": ACTION_CLICK_RETURN}
+            events += chord(mods, KeyCode.from_char(c.upper() if Key.shift_l in mods else c))
+    # Generic "Ctrl" binds matched by the right-hand key
+    for i in range(1, 13):
+        binds[f"Ctrl+F{i}"] = {"coords": [i, i], "type": ACTION_CLICK_RETURN}
+        events += chord([Key.ctrl_r], getattr(Key, f"f{i}"))
+    return binds, events
+
+
+def scenario_large_profile():
+    binds = {}
+    mod_sets = [[], [Key.ctrl_l], [Key.shift_l], [Key.alt_l], [Key.ctrl_l, Key.shift_l]]
+    per_set = 10000 // len(mod_sets)
+    events = []
+    for mods in mod_sets:
+        prefix = "".join(m.name.title() + "+" for m in mods)
+        for vk in range(per_set):
+            binds[f"{prefix}<{vk + 1000}>"] = {"coords": [vk, vk], "type": ACTION_CLICK_RETURN}
+    # Hit a spread of binds plus keys that match nothing
+    for i in range(0, per_set, 97):
+        mods = mod_sets[i % len(mod_sets)]
+        events += chord(mods, KeyCode.from_vk(i + 1000))
+        events += tap(KeyCode.from_vk(50000 + i))
+    return binds, events
+
+
+def scenario_legacy_binds():
+    binds = {c: [i, i] for i, c in enumerate(LETTERS)}
+    events = []
+    for c in LETTERS:
+        events += tap(KeyCode.from_char(c))
+    return binds, events
+
+
+def scenario_key_repeat_storm():
+    binds = {"W": {"coords": [1, 1], "type": ACTION_CLICK_RETURN}, "Shift_L+E": {"coords": [2, 2], "type": ACTION_CLICK_RETURN}}
+    w = KeyCode.from_char('w')
+    e = KeyCode.from_char('E')
+    # OS auto-repeat sends presses without releases while the key is held
+    events = [(True, w)] * 50 + [(False, w)]
+    events += [(True, Key.shift_l)] + [(True, e)] * 50 + [(False, e), (False, Key.shift_l)]
+    return binds, events
+
+
+def scenario_synthetic_echo():
+    # Macros type letters that are themselves bound; see install_echo
+    binds = {c.upper(): {"coords": [i, i], "type": ACTION_CLICK_RETURN} for i, c in enumerate(LETTERS)}
+    events = []
+    for i in range(1, 13):
+        steps = [{"op": "key_tap", "key": LETTERS[(i + j) % len(LETTERS)]} for j in range(4)]
+        binds[f"F{i}"] = {"type": ACTION_MACRO, "steps": steps + [{"op": "click", "coords": [i, i]}]}
+        events += tap(getattr(Key, f"f{i}"))
+    return binds, events
+
+
+def install_echo(app):
+    # Deliver every injected key back to the listener callbacks, like the OS does.
+    # With filtering working none of them reach the bind index.
+    def echo(call):
+        if call[0] in ("key_down", "key_up"):
+            name = call[1]
+            key = KeyCode.from_char(name) if len(name) == 1 else Key[name]
+            if call[0] == "key_down":
+                app.on_key_press(key)
+            else:
+                app.on_key_release(key)
+    app.backend.inner.on_event = echo
+
+
+SCENARIOS = {
+    "single_keys": scenario_single_keys,
+    "modifier_chords": scenario_modifier_chords,
+    "large_profile_10k": scenario_large_profile,
+    "legacy_list_binds": scenario_legacy_binds,
+    "key_repeat_storm": scenario_key_repeat_storm,
+    "synthetic_echo": scenario_synthetic_echo,
+}
+
+SCENARIO_SETUP = {
+    "synthetic_echo": install_echo,
+}
+
+
+def drive(app, events, total):
+    # Feed events round-robin until `total` have been delivered; returns per-event ns
+    press = app.on_key_press
+    release = app.on_key_release
+    clock = time.perf_counter_ns
+    timings = array('q', bytes(8 * total))
+    n = len(events)
+    for i in range(total):
+        is_press, key = events[i % n]
+        start = clock()
+        if is_press:
+            press(key)
+        else:
+            release(key)
+        timings[i] = clock() - start
+    return timings
+
+
+def drain(app, timeout=30.0):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        stats = app.executor.stats()
+        if not stats["depth"] and not stats["busy"]:
+            break
+        time.sleep(0.001)
+    app.triggers.stop()
+    app.executor.stop()
+
+
+def run_scenario(name, factory, total_events, settings):
+    binds, events = factory()
+
+    setup = SCENARIO_SETUP.get(name)
+
+    # Timing pass
+    app = make_app(binds, settings)
+    if setup:
+        setup(app)
+    drive(app, events, min(total_events, 1000))  # warm up caches
+    app.latency.clear()
+    gc.collect()
+    start = time.perf_counter()
+    timings = drive(app, events, total_events)
+    elapsed = time.perf_counter() - start
+    drain(app)
+
+    ordered = sorted(timings)
+    result = {
+        "binds": len(binds),
+        "index_entries": len(app.bind_index),
+        "index_build_ms": app.index_build_ms,
+        "events": total_events,
+        "seconds": elapsed,
+        "events_per_sec": total_events / elapsed if elapsed else 0.0,
+        "listener_ns": {
+            "p50": percentile(ordered, 50),
+            "p95": percentile(ordered, 95),
+            "p99": percentile(ordered, 99),
+            "max": ordered[-1] if ordered else 0,
+        },
+        "triggers": app.triggers.stats(),
+        "executor": app.executor.stats(),
+        "synthetic": app.synthetic.stats(),
+        "end_to_end_ms": {action: spans["total"] for action, spans in app.latency.summary()["by_action"].items()},
+    }
+
+    # Memory pass, separate because tracemalloc distorts timings
+    tracemalloc.start()
+    app = make_app(binds, settings)
+    if setup:
+        setup(app)
+    after_build, _ = tracemalloc.get_traced_memory()
+    drive(app, events, min(total_events, 20000))
+    drain(app)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    result["memory"] = {
+        "profile_and_index_bytes": after_build,
+        "peak_bytes": peak,
+        "retained_bytes": current,
+    }
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the keybind dispatch pipeline without a display.")
+    parser.add_argument("--events", type=int, default=100000, help="events per scenario")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="run only these scenarios")
+    parser.add_argument("--policy", default="queue", help="executor policy (default: queue, so every action runs)")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    settings = dict(DEFAULT_SETTINGS)
+    settings.update({
+        "injection_backend": "recording",
+        "synthetic_filter": "ledger",
+        "executor_policy": args.policy,
+        "executor_queue_size": args.events,
+        "action_delays": {action: 0.0 for action in ACTION_TYPES},
+        "latency_buffer_size": 65536,
+    })
+
+    results = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "settings": {k: settings[k] for k in ("executor_policy", "injection_backend")},
+        "scenarios": {},
+    }
+    for name in args.scenario or SCENARIOS:
+        print(f"Running {name}...", file=sys.stderr)
+        results["scenarios"][name] = run_scenario(name, SCENARIOS[name], args.events, settings)
+
+    text = json.dumps(results, indent=4)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+# Benchmark and self-check for the Find Image & Click matcher, on synthetic
+# screenshots (no display needed):
+#   full     cold search of the whole screen (coarse + fine pass)
+#   region   cold search of a region around the template
+#   cached   re-check of the last hit location
+#   moved    template moved since the last hit: failed re-check + full search
+#   absent   a template that is not on the screen
+#   left_monitor  whole-screen search of a virtual screen starting at negative
+#            coordinates (a monitor left of and above the primary)
+#
+# Usage: python benchmarks/bench_image_match.py [--runs N] [--width W --height H]
+# Prints one JSON document; exits non-zero if any lookup lands in the wrong place.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from image_match import ImageTarget, ImageMatcher, ArrayGrabber
+from latency import percentile
+
+
+def make_screen(rng, width, height):
+    # Smooth gradients with some texture, roughly like a desktop
+    yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+    screen = 96 + 64 * np.sin(xx / 97.0) * np.cos(yy / 61.0)
+    screen += rng.normal(0, 12, size=screen.shape)
+    return np.clip(screen, 0, 255).astype(np.float32)
+
+
+def make_template(rng, w, h):
+    # A button-like patch: flat body, border and a few "glyphs"
+    template = np.full((h, w), 200.0, dtype=np.float32)
+    template[:2, :] = template[-2:, :] = template[:, :2] = template[:, -2:] = 40.0
+    for _ in range(6):
+        x = rng.integers(4, w - 8)
+        y = rng.integers(4, h - 8)
+        template[y:y + 4, x:x + 3] = rng.uniform(0, 120)
+    return template
+
+
+def place(screen, template, x, y):
+    h, w = template.shape
+    screen[y:y + h, x:x + w] = template
+
+
+def time_lookups(matcher, target, runs, expected, prepare=None):
+    # prepare() runs untimed before each lookup and may return a new expected point
+    timings = []
+    errors = 0
+    for _ in range(runs):
+        if prepare is not None:
+            expected = prepare() or expected
+        start = time.perf_counter_ns()
+        point = matcher.locate(target)
+        timings.append(time.perf_counter_ns() - start)
+        if point != expected:
+            errors += 1
+    timings.sort()
+    return {
+        "runs": runs,
+        "errors": errors,
+        "ms": {
+            "p50": percentile(timings, 50) / 1e6,
+            "p95": percentile(timings, 95) / 1e6,
+            "max": timings[-1] / 1e6,
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the image matcher on synthetic screenshots.")
+    parser.add_argument("--runs", type=int, default=20, help="lookups per case")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--scale", type=int, default=4, help="coarse pass downscale factor")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    screen = make_screen(rng, args.width, args.height)
+    template = make_template(rng, 64, 24)
+    h, w = template.shape
+    x, y = args.width * 3 // 5 + 3, args.height * 2 // 5 + 1  # off the coarse grid on purpose
+    place(screen, template, x, y)
+    centre = (x + w // 2, y + h // 2)
+    grabber = ArrayGrabber(screen)
+    matcher = ImageMatcher(grabber)
+
+    def cold(target):
+        def reset():
+            target.last_hit = None
+        return reset
+
+    full = ImageTarget("full", template, scale=args.scale)
+    region = ImageTarget("region", template, region=(x - 150, y - 100, 400, 250), scale=args.scale)
+    cached = ImageTarget("cached", template, scale=args.scale)
+    absent = ImageTarget("absent", make_template(np.random.default_rng(args.seed + 1), 64, 24), scale=args.scale)
+
+    cases = {
+        "full": time_lookups(matcher, full, args.runs, centre, cold(full)),
+        "region": time_lookups(matcher, region, args.runs, centre, cold(region)),
+        "cached": time_lookups(matcher, cached, args.runs, centre),
+        "absent": time_lookups(matcher, absent, args.runs, None, cold(absent)),
+    }
+
+    # Moving target: each lookup finds the stale hit gone and searches again
+    positions = [(x, y), (x - 301, y + 117)]
+    moved = ImageTarget("moved", template, scale=args.scale)
+    moved.last_hit = positions[0]
+    state = {"i": 0}
+
+    def move():
+        old = positions[state["i"] % 2]
+        new = positions[(state["i"] + 1) % 2]
+        screen[old[1]:old[1] + h, old[0]:old[0] + w] = make_screen(rng, w, h)
+        place(screen, template, *new)
+        state["i"] += 1
+        return new[0] + w // 2, new[1] + h // 2
+
+    cases["moved"] = time_lookups(matcher, moved, args.runs, None, move)
+
+    # Same screen, shifted as if a monitor sat left of and above the primary
+    origin = (-args.width // 2, -37)
+    offset_matcher = ImageMatcher(ArrayGrabber(screen, origin))
+    offset_target = ImageTarget("left_monitor", template, scale=args.scale)
+    new = positions[state["i"] % 2]
+    offset_centre = (new[0] + w // 2 + origin[0], new[1] + h // 2 + origin[1])
+    cases["left_monitor"] = time_lookups(offset_matcher, offset_target, args.runs, offset_centre, cold(offset_target))
+
+    results = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "screen": [args.width, args.height],
+        "template": [w, h],
+        "coarse_scale": full.scale,
+        "cases": cases,
+        "per_bind": matcher.stats.summary(),
+    }
+    text = json.dumps(results, indent=4)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text)
+    else:
+        print(text)
+    return 1 if any(case["errors"] for case in cases.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
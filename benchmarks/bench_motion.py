@@ -0,0 +1,115 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+# Benchmark and self-check for gliding cursor moves (motion.py, motion_path.py):
+#   build    path lookups for new displacements (template stretch + cache fill)
+#   cached   path lookups for displacements already in the cache
+#   playback playing paths against the recording backend: per-step drift,
+#            skipped steps and how far the move's duration is off
+#
+# Usage: python benchmarks/bench_motion.py [--paths N] [--moves N]
+# Prints one JSON document; exits non-zero if a path misses its end point or
+# a curved path leaves the neighbourhood of its straight line.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from motion import MotionPlayer, compile_motion, MOTION_PROFILES, MOTION_INSTANT
+from motion_path import PathCache, CURVE_BEND
+from injection import RecordingBackend
+from latency import percentile
+
+
+def time_paths(cache, spec, pairs):
+    times = []
+    errors = 0
+    for start, end in pairs:
+        t0 = time.perf_counter_ns()
+        points = cache.path(spec, start, end)
+        times.append(time.perf_counter_ns() - t0)
+        errors += check_path(spec, points, start, end)
+    times.sort()
+    return {"lookups": len(times), "p50_us": percentile(times, 50) / 1000.0,
+            "p99_us": percentile(times, 99) / 1000.0, "errors": errors}
+
+
+def check_path(spec, points, start, end):
+    if len(points) != spec.steps or tuple(points[-1]) != tuple(end):
+        return 1
+    # Every point stays within the curve's bulge (plus bucket rounding) of the straight line
+    length = max(1.0, ((end[0] - start[0]) ** 2 + (end[1] - start[1]) ** 2) ** 0.5)
+    limit = CURVE_BEND * (length + 32) + 16
+    for x, y in points:
+        cross = abs((end[0] - start[0]) * (y - start[1]) - (end[1] - start[1]) * (x - start[0])) / length
+        if cross > limit:
+            return 1
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark humanized cursor paths.")
+    parser.add_argument("--paths", type=int, default=2000, help="path lookups per profile")
+    parser.add_argument("--moves", type=int, default=10, help="played moves per profile")
+    parser.add_argument("--duration", type=float, default=100.0, help="move duration in ms")
+    parser.add_argument("--rate", type=float, default=240.0, help="steps per second")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    rnd = random.Random(args.seed)
+    screen = (1920, 1080)
+    pairs = [((rnd.randrange(screen[0]), rnd.randrange(screen[1])), (rnd.randrange(screen[0]), rnd.randrange(screen[1])))
+             for _ in range(args.paths)]
+    results = {}
+    errors = 0
+    for profile in MOTION_PROFILES:
+        if profile == MOTION_INSTANT:
+            continue
+        spec = compile_motion({"profile": profile, "duration_ms": args.duration, "rate_hz": args.rate})
+        cache = PathCache(size=args.paths * 2)
+        cache.prepare(spec)
+        build = time_paths(cache, spec, pairs)
+        cached = time_paths(cache, spec, pairs)
+
+        player = MotionPlayer()
+        backend = RecordingBackend()
+        overrun = []
+        for start, end in pairs[:args.moves]:
+            points = cache.path(spec, start, end)
+            t0 = time.perf_counter_ns()
+            player.play(backend, points, spec.interval_ns)
+            overrun.append((time.perf_counter_ns() - t0) / 1e6 - args.duration)
+        errors += build["errors"] + cached["errors"]
+        results[profile] = {
+            "steps": spec.steps,
+            "build": build,
+            "cached": cached,
+            "playback": dict(player.stats.summary(), max_duration_error_ms=max(abs(o) for o in overrun)),
+            "cache": cache.stats(),
+        }
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "paths": args.paths,
+        "duration_ms": args.duration,
+        "rate_hz": args.rate,
+        "profiles": results,
+        "errors": errors,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import threading
+import time
+
+# Benchmark and self-check for profile switching by foreground window
+# (window_rules.py), driven by FakeWindowProvider (no display needed):
+#   checks   scripted window changes against the watcher, asserting which
+#            profile switches happen: unchanged windows are not re-matched,
+#            first matching rule wins, a manual switch holds until another
+#            rule outcome, the rule cache is used, and the threaded watcher
+#            from start_window_watcher picks a window up
+#   timing   poll cost with the same window in front, and with the title
+#            changing on every poll
+#
+# Usage: python benchmarks/bench_window_rules.py [--polls N] [--rules N]
+# Prints one JSON document; exits non-zero if any check fails.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from window_rules import FakeWindowProvider, WindowMatcher, WindowWatcher, start_window_watcher
+from settings import DEFAULT_SETTINGS
+
+RULES = [
+    {"class": "steam_app_.*", "profile": "Game"},
+    {"title": "- Visual Studio Code$", "profile": "Editor"},
+    {"class": "firefox", "title": "youtube", "profile": "Video"},
+    {"class": "steam_app_42", "profile": "Shadowed"},  # never wins, the first rule matches first
+]
+
+
+class Recorder:
+    def __init__(self):
+        self.switches = []
+        self.event = threading.Event()
+
+    def __call__(self, profile):
+        self.switches.append(profile)
+        self.event.set()
+
+
+def make_watcher(rules=RULES):
+    provider = FakeWindowProvider()
+    recorder = Recorder()
+    return provider, recorder, WindowWatcher(provider, WindowMatcher(rules), recorder)
+
+
+def run_checks():
+    results = {}
+
+    def check(name, ok, detail=None):
+        if isinstance(detail, list):
+            detail = list(detail)  # As of this check
+        results[name] = {"ok": bool(ok)} if detail is None else {"ok": bool(ok), "detail": detail}
+
+    provider, recorder, watcher = make_watcher()
+    watcher.poll()
+    check("no_window", recorder.switches == [] and watcher.changes == 0, recorder.switches)
+
+    provider.set_window(1, "steam_app_42", "Some Game")
+    watcher.poll()
+    check("class_rule", recorder.switches == ["Game"], recorder.switches)
+
+    # The same window polled again is neither re-matched nor re-switched
+    hits = watcher.matcher.cache_hits
+    for _ in range(10):
+        watcher.poll()
+    check("unchanged_window_cached", recorder.switches == ["Game"] and watcher.changes == 1
+          and watcher.matcher.cache_hits == hits, {"changes": watcher.changes, "cache_hits": watcher.matcher.cache_hits})
+
+    # Manual switch elsewhere: a new title on a window with the same outcome must not undo it
+    provider.set_window(1, "steam_app_42", "Some Game - Paused")
+    watcher.poll()
+    provider.set_window(2, "Steam_App_7", "Another Game")
+    watcher.poll()
+    check("manual_override_holds", recorder.switches == ["Game"], recorder.switches)
+
+    provider.set_window(3, "code", "main.py - Visual Studio Code")
+    watcher.poll()
+    check("title_rule", recorder.switches == ["Game", "Editor"], recorder.switches)
+
+    provider.set_window(4, "firefox", "Music - YouTube")
+    watcher.poll()
+    provider.set_window(5, "firefox", "Mail")
+    watcher.poll()
+    check("class_and_title_rule", recorder.switches == ["Game", "Editor", "Video"], recorder.switches)
+
+    # An unmatched window releases the hold: the next matching window switches again
+    provider.set_window(1, "steam_app_42", "Some Game")
+    watcher.poll()
+    check("switch_after_unmatched", recorder.switches == ["Game", "Editor", "Video", "Game"], recorder.switches)
+
+    provider.set_window(4, "firefox", "Music - YouTube")
+    watcher.poll()
+    check("rule_cache_hit", watcher.matcher.cache_hits > hits, watcher.matcher.cache_hits)
+
+    # Lookup failures are counted, not raised
+    failing, _, failing_watcher = make_watcher()
+    failing.active_window = lambda: 1 / 0
+    failing_watcher.poll()
+    check("lookup_error_counted", failing_watcher.errors == 1, failing_watcher.errors)
+
+    # The real entry point: a background thread polling every window_poll_ms
+    provider = FakeWindowProvider()
+    recorder = Recorder()
+    settings = dict(DEFAULT_SETTINGS, window_rules=RULES, window_poll_ms=5)
+    threaded = start_window_watcher(settings, recorder, provider)
+    try:
+        provider.set_window(9, "code", "x - Visual Studio Code")
+        switched = recorder.event.wait(2.0)
+    finally:
+        threaded.stop()
+    check("threaded_watcher", switched and recorder.switches == ["Editor"], recorder.switches)
+    check("no_rules_no_watcher", start_window_watcher(dict(settings, window_rules=[]), recorder, provider) is None)
+    return results
+
+
+def time_polls(rule_count, polls):
+    rules = [{"class": f"app_{i}$", "profile": f"P{i}"} for i in range(rule_count)] + RULES
+    provider, _, watcher = make_watcher(rules)
+    provider.set_window(1, "steam_app_42", "Some Game")
+    start = time.perf_counter_ns()
+    for _ in range(polls):
+        watcher.poll()
+    unchanged_ns = (time.perf_counter_ns() - start) / polls
+    start = time.perf_counter_ns()
+    for i in range(polls):
+        provider.set_window(1, "browser", f"Tab {i}")
+        watcher.poll()
+    changing_ns = (time.perf_counter_ns() - start) / polls
+    return {"rules": len(rules), "polls": polls, "unchanged_us": unchanged_ns / 1000.0,
+            "title_changing_us": changing_ns / 1000.0, "watcher": watcher.stats()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check and time foreground window profile switching.")
+    parser.add_argument("--polls", type=int, default=20000, help="polls per timing case")
+    parser.add_argument("--rules", type=int, default=100, help="extra non-matching rules for timing")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    checks = run_checks()
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "checks": checks,
+        "timing": time_polls(args.rules, args.polls),
+        "failed": sorted(name for name, result in checks.items() if not result["ok"]),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+import enum
+import sys
+import types
+
+# Minimal stand-ins for the parts of pynput the dispatch path touches.
+# Installed into sys.modules before the engine is imported so benchmarks run
+# without a display or input devices, and with identical key objects on
+# every platform.
+
+
+class KeyCode:
+    def __init__(self, vk=None, char=None):
+        self.vk = vk
+        self.char = char
+
+    @classmethod
+    def from_char(cls, char):
+        return cls(char=char)
+
+    @classmethod
+    def from_vk(cls, vk):
+        return cls(vk=vk)
+
+    def __eq__(self, other):
+        return isinstance(other, KeyCode) and self.vk == other.vk and self.char == other.char
+
+    def __hash__(self):
+        return hash((self.vk, self.char))
+
+    # Same text as pynput, get_key_name falls back to it for keys without a char
+    def __repr__(self):
+        if self.char is not None:
+            return repr(self.char)
+        return '<%d>' % self.vk
+
+    __str__ = __repr__
+
+
+KEY_NAMES = [
+    'alt', 'alt_l', 'alt_r', 'alt_gr', 'backspace', 'caps_lock', 'cmd', 'cmd_l', 'cmd_r',
+    'ctrl', 'ctrl_l', 'ctrl_r', 'delete', 'down', 'end', 'enter', 'esc',
+    'f1', 'f2', 'f3', 'f4', 'f5', 'f6', 'f7', 'f8', 'f9', 'f10', 'f11', 'f12',
+    'home', 'insert', 'left', 'page_down', 'page_up', 'right',
+    'shift', 'shift_l', 'shift_r', 'space', 'tab', 'up'
+]
+
+Key = enum.Enum('Key', {name: KeyCode(vk=0xF000 + i) for i, name in enumerate(KEY_NAMES)})
+
+
+class Listener:
+    def __init__(self, *args, **kwargs):
+        self.kwargs = kwargs
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def join(self, timeout=None):
+        pass
+
+
+class Controller:
+    def __init__(self):
+        self.position = (0, 0)
+
+    def press(self, button):
+        pass
+
+    def release(self, button):
+        pass
+
+    def click(self, button, count=1):
+        pass
+
+
+class Button(enum.Enum):
+    left = 1
+    right = 2
+    middle = 3
+
+
+def install():
+    pynput = types.ModuleType('pynput')
+    keyboard = types.ModuleType('pynput.keyboard')
+    mouse = types.ModuleType('pynput.mouse')
+
+    keyboard.Key = Key
+    keyboard.KeyCode = KeyCode
+    keyboard.Listener = Listener
+    keyboard.Controller = Controller
+
+    mouse.Button = Button
+    mouse.Listener = Listener
+    mouse.Controller = Controller
+
+    pynput.keyboard = keyboard
+    pynput.mouse = mouse
+    sys.modules['pynput'] = pynput
+    sys.modules['pynput.keyboard'] = keyboard
+    sys.modules['pynput.mouse'] = mouse
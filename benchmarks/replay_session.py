@@ -0,0 +1,138 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+# Replays a recorded session (session_record_dir in settings.json) through
+# the dispatch path, headless: fake pynput keys, recording injection backend.
+# Uses the binds that were live while recording, so a session reproduces
+# the same way on any machine.
+#
+# Usage: python benchmarks/replay_session.py SESSION.akbs [--realtime] [--output report.json]
+#        python benchmarks/replay_session.py --self-check
+# Prints a JSON report: throughput, timing lateness (--realtime) and whether
+# the binds that fired differ from the recording. Exits 1 if they do.
+#
+# Without --realtime keys are fed as fast as possible; binds that depend on
+# timing (repeat, long_press, sequences) are expected to differ then.
+#
+# The replay engine runs with synthetic_filter "off": the recording holds
+# only real keys (our own injected ones were filtered out while recording),
+# and the recording backend's injections never come back through a
+# listener, so ledger notes would only swallow real keys.
+#
+# --self-check records a short session (a macro typing a key that is also
+# bound, then a real press of that key) with injected keys echoed back like
+# the OS does, replays it both ways and exits 1 if either diverges.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_pynput
+fake_pynput.install()
+
+from fake_pynput import Key, KeyCode
+from engine import DispatchEngine
+from actions import ACTION_CLICK_RETURN, ACTION_MACRO
+from settings import DEFAULT_SETTINGS
+from session_log import SessionReplayer, SessionError
+
+
+def make_engine(**overrides):
+    settings = dict(DEFAULT_SETTINGS, injection_backend="recording", session_record_dir="", **overrides)
+    engine = DispatchEngine(settings)
+    engine.executor.start()
+    engine.triggers.start()
+    return engine
+
+
+def stop_engine(engine):
+    engine.triggers.stop()
+    engine.executor.stop()
+
+
+def replay(path, realtime, settle_s):
+    engine = make_engine(synthetic_filter="off")
+    try:
+        return SessionReplayer(engine).run(path, realtime, settle_s)
+    finally:
+        stop_engine(engine)
+
+
+def record_macro_keys_session(directory):
+    # Macro A types "b", which is bound too; the user presses B for real 100 ms later
+    engine = make_engine(synthetic_filter="ledger")
+
+    def echo(call):
+        if call[0] in ("key_down", "key_up"):
+            name = call[1]
+            key = KeyCode.from_char(name) if len(name) == 1 else Key[name]
+            if call[0] == "key_down":
+                engine.on_key_press(key)
+            else:
+                engine.on_key_release(key)
+    engine.backend.inner.on_event = echo
+
+    engine.profiles = {"SelfCheck": {"keybinds": {
+        "A": {"type": ACTION_MACRO, "steps": [{"op": "key_tap", "key": "b"}]},
+        "B": {"coords": [10, 10], "type": ACTION_CLICK_RETURN},
+    }}}
+    engine.active_profile = "SelfCheck"
+    engine.rebuild_bind_index()
+    path = engine.start_session_recording(directory)
+    try:
+        for char in ("a", "b"):
+            key = KeyCode.from_char(char)
+            engine.on_key_press(key)
+            engine.on_key_release(key)
+            time.sleep(0.1)
+    finally:
+        engine.stop_session_recording()
+        stop_engine(engine)
+    return path
+
+
+def self_check(settle_s):
+    with tempfile.TemporaryDirectory() as directory:
+        path = record_macro_keys_session(directory)
+        if path is None:
+            return {"error": "could not record"}, True
+        reports = {"macro_keys_" + mode: replay(path, mode == "realtime", settle_s) for mode in ("realtime", "fast")}
+    failed = any(r["diverged"] or r["fired_recorded"] != 2 for r in reports.values())
+    return reports, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded input session through the dispatch path.")
+    parser.add_argument("session", nargs="?", help="recorded .akbs file")
+    parser.add_argument("--realtime", action="store_true", help="keep the recorded timing")
+    parser.add_argument("--settle", type=float, default=0.5, help="seconds to wait for timers after the last event")
+    parser.add_argument("--self-check", action="store_true", help="record and replay built-in scenarios instead")
+    parser.add_argument("--output", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    if args.self_check:
+        report, failed = self_check(args.settle)
+    elif args.session:
+        try:
+            report = replay(args.session, args.realtime, args.settle)
+        except (OSError, SessionError) as e:
+            print(f"Cannot replay {args.session}: {e}", file=sys.stderr)
+            return 2
+        failed = report["diverged"]
+    else:
+        parser.error("a session file or --self-check is required")
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text + "\n")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
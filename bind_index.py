@@ -0,0 +1,124 @@
+import itertools
+from key_utils import MODIFIER_MATCHES, get_key_token, parse_combo_string, is_sequence
+from triggers import compile_trigger, TRIGGER_DOUBLE_TAP
+
+# Compiled lookup for a profile's binds.
+#
+# Bind strings are parsed once into (modifier bitmask, frozenset of key tokens)
+# so the listener never has to build or compare combo strings. Generic modifiers
+# are expanded to every side they may match, and key names are case-folded here
+# rather than on every event.
+#
+# Entries are (combo string, CompiledBind, BindTrigger).
+
+
+class CompiledBind:
+    # A bind ready to fire: legacy lists normalised, coordinates checked and
+    # the action bound to its callable, so dispatch is func(*args)
+    __slots__ = ('key', 'action_type', 'func', 'args', 'is_macro')
+
+    def __init__(self, key, action_type, func, args, is_macro=False):
+        self.key = key
+        self.action_type = action_type
+        self.func = func
+        self.args = args
+        self.is_macro = is_macro
+
+
+def expand_combo(combo):
+    # Every (modifier mask, tokens) lookup a bind string matches, or None if malformed
+    parsed = parse_combo_string(combo)
+    if parsed is None:
+        return None
+    modifiers, tokens = parsed
+    lookups = []
+    for bits in itertools.product(*[MODIFIER_MATCHES[m] for m in modifiers]):
+        mask = 0
+        for bit in bits:
+            mask |= bit
+        lookups.append((mask, tokens))
+    return lookups
+
+
+def compile_bind_index(binds, compiled, errors=None):
+    # compiled maps combo -> CompiledBind; binds missing from it are left out,
+    # and so are sequences and double taps, which live in the sequence trie.
+    # Combos that cannot be parsed are reported in errors.
+    index = {}
+    legacy_entries = set()
+    for combo, bind_data in binds.items():
+        bind = compiled.get(combo)
+        if bind is None or is_sequence(combo):
+            continue
+        trigger = compile_trigger(bind_data)
+        if trigger.mode == TRIGGER_DOUBLE_TAP:
+            continue
+        lookups = expand_combo(combo)
+        if lookups is None:
+            if errors is not None:
+                errors.append(f"Bind '{combo}': not a key combination")
+            continue
+        # Recorder spellings win over legacy lower-case ones ("A" beats "a"),
+        # matching the old exact-then-lower() lookup order.
+        legacy = _is_legacy_spelling(combo)
+        entry = (combo, bind, trigger)
+        for lookup in lookups:
+            if legacy and lookup in index and lookup not in legacy_entries:
+                continue
+            index[lookup] = entry
+            if legacy:
+                legacy_entries.add(lookup)
+            else:
+                legacy_entries.discard(lookup)
+    return index
+
+def _is_legacy_spelling(combo):
+    # Old versions saved plain lower-case keys; the recorder never does
+    return combo == combo.lower() and combo != combo.upper()
+
+
+class KeyState:
+    # Tracks what is held down, incrementally, as a ready-made lookup key.
+
+    def __init__(self):
+        self.mask = 0
+        self.tokens = frozenset()
+        self.combo = (0, self.tokens)
+        self._token_cache = {}
+
+    def _token(self, key):
+        try:
+            return self._token_cache[key]
+        except KeyError:
+            token = self._token_cache[key] = get_key_token(key)
+            return token
+        except TypeError:
+            # Unhashable key object, fall back to computing it every time
+            return get_key_token(key)
+
+    def press(self, key):
+        # Returns False for OS auto-repeat (the key was already down)
+        bit, token = self._token(key)
+        if bit:
+            if self.mask & bit:
+                return False
+            self.mask |= bit
+        else:
+            if token in self.tokens:
+                return False
+            self.tokens = self.tokens | {token}
+        self.combo = (self.mask, self.tokens)
+        return True
+
+    def release(self, key):
+        bit, token = self._token(key)
+        if bit:
+            self.mask &= ~bit
+        elif token in self.tokens:
+            self.tokens = self.tokens - {token}
+        self.combo = (self.mask, self.tokens)
+
+    def clear(self):
+        self.mask = 0
+        self.tokens = frozenset()
+        self.combo = (0, self.tokens)
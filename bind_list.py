@@ -0,0 +1,147 @@
+import bisect
+import os
+from actions import ACTION_MACRO, ACTION_FIND_IMAGE
+
+# What the Manage Binds window lists, kept apart from Tk.
+#
+# Rows are described once and kept up to date one bind at a time. Filtering
+# goes through a trigram index over each row's text (key, action type and
+# coordinates / details, layer), sorting through per-column orders that are built
+# on first use and then maintained by bisection, so neither rescans the
+# profile.
+
+COLUMNS = ("key", "action", "coords", "layer")
+
+
+def describe_bind(key, bind_data, layer=""):
+    # -> (key, action, coordinates or details, profile layer) as shown in the list
+    if isinstance(bind_data, list):
+        return key, "Legacy (Click & Return)", str(bind_data), layer
+    action = bind_data.get('type')
+    if action == ACTION_MACRO:
+        detail = f"{len(bind_data.get('steps') or [])} steps"
+    elif action == ACTION_FIND_IMAGE:
+        detail = os.path.basename(bind_data.get('image') or "")
+    else:
+        detail = str(bind_data.get('coords'))
+    return key, str(action), detail, layer
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class BindListModel:
+    def __init__(self, binds, sources=None):
+        # sources: {key: profile layer the bind comes from}, if stacked
+        self.rows = {}  # key -> row, in profile order
+        self._text = {}  # key -> lower-case searchable text
+        self._grams = {}  # trigram -> set of keys
+        self._orders = {}  # column index -> sorted [(value, key)]
+        sources = sources or {}
+        for key, bind_data in binds.items():
+            self._add(key, bind_data, sources.get(key, ""))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _index_grams(self, key, grams):
+        for gram in grams:
+            keys = self._grams.get(gram)
+            if keys is None:
+                keys = self._grams[gram] = set()
+            keys.add(key)
+
+    def _unindex_grams(self, key, grams):
+        for gram in grams:
+            keys = self._grams[gram]
+            keys.discard(key)
+            if not keys:
+                del self._grams[gram]
+
+    def _add(self, key, bind_data, layer):
+        row = describe_bind(key, bind_data, layer)
+        text = "\t".join(row).lower()
+        self.rows[key] = row
+        self._text[key] = text
+        self._index_grams(key, _trigrams(text))
+        for column, order in self._orders.items():
+            bisect.insort(order, (row[column].lower(), key))
+
+    def _remove(self, key):
+        row = self.rows.pop(key)
+        self._unindex_grams(key, _trigrams(self._text.pop(key)))
+        for column, order in self._orders.items():
+            entry = (row[column].lower(), key)
+            del order[bisect.bisect_left(order, entry)]
+
+    def _update(self, key, bind_data, layer):
+        # Edit of an existing bind: the row keeps its place in profile order,
+        # and only the trigrams and sort entries that changed are touched
+        old_row = self.rows[key]
+        row = describe_bind(key, bind_data, layer)
+        if row == old_row:
+            return
+        text = "\t".join(row).lower()
+        old_grams = _trigrams(self._text[key])
+        grams = _trigrams(text)
+        self.rows[key] = row
+        self._text[key] = text
+        self._unindex_grams(key, old_grams - grams)
+        self._index_grams(key, grams - old_grams)
+        for column, order in self._orders.items():
+            old_value, value = old_row[column].lower(), row[column].lower()
+            if old_value != value:
+                del order[bisect.bisect_left(order, (old_value, key))]
+                bisect.insort(order, (value, key))
+
+    def set(self, key, bind_data, layer=""):
+        if key in self.rows:
+            self._update(key, bind_data, layer)
+        else:
+            self._add(key, bind_data, layer)
+        return self.rows[key]
+
+    def remove(self, key):
+        if key in self.rows:
+            self._remove(key)
+
+    def matches(self, key, query):
+        return not query or query.lower() in self._text.get(key, "")
+
+    def search(self, query):
+        # Set of keys whose row contains query (case-insensitive)
+        query = query.lower()
+        if len(query) < 3:
+            return {key for key, text in self._text.items() if query in text}
+        candidates = None
+        for gram in sorted(_trigrams(query), key=lambda g: len(self._grams.get(g, ()))):
+            keys = self._grams.get(gram)
+            if not keys:
+                return set()
+            candidates = set(keys) if candidates is None else candidates & keys
+            if len(candidates) < 64:
+                break  # Few enough to check directly
+        return {key for key in candidates if query in self._text[key]}
+
+    def order(self, column=None, reverse=False):
+        # Keys in profile order, or sorted by a column name
+        if column is None:
+            keys = list(self.rows)
+        else:
+            index = COLUMNS.index(column)
+            order = self._orders.get(index)
+            if order is None:
+                order = self._orders[index] = sorted((row[index].lower(), key) for key, row in self.rows.items())
+            keys = [key for _, key in order]
+        if reverse:
+            keys.reverse()
+        return keys
+
+    def keys(self, query="", column=None, reverse=False):
+        # What the list shows: matching keys in display order
+        keys = self.order(column, reverse)
+        if not query:
+            return keys
+        found = self.search(query)
+        return [key for key in keys if key in found]
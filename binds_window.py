@@ -0,0 +1,149 @@
+import tkinter as tk
+from tkinter import ttk
+from tkinter.ttk import Button, Label, Frame, Entry
+from bind_list import BindListModel, COLUMNS
+
+# Rows are inserted this many at a time between Tk events, so the window
+# opens (and stays responsive) at once for very large profiles
+FILL_CHUNK = 400
+
+HEADINGS = {"key": "Key Combination", "action": "Action Type", "coords": "Coordinates", "layer": "Layer"}
+WIDTHS = {"key": 150, "action": 150, "coords": 150, "layer": 100}
+
+
+class BindsWindow(tk.Toplevel):
+    # The Manage Binds list. on_edit(key) and on_delete(key) are called for
+    # the selected row; the caller reports changes back through
+    # update_bind() and remove_bind(), which touch only the affected row.
+    # sources names the profile layer each bind comes from.
+
+    def __init__(self, parent, title, binds, on_edit, on_delete, sources=None):
+        super().__init__(parent)
+        self.title(title)
+        self.geometry("650x400")
+        self.model = BindListModel(binds, sources)
+        self.on_edit = on_edit
+        self.on_delete = on_delete
+        self.sort_column = None
+        self.sort_reverse = False
+        self._pending = []  # keys still to be inserted by the current fill
+        self._fill_id = None
+
+        filter_frame = Frame(self, padding=(10, 10, 10, 0))
+        filter_frame.pack(fill=tk.X)
+        Label(filter_frame, text="Filter:").pack(side=tk.LEFT)
+        self.filter_var = tk.StringVar()
+        self.filter_var.trace_add("write", lambda *args: self.refresh())
+        filter_entry = Entry(filter_frame, textvariable=self.filter_var)
+        filter_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(5, 5))
+        self.count_var = tk.StringVar()
+        Label(filter_frame, textvariable=self.count_var, foreground="#666").pack(side=tk.RIGHT)
+
+        list_frame = Frame(self, padding=10)
+        list_frame.pack(fill=tk.BOTH, expand=True)
+        self.tree = ttk.Treeview(list_frame, columns=COLUMNS, show="headings", selectmode="browse")
+        for column in COLUMNS:
+            self.tree.heading(column, text=HEADINGS[column], command=lambda c=column: self.sort_by(c))
+            self.tree.column(column, width=WIDTHS[column])
+        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscroll=scrollbar.set)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        btn_frame = Frame(self, padding=10)
+        btn_frame.pack(fill=tk.X)
+        Button(btn_frame, text="Edit Selected", command=lambda: self._with_selection(self.on_edit)).pack(side=tk.LEFT, padx=5)
+        Button(btn_frame, text="Delete Selected", command=lambda: self._with_selection(self.on_delete)).pack(side=tk.LEFT, padx=5)
+        Button(btn_frame, text="Close", command=self.destroy).pack(side=tk.RIGHT)
+
+        self.tree.bind("<Double-1>", lambda e: self._with_selection(self.on_edit))
+        filter_entry.focus_set()
+        self.refresh()
+
+    def destroy(self):
+        self._cancel_fill()
+        super().destroy()
+
+    def _with_selection(self, fn):
+        selected = self.tree.selection()
+        if selected:
+            fn(selected[0])
+
+    # --- Filling ---
+
+    def refresh(self):
+        # Re-lists from the model (not the profile) for the current filter and sort
+        self._cancel_fill()
+        children = self.tree.get_children()
+        if children:
+            self.tree.delete(*children)
+        self._pending = self.model.keys(self.filter_var.get(), self.sort_column, self.sort_reverse)
+        self._pending.reverse()  # Popped from the end
+        self._update_count()
+        self._fill()
+
+    def _fill(self):
+        self._fill_id = None
+        tree = self.tree
+        rows = self.model.rows
+        pending = self._pending
+        for _ in range(min(FILL_CHUNK, len(pending))):
+            key = pending.pop()
+            tree.insert("", tk.END, iid=key, values=rows[key])
+        if pending:
+            self._fill_id = self.after(1, self._fill)
+
+    def _cancel_fill(self):
+        if self._fill_id is not None:
+            self.after_cancel(self._fill_id)
+            self._fill_id = None
+        self._pending = []
+
+    def _update_count(self):
+        shown = len(self._pending) + len(self.tree.get_children())
+        total = len(self.model)
+        self.count_var.set(f"{shown} of {total}" if shown != total else f"{total} binds")
+
+    def sort_by(self, column):
+        if self.sort_column == column:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_column = column
+            self.sort_reverse = False
+        for name in COLUMNS:
+            arrow = (" ▼" if self.sort_reverse else " ▲") if name == column else ""
+            self.tree.heading(name, text=HEADINGS[name] + arrow)
+        self.refresh()
+
+    # --- Single-row updates ---
+
+    def update_bind(self, key, bind_data, old_key=None, layer=""):
+        # key was added or changed (renamed from old_key)
+        if old_key is not None and old_key != key:
+            self.remove_bind(old_key)
+        old_row = self.model.rows.get(key)
+        row = self.model.set(key, bind_data, layer)
+        if self._pending:
+            self.refresh()  # Still filling; simplest to start over
+            return
+        query = self.filter_var.get()
+        if self.tree.exists(key):
+            column = COLUMNS.index(self.sort_column) if self.sort_column else None
+            if self.model.matches(key, query) and (column is None or old_row[column] == row[column]):
+                self.tree.item(key, values=row)
+                return
+            self.tree.delete(key)  # May have moved, or no longer matches
+        if self.model.matches(key, query):
+            keys = self.model.keys(query, self.sort_column, self.sort_reverse)
+            self.tree.insert("", keys.index(key), iid=key, values=row)
+            self.tree.selection_set(key)
+            self.tree.see(key)
+        self._update_count()
+
+    def remove_bind(self, key):
+        self.model.remove(key)
+        if key in self._pending:
+            self._pending.remove(key)
+        if self.tree.exists(key):
+            self.tree.delete(key)
+        self._update_count()
@@ -0,0 +1,106 @@
+import threading
+import time
+
+# Location capture ("Set Location").
+#
+# A global mouse hook puts a Python callback in front of every mouse event on
+# the system, so it only runs while a capture is in progress. The session ends
+# on the first click, on cancel() (Escape) or after a timeout.
+
+CAPTURE_CLICKED = "clicked"
+CAPTURE_CANCELLED = "cancelled"
+CAPTURE_TIMED_OUT = "timed out"
+
+
+class MouseHookStats:
+    # How much work the mouse hook costs us, for comparing capture-scoped and always-on hooks
+
+    def __init__(self):
+        self.sessions = 0
+        self.cancelled = 0
+        self.timed_out = 0
+        self.events = 0
+        self.callback_ns = 0
+        self.active_ns = 0
+        self._active_since = None
+
+    def hook_started(self):
+        self._active_since = time.perf_counter_ns()
+
+    def hook_stopped(self):
+        if self._active_since is not None:
+            self.active_ns += time.perf_counter_ns() - self._active_since
+            self._active_since = None
+
+    def summary(self):
+        active_ns = self.active_ns
+        if self._active_since is not None:
+            active_ns += time.perf_counter_ns() - self._active_since
+        return {
+            "hook_active_s": active_ns / 1e9,
+            "events": self.events,
+            "callback_ms": self.callback_ns / 1e6,
+            "sessions": self.sessions,
+            "cancelled": self.cancelled,
+            "timed_out": self.timed_out,
+        }
+
+
+class CaptureSession:
+    # on_done(result, x, y) is called once, from the hook or timer thread.
+    # x and y are None unless result is CAPTURE_CLICKED. is_synthetic(pressed)
+    # lets clicks injected by our own actions be ignored.
+
+    def __init__(self, listener_factory, on_done, timeout=30.0, stats=None, is_synthetic=None):
+        self.listener_factory = listener_factory
+        self.on_done = on_done
+        self.timeout = timeout
+        self.stats = stats or MouseHookStats()
+        self.is_synthetic = is_synthetic
+        self._lock = threading.Lock()
+        self._listener = None
+        self._timer = None
+        self._done = False
+
+    def start(self):
+        self.stats.sessions += 1
+        self._listener = self.listener_factory(on_click=self._on_click)
+        self._listener.start()
+        self.stats.hook_started()
+        if self.timeout and self.timeout > 0:
+            self._timer = threading.Timer(self.timeout, self._finish, (CAPTURE_TIMED_OUT,))
+            self._timer.daemon = True
+            self._timer.start()
+
+    def cancel(self):
+        self._finish(CAPTURE_CANCELLED)
+
+    @property
+    def active(self):
+        return not self._done
+
+    def _on_click(self, x, y, button, pressed):
+        start = time.perf_counter_ns()
+        self.stats.events += 1
+        synthetic = self.is_synthetic is not None and self.is_synthetic(pressed)
+        if pressed and not synthetic:
+            self._finish(CAPTURE_CLICKED, x, y)
+        self.stats.callback_ns += time.perf_counter_ns() - start
+        if self._done:
+            return False  # stops the pynput listener from its own thread
+
+    def _finish(self, result, x=None, y=None):
+        with self._lock:
+            if self._done:
+                return
+            self._done = True
+        if self._timer is not None:
+            self._timer.cancel()
+        if self._listener is not None:
+            self._listener.stop()
+        self.stats.hook_stopped()
+        if result == CAPTURE_CANCELLED:
+            self.stats.cancelled += 1
+        elif result == CAPTURE_TIMED_OUT:
+            self.stats.timed_out += 1
+        self.on_done(result, x, y)
@@ -0,0 +1,361 @@
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+from key_utils import parse_combo_string, split_sequence
+from profile_layers import LayerError, parse_layer_text
+
+# Local control socket: line-delimited JSON over a Unix domain socket.
+#
+# Request:   {"id": 1, "cmd": "activate", "profile": "Work"}
+# Response:  {"id": 1, "ok": true, "result": ...}
+#            {"id": 1, "ok": false, "error": "no profile 'Work'"}
+#
+# Commands:
+#   ping
+#   profiles                                  -> {"profiles": [...], "active": name, "stack": [...]}
+#   activate      profile
+#   binds         [profile]                   -> {key: bind}
+#   binds         effective=true              -> {"binds": {key: bind}, "sources": {key: layer}}
+#                 The active profile merged with its layers
+#   set_bind      [profile], key, bind
+#   delete_bind   [profile], key
+#   swap_profile  profile, keybinds, [activate=true]
+#                 Replaces (or creates) a profile's binds in one step
+#   set_layers    [profile], layers=[...]     Profiles to stack it on, bottom first
+#   stats                                     -> pipeline counters and latency summary
+#   batch         commands=[...]              -> list of responses
+#                 Runs together; the bind index is rebuilt once at the end
+#   subscribe     [events=["dispatch", "profile"]]
+#                 The connection then only streams {"event": ...} lines
+#
+# [profile] defaults to the active profile. Changes are made through run(fn),
+# which lets the window apply them on its own thread.
+
+CONTROL_EVENTS = ["dispatch", "profile"]
+
+SUBSCRIBER_QUEUE_SIZE = 1024
+
+
+class ControlError(Exception):
+    pass
+
+
+class _Changes:
+    # What a command (or a whole batch) changed, so the index is rebuilt once
+    def __init__(self):
+        self.rebuild = False
+        self.profiles = False
+        self.activated = None
+
+
+class ControlServer:
+    def __init__(self, engine, path, run=None, on_change=None):
+        # run(fn) -> fn() on the thread that owns the profiles; default: here, under a lock
+        # on_change() is called through run after profiles or binds changed
+        self.engine = engine
+        self.path = path
+        self.on_change = on_change
+        self._lock = threading.Lock()
+        self._run = run or self._run_locked
+        self._server = None
+        self._thread = None
+        self._subscribers = ()  # replaced, never mutated, so publish() needs no lock
+        self.commands = 0
+        self.errors = 0
+        self.events_sent = 0
+        self.events_dropped = 0
+
+        self.handlers = {
+            "ping": self.cmd_ping,
+            "profiles": self.cmd_profiles,
+            "activate": self.cmd_activate,
+            "binds": self.cmd_binds,
+            "set_bind": self.cmd_set_bind,
+            "delete_bind": self.cmd_delete_bind,
+            "swap_profile": self.cmd_swap_profile,
+            "set_layers": self.cmd_set_layers,
+            "stats": self.cmd_stats,
+        }
+
+    def _run_locked(self, fn):
+        with self._lock:
+            return fn()
+
+    # --- Lifecycle ---
+
+    def start(self):
+        if not hasattr(socket, 'AF_UNIX'):
+            raise ControlError("Unix domain sockets are not available on this platform")
+        if os.path.exists(self.path):
+            # A socket left behind by a previous run; refuse if something still answers on it
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+            except OSError:
+                os.unlink(self.path)
+            else:
+                raise ControlError(f"Control socket {self.path} is in use")
+            finally:
+                probe.close()
+
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                server.handle_connection(self.rfile, self.wfile)
+
+        class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+            daemon_threads = True
+
+        old_umask = os.umask(0o177)  # owner-only socket
+        try:
+            self._server = Server(self.path, Handler)
+        finally:
+            os.umask(old_umask)
+        self.engine.observers.append(self.publish)
+        self._thread = threading.Thread(target=self._server.serve_forever, name="ControlServer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._server is None:
+            return
+        if self.publish in self.engine.observers:
+            self.engine.observers.remove(self.publish)
+        for subscriber in self._subscribers:
+            subscriber[1].put(None)
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    # --- Connections ---
+
+    def handle_connection(self, rfile, wfile):
+        for line in rfile:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError:
+                self._send(wfile, {"ok": False, "error": "invalid JSON"})
+                continue
+            if isinstance(request, dict) and request.get("cmd") == "subscribe":
+                self.stream_events(request, wfile)
+                return
+            if not self._send(wfile, self.execute(request)):
+                return
+
+    def _send(self, wfile, message):
+        try:
+            wfile.write(json.dumps(message, separators=(',', ':')).encode('utf-8') + b'\n')
+            wfile.flush()
+            return True
+        except OSError:
+            return False
+
+    def execute(self, request):
+        # One request (or batch) -> one response
+        request_id = request.get("id") if isinstance(request, dict) else None
+        if isinstance(request, dict) and request.get("cmd") == "batch":
+            commands = request.get("commands")
+            if not isinstance(commands, list):
+                return self._error(request_id, "batch needs a list of commands")
+            try:
+                responses = self._run(lambda: self._apply(commands))
+            except ControlError as e:
+                return self._error(request_id, str(e))
+            return {"id": request_id, "ok": True, "result": responses}
+        try:
+            response = self._run(lambda: self._apply([request]))[0]
+        except ControlError as e:
+            return self._error(request_id, str(e))
+        if request_id is not None:
+            response["id"] = request_id
+        return response
+
+    def _apply(self, requests):
+        # Owner thread. Runs every request, then rebuilds and notifies once.
+        changes = _Changes()
+        responses = []
+        for request in requests:
+            self.commands += 1
+            request_id = request.get("id") if isinstance(request, dict) else None
+            try:
+                if not isinstance(request, dict) or request.get("cmd") not in self.handlers:
+                    raise ControlError(f"unknown command {request.get('cmd') if isinstance(request, dict) else request!r}")
+                result = self.handlers[request["cmd"]](request, changes)
+                response = {"ok": True, "result": result}
+            except ControlError as e:
+                response = {"ok": False, "error": str(e)}
+                self.errors += 1
+            except Exception as e:
+                print(f"Control command failed: {request!r}: {e}")
+                response = {"ok": False, "error": f"internal error: {e}"}
+                self.errors += 1
+            if request_id is not None:
+                response["id"] = request_id
+            responses.append(response)
+        if changes.rebuild:
+            self.engine.rebuild_bind_index()
+        if changes.activated is not None:
+            self.engine.emit({"event": "profile", "profile": changes.activated})
+        if (changes.rebuild or changes.profiles) and self.on_change is not None:
+            self.on_change()
+        return responses
+
+    def _error(self, request_id, message):
+        self.errors += 1
+        return {"id": request_id, "ok": False, "error": message}
+
+    # --- Events ---
+
+    def stream_events(self, request, wfile):
+        kinds = request.get("events") or CONTROL_EVENTS
+        subscriber = (set(kinds), queue.Queue(SUBSCRIBER_QUEUE_SIZE))
+        with self._lock:
+            self._subscribers += (subscriber,)
+        try:
+            if not self._send(wfile, {"id": request.get("id"), "ok": True, "result": sorted(subscriber[0])}):
+                return
+            while True:
+                event = subscriber[1].get()
+                if event is None or not self._send(wfile, event):
+                    return
+                self.events_sent += 1
+        finally:
+            with self._lock:
+                self._subscribers = tuple(s for s in self._subscribers if s is not subscriber)
+
+    def publish(self, event):
+        # Engine observer, runs on the listener / repeat thread: never blocks
+        for kinds, events in self._subscribers:
+            if event["event"] in kinds:
+                try:
+                    events.put_nowait(event)
+                except queue.Full:
+                    self.events_dropped += 1
+
+    # --- Commands (owner thread) ---
+
+    def _profile(self, request):
+        name = request.get("profile", self.engine.active_profile)
+        if name not in self.engine.profiles:
+            raise ControlError(f"no profile {name!r}")
+        return name
+
+    def _key(self, request):
+        key = request.get("key")
+        if not isinstance(key, str) or any(parse_combo_string(step) is None for step in split_sequence(key)):
+            raise ControlError(f"invalid key {key!r}")
+        return key
+
+    def _bind(self, value):
+        if isinstance(value, list) and len(value) == 2:
+            return list(value)
+        if isinstance(value, dict) and isinstance(value.get("type"), str):
+            return dict(value)
+        raise ControlError(f"invalid bind {value!r}")
+
+    def cmd_ping(self, request, changes):
+        return "pong"
+
+    def cmd_profiles(self, request, changes):
+        return {"profiles": list(self.engine.profiles.keys()), "active": self.engine.active_profile,
+                "stack": list(self.engine.active_stack)}
+
+    def cmd_activate(self, request, changes):
+        name = self._profile(request)
+        self.engine.active_profile = name
+        changes.rebuild = True
+        changes.activated = name
+        return name
+
+    def cmd_binds(self, request, changes):
+        # effective=true: the active profile's merged stack, with each bind's layer
+        if request.get("effective"):
+            return {"binds": dict(self.engine.effective_binds), "sources": dict(self.engine.bind_sources)}
+        return dict(self.engine.profiles[self._profile(request)]['keybinds'])
+
+    def cmd_set_bind(self, request, changes):
+        name = self._profile(request)
+        self.engine.store.set_bind(name, self._key(request), self._bind(request.get("bind")))
+        changes.rebuild = changes.rebuild or self.engine.uses_profile(name)
+        return None
+
+    def cmd_delete_bind(self, request, changes):
+        name = self._profile(request)
+        key = self._key(request)
+        if key not in self.engine.profiles[name]['keybinds']:
+            raise ControlError(f"no bind {key!r} in {name!r}")
+        self.engine.store.delete_bind(name, key)
+        changes.rebuild = changes.rebuild or self.engine.uses_profile(name)
+        return None
+
+    def cmd_swap_profile(self, request, changes):
+        name = request.get("profile")
+        keybinds = request.get("keybinds")
+        if not isinstance(name, str) or not name:
+            raise ControlError("swap_profile needs a profile name")
+        if not isinstance(keybinds, dict):
+            raise ControlError("swap_profile needs keybinds")
+        # Validate everything before touching the store
+        binds = {self._key({"key": key}): self._bind(bind) for key, bind in keybinds.items()}
+        store = self.engine.store
+        if name in self.engine.profiles:
+            store.set_profile_field(name, 'keybinds', binds)
+        else:
+            store.add_profile(name, {'keybinds': binds})
+            changes.profiles = True
+        if request.get("activate", True):
+            self.engine.active_profile = name
+            changes.activated = name
+        changes.rebuild = changes.rebuild or name == self.engine.active_profile or self.engine.uses_profile(name)
+        return len(binds)
+
+    def cmd_set_layers(self, request, changes):
+        name = self._profile(request)
+        layers = request.get("layers")
+        if isinstance(layers, list) and all(isinstance(layer, str) for layer in layers):
+            layers = ", ".join(layers)
+        if not isinstance(layers, str):
+            raise ControlError("set_layers needs a list of profile names")
+        try:
+            layers = parse_layer_text(layers, self.engine.profiles, name)
+        except LayerError as e:
+            raise ControlError(str(e))
+        self.engine.store.set_profile_field(name, 'layers', layers)
+        changes.rebuild = changes.rebuild or self.engine.uses_profile(name)
+        return layers
+
+    def cmd_stats(self, request, changes):
+        stats = self.engine.stats()
+        stats["Control"] = {
+            "commands": self.commands,
+            "errors": self.errors,
+            "subscribers": len(self._subscribers),
+            "events_sent": self.events_sent,
+            "events_dropped": self.events_dropped,
+        }
+        stats["Latency"] = self.engine.latency.summary()
+        return stats
+
+
+def start_control_server(engine, run=None, on_change=None):
+    # Starts the server if "control_socket" is set; returns it, or None
+    path = engine.settings['control_socket']
+    if not path:
+        return None
+    server = ControlServer(engine, path, run, on_change)
+    try:
+        server.start()
+    except (ControlError, OSError) as e:
+        print(f"Control socket disabled: {e}")
+        return None
+    return server
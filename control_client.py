@@ -0,0 +1,99 @@
+import argparse
+import json
+import socket
+import sys
+
+# Client for the control socket (see control.py). Standard library only, so
+# other tools can use (or copy) it without the app's dependencies. As a module:
+#   client = ControlClient("autokeybind.sock")
+#   client.call("activate", profile="Work")
+#   client.batch([{"cmd": "set_bind", "key": "F1", "bind": [10, 20]}, {"cmd": "activate", "profile": "Work"}])
+# or from the shell:
+#   python control_client.py autokeybind.sock activate profile=Work
+#   python control_client.py autokeybind.sock subscribe
+
+
+class ControlError(Exception):
+    pass
+
+
+class ControlClient:
+    def __init__(self, path, timeout=5.0):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(path)
+        self.file = self.sock.makefile('rwb')
+        self._next_id = 0
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def request(self, message):
+        # Sends one request and returns the raw response dict
+        self._next_id += 1
+        message = dict(message, id=self._next_id)
+        self.file.write(json.dumps(message, separators=(',', ':')).encode('utf-8') + b'\n')
+        self.file.flush()
+        line = self.file.readline()
+        if not line:
+            raise ControlError("connection closed")
+        return json.loads(line)
+
+    def call(self, cmd, **args):
+        response = self.request(dict(args, cmd=cmd))
+        if not response.get("ok"):
+            raise ControlError(response.get("error"))
+        return response.get("result")
+
+    def batch(self, commands):
+        # Returns the list of per-command responses (each with "ok")
+        return self.call("batch", commands=commands)
+
+    def subscribe(self, events=None):
+        # Yields event dicts until the server closes the connection
+        self.sock.settimeout(None)
+        self.call("subscribe", events=events)
+        for line in self.file:
+            yield json.loads(line)
+
+
+def parse_arg(text):
+    # name=value, value parsed as JSON when possible
+    name, _, value = text.partition('=')
+    try:
+        return name, json.loads(value)
+    except ValueError:
+        return name, value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Send a command to a running XvG Auto Keybind.")
+    parser.add_argument("socket", help="path of the control socket")
+    parser.add_argument("cmd", help="command, e.g. ping, profiles, activate, stats, subscribe")
+    parser.add_argument("args", nargs="*", help="name=value arguments")
+    args = parser.parse_args(argv)
+
+    with ControlClient(args.socket) as client:
+        params = dict(parse_arg(a) for a in args.args)
+        try:
+            if args.cmd == "subscribe":
+                for event in client.subscribe(params.get("events")):
+                    print(json.dumps(event), flush=True)
+                return
+            print(json.dumps(client.call(args.cmd, **params), indent=4))
+        except ControlError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
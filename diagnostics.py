@@ -0,0 +1,190 @@
+import collections
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+# On-demand diagnostics, started and stopped from the tray menu.
+#
+#   CPU profiler   a background thread samples the stack of every thread
+#                  (keyboard and mouse hooks, executor, tray, Tk) every
+#                  interval_ms via sys._current_frames(); the hooked code
+#                  itself is never instrumented
+#   Memory         tracemalloc snapshots; each one is written with the
+#                  biggest allocation sites and its growth since the last
+#
+# Reports go into one timestamped folder per run under the diagnostics
+# directory. Nothing here runs or is traced until it is switched on.
+
+TOP_ENTRIES = 40
+
+
+class Diagnostics:
+    def __init__(self, directory, interval_ms=5, memory_frames=8):
+        self.directory = directory
+        self.interval_ms = interval_ms
+        self.memory_frames = memory_frames
+        self._run_dir = None
+        self._lock = threading.Lock()
+        self._profiler = None
+        self._previous_snapshot = None
+        self._reports = 0
+
+    def _report_path(self, name):
+        # Lock held. The run folder is created on the first report.
+        if self._run_dir is None:
+            self._run_dir = os.path.join(self.directory, time.strftime("%Y%m%d-%H%M%S"))
+            os.makedirs(self._run_dir, exist_ok=True)
+        self._reports += 1
+        return os.path.join(self._run_dir, f"{self._reports:02d}-{name}")
+
+    # --- CPU ---
+
+    @property
+    def profiling(self):
+        return self._profiler is not None
+
+    def start_profiler(self):
+        with self._lock:
+            if self._profiler is None:
+                self._profiler = SamplingProfiler(self.interval_ms)
+                self._profiler.start()
+
+    def stop_profiler(self):
+        # Returns the report path, or None if the profiler was not running
+        with self._lock:
+            profiler = self._profiler
+            self._profiler = None
+            if profiler is None:
+                return None
+            profiler.stop()
+            path = self._report_path("cpu.txt")
+            profiler.write_report(path)
+            profiler.write_collapsed(path[:-len(".txt")] + "-stacks.txt")
+            return path
+
+    # --- Memory ---
+
+    @property
+    def tracing_memory(self):
+        return tracemalloc.is_tracing()
+
+    def memory_snapshot(self, state=None):
+        # Starts tracing on first use; every later call writes a snapshot and
+        # what grew since the previous one. state: {name: size} of app
+        # containers worth watching. Returns the report path or None.
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.memory_frames)
+                self._previous_snapshot = tracemalloc.take_snapshot()
+                return None
+            snapshot = tracemalloc.take_snapshot()
+            path = self._report_path("memory.txt")
+            write_memory_report(path, snapshot, self._previous_snapshot, state)
+            self._previous_snapshot = snapshot
+            return path
+
+    def stop_memory(self):
+        with self._lock:
+            self._previous_snapshot = None
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+
+    def stop(self):
+        self.stop_profiler()
+        self.stop_memory()
+
+
+class SamplingProfiler:
+    def __init__(self, interval_ms=5):
+        self.interval = max(0.001, interval_ms / 1000.0)
+        self.stacks = collections.Counter()  # (thread name, frames root first) -> samples
+        self.samples = 0
+        self.started = 0.0
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="SamplingProfiler", daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.elapsed = time.perf_counter() - self.started
+
+    def _run(self):
+        own = threading.get_ident()
+        code_names = {}
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    name = code_names.get(code)
+                    if name is None:
+                        name = code_names[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                    stack.append(name)
+                    frame = frame.f_back
+                stack.reverse()
+                self.stacks[(names.get(ident, str(ident)), tuple(stack))] += 1
+            self.samples += 1
+
+    def write_collapsed(self, path):
+        # "thread;outer;...;inner count" lines, the input format of flamegraph tools
+        with open(path, 'w') as file:
+            for (thread, stack), count in self.stacks.most_common():
+                file.write(";".join((thread,) + stack) + f" {count}\n")
+
+    def write_report(self, path):
+        own = collections.Counter()  # function -> samples where it was running
+        total = collections.Counter()  # function -> samples where it was on the stack
+        threads = collections.Counter()
+        for (thread, stack), count in self.stacks.items():
+            threads[thread] += count
+            if stack:
+                own[stack[-1]] += count
+            for name in set(stack):
+                total[name] += count
+        with open(path, 'w') as file:
+            file.write(f"CPU profile: {self.samples} samples over {self.elapsed:.1f} s, "
+                       f"every {self.interval * 1000:.0f} ms\n")
+            file.write("Idle threads (waiting in the OS or a lock) show up as their wait call.\n\n")
+            file.write("Samples per thread:\n")
+            for thread, count in threads.most_common():
+                file.write(f"  {count:8d}  {thread}\n")
+            for title, counter in (("Running (self)", own), ("On the stack (cumulative)", total)):
+                file.write(f"\n{title}:\n")
+                for name, count in counter.most_common(TOP_ENTRIES):
+                    share = 100.0 * count / self.samples if self.samples else 0.0
+                    file.write(f"  {count:8d} {share:6.1f}%  {name}\n")
+
+
+def write_memory_report(path, snapshot, previous=None, state=None):
+    snapshot = snapshot.filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),))
+    traced, peak = tracemalloc.get_traced_memory()
+    with open(path, 'w') as file:
+        file.write(f"Traced memory: {traced / 1024:.1f} KiB now, {peak / 1024:.1f} KiB peak\n")
+        if state:
+            file.write("\nApp state:\n")
+            for name, size in state.items():
+                file.write(f"  {size:10}  {name}\n")
+        if previous is not None:
+            previous = previous.filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),))
+            file.write("\nGrowth since the previous snapshot:\n")
+            for stat in snapshot.compare_to(previous, 'lineno')[:TOP_ENTRIES]:
+                if stat.size_diff or stat.count_diff:
+                    file.write(f"  {stat.size_diff / 1024:+10.1f} KiB {stat.count_diff:+8d} blocks  {stat.traceback[0]}\n")
+        file.write("\nLargest allocation sites:\n")
+        for stat in snapshot.statistics('lineno')[:TOP_ENTRIES]:
+            file.write(f"  {stat.size / 1024:10.1f} KiB {stat.count:8d} blocks  {stat.traceback[0]}\n")
+        file.write("\nLargest allocation call stacks:\n")
+        for stat in snapshot.statistics('traceback')[:10]:
+            file.write(f"\n  {stat.size / 1024:.1f} KiB in {stat.count} blocks\n")
+            for line in stat.traceback.format():
+                file.write(f"    {line}\n")
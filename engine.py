@@ -0,0 +1,480 @@
+import os
+import time
+from pynput.keyboard import Listener, Key
+from bind_index import compile_bind_index, CompiledBind, KeyState
+from action_executor import ActionExecutor
+from injection import create_backend
+from latency import LatencyRecorder, now_ns, SAMPLE_QUEUED, SAMPLE_INJECT_START, SAMPLE_INJECT_END
+from persistence import PersistenceWorker
+from profile_store import ProfileStore
+from triggers import TriggerEngine
+from sequences import SequenceMatcher, compile_sequence_trie, trie_binds
+from macro import MacroScheduler, compile_profile_macros
+from synthetic import SyntheticFilter
+from pixel_guard import compile_profile_guards
+from profile_layers import resolve_stack, merge_stack
+from motion import MotionError, MotionPlayer, compile_motion
+from actions import (ACTION_CLICK_RETURN, ACTION_CLICK_STAY, ACTION_DOUBLE_CLICK_RETURN, ACTION_DRAG_RETURN,
+                     ACTION_MACRO, ACTION_FIND_IMAGE, DEFAULT_ACTION_DELAYS)
+
+# The hotkey engine: keyboard listener, bind index, dispatch and persistence.
+# No Tk in here (or anything importing it); the window in autokeybind.py and
+# headless mode (headless.py) both drive this class.
+
+DEFAULT_PROFILE = "Default"
+
+
+def _valid_coords(coords):
+    return (isinstance(coords, (list, tuple)) and len(coords) == 2
+            and all(isinstance(c, (int, float)) and not isinstance(c, bool) for c in coords))
+
+
+class DispatchEngine:
+    def __init__(self, settings):
+        self.settings = settings
+        self.key_state = KeyState()
+        self.bind_index = {}
+
+        # Input injection (pynput by default) and per-action step delays.
+        # Events we inject are recognised and dropped by our own listeners.
+        self.synthetic = SyntheticFilter(self.settings['synthetic_filter'], self.settings['synthetic_ttl_ms'])
+        self.backend = self.synthetic.wrap(create_backend(self.settings['injection_backend']))
+        self.action_delays = dict(DEFAULT_ACTION_DELAYS)
+        self.action_delays.update(self.settings['action_delays'])
+
+        # Actions run here, never on the listener thread
+        self.executor = ActionExecutor(self.settings['executor_policy'], self.settings['executor_queue_size'])
+
+        # Press-to-injection timing, see latency.py
+        self.latency = LatencyRecorder(self.settings['latency_buffer_size'])
+
+        # Press / release / hold-to-repeat handling, rate limits and debounce
+        self.triggers = TriggerEngine(self.fire_bind)
+        # Key sequences and double taps, in front of the trigger engine
+        self.sequences = SequenceMatcher(self.triggers, self.settings['sequence_ambiguity_ms'])
+
+        # Macro binds are compiled with the index and run by this scheduler
+        self.macros = MacroScheduler(self.backend, self.settings['macro_spin_us'] * 1000)
+        self.macro_programs = {}
+
+        # Image binds: templates prepared with the index, matched on the executor
+        # thread. image_match (and numpy) is only imported once a profile uses one.
+        self.image_targets = {}
+        self.image_matcher = None
+
+        # Pixel guards, checked by the sampler (screen_sampler.py, numpy) on
+        # the executor thread just before the guarded action runs
+        self.guard_sampler = None
+
+        # Gliding cursor moves for binds with a "motion" setting. Paths are
+        # built by motion_path.py (numpy), imported once a profile uses one.
+        self.motion_player = MotionPlayer(self.settings['macro_spin_us'] * 1000)
+        self.motion_paths = None
+
+        # What each plain action type runs, as handler(x, y, delay, motion)
+        self.action_handlers = {
+            ACTION_CLICK_RETURN: self.click_return,
+            ACTION_CLICK_STAY: self.click_stay,
+            ACTION_DOUBLE_CLICK_RETURN: self.double_click_return,
+            ACTION_DRAG_RETURN: self.drag_return,
+        }
+        # Binds left out of the index at the last rebuild, with the reason
+        self.bind_errors = []
+        self.active_binds = 0
+
+        # Profiles; a plain dict until open_store() is called (benchmarks use that)
+        self.profiles = {}
+        self.store = None
+        self.persistence = None
+        self.active_profile = None
+        # The active profile's layer stack (bottom to top) and the merged
+        # binds it adds up to, with the profile each bind comes from
+        self.active_stack = []
+        self.effective_binds = {}
+        self.bind_sources = {}
+
+        self.keyboard_listener = None
+        # While set, Escape is swallowed and this is called instead (listener thread)
+        self.escape_handler = None
+        # on_saved(written, elapsed, error), called on the persistence thread
+        self.on_saved = None
+        # Callables receiving event dicts ("dispatch", "profile"); see emit()
+        self.observers = []
+        # Session recorder (session_log.py) while recording, else None
+        self.session = None
+
+    # --- Profiles ---
+
+    def open_store(self):
+        # Profiles live in a journaled store (see profile_store.py). Callers
+        # read self.profiles like a dict and change it through the store's
+        # methods; journal entries are written by a background worker.
+        # Returns a list of load warnings.
+        self.store = ProfileStore(self.settings['profile_store_dir'], 'profiles.json',
+                                  self.settings['compact_threshold_kb'] * 1024)
+        self.persistence = PersistenceWorker(self.write_profiles, self.settings['save_delay_ms'] / 1000.0,
+                                             on_result=self.on_profiles_saved)
+        self.store.on_change = self.save_profiles
+
+        # Only the index is read here; profiles are decoded when first used.
+        # Unreadable files are set aside (not discarded) and reported.
+        warnings = self.store.open()
+        self.profiles = self.store
+
+        if not self.profiles:
+            self.store.add_profile(DEFAULT_PROFILE)
+        return warnings
+
+    def load_profiles(self, preferred=None):
+        # Picks the active profile (preferred, else Default, else the first) and arms it
+        if preferred in self.profiles:
+            self.active_profile = preferred
+        elif self.active_profile not in self.profiles:
+            if DEFAULT_PROFILE in self.profiles:
+                self.active_profile = DEFAULT_PROFILE
+            else:
+                self.active_profile = list(self.profiles.keys())[0]
+        self.rebuild_bind_index()
+
+    def activate_profile(self, name):
+        if name not in self.profiles:
+            return False
+        self.active_profile = name
+        self.rebuild_bind_index()
+        if self.observers:
+            self.emit({"event": "profile", "profile": name})
+        return True
+
+    def uses_profile(self, name):
+        # True if a change to profile name changes the active binds
+        return name in self.active_stack
+
+    def rebuild_bind_index(self):
+        # Called whenever the active profile, its layers or any of their binds
+        # change. The layers are merged and everything is compiled first and
+        # then swapped in, so the listener thread never waits and only ever
+        # sees a fully built index. Binds that cannot run are reported here
+        # rather than skipped when their key is pressed.
+        errors = []
+        stack = resolve_stack(self.profiles, self.active_profile, errors)
+        binds, sources = merge_stack(self.profiles, stack)
+        if stack:
+            macro_programs, macro_errors = compile_profile_macros(binds, ACTION_MACRO)
+            errors += macro_errors
+            image_targets = self.compile_image_targets(binds, errors)
+            bind_guards, guard_errors = compile_profile_guards(binds)
+            errors += guard_errors
+            compiled = self.compile_binds(binds, macro_programs, image_targets, bind_guards, errors)
+            bind_index = compile_bind_index(binds, compiled, errors)
+            trie = compile_sequence_trie(binds, compiled, self.settings['sequence_timeout_ms'], errors)
+        else:
+            bind_index = {}
+            trie = {}
+            macro_programs = {}
+            image_targets = {}
+            bind_guards = {}
+        for error in errors:
+            print(error)
+        if bind_guards or self.guard_sampler is not None:
+            self.update_guard_sampler(bind_guards)
+        self.macro_programs = macro_programs
+        self.image_targets = image_targets
+        self.bind_errors = errors
+        self.active_stack = stack
+        self.effective_binds = binds
+        self.bind_sources = sources
+        self.active_binds = len({entry[0] for entry in bind_index.values()} | trie_binds(trie))
+        self.bind_index = bind_index
+        self.sequences.set_tables(bind_index, trie)
+        if self.session is not None:
+            self.session.binds(binds)
+
+    def compile_binds(self, binds, macro_programs, image_targets, bind_guards, errors):
+        # {key: CompiledBind} for every bind that can run
+        compiled = {}
+        for key, bind_data in binds.items():
+            if isinstance(bind_data, list):
+                action_type, coords = ACTION_CLICK_RETURN, bind_data
+            elif isinstance(bind_data, dict):
+                action_type, coords = bind_data.get('type', ACTION_CLICK_RETURN), bind_data.get('coords')
+            else:
+                errors.append(f"Bind '{key}': not a bind: {bind_data!r}")
+                continue
+
+            if action_type == ACTION_MACRO:
+                program = macro_programs.get(key)
+                if not program:
+                    continue  # Reported by compile_profile_macros
+                bind = CompiledBind(key, action_type, self.macros.run, (key, program, self.executor.cancel_event), True)
+            elif action_type == ACTION_FIND_IMAGE:
+                target = image_targets.get(key)
+                if target is None:
+                    continue  # Reported by compile_image_targets
+                bind = CompiledBind(key, action_type, self.find_image_and_click, (target,))
+            else:
+                if not _valid_coords(coords):
+                    errors.append(f"Bind '{key}': needs coordinates [x, y], got {coords!r}")
+                    continue
+                handler = self.action_handlers.get(action_type)
+                if handler is None:
+                    errors.append(f"Bind '{key}': unknown action type {action_type!r}, clicking and returning")
+                    handler = self.click_return
+                delay = self.action_delays.get(action_type, 0.0)
+                motion = self.compile_bind_motion(key, bind_data, errors)
+                bind = CompiledBind(key, action_type, handler, (coords[0], coords[1], delay, motion))
+
+            if key in bind_guards:
+                bind.func, bind.args = self.run_guarded, (key, bind.func, bind.args)
+            compiled[key] = bind
+        return compiled
+
+    def compile_bind_motion(self, key, bind_data, errors):
+        # MotionSpec for the bind, with its path template built now rather
+        # than on the first key press; a bad setting jumps as before
+        if not isinstance(bind_data, dict) or bind_data.get('motion') is None:
+            return None
+        try:
+            motion = compile_motion(bind_data['motion'])
+        except MotionError as e:
+            errors.append(f"Bind '{key}': {e}")
+            return None
+        if motion is None:
+            return None
+        if self.motion_paths is None:
+            try:
+                from motion_path import PathCache
+            except ImportError as e:
+                errors.append(f"Bind '{key}': smooth motion needs numpy ({e})")
+                return None
+            self.motion_paths = PathCache()
+        self.motion_paths.prepare(motion)
+        return motion
+
+    def glide(self, start, end, motion):
+        # Executor thread: move the cursor from start to end along the bind's path
+        if motion is None:
+            self.backend.move(*end)
+            return
+        points = self.motion_paths.path(motion, start, end)
+        self.motion_player.play(self.backend, points, motion.interval_ns, self.executor.cancel_event)
+
+    def compile_image_targets(self, binds, errors):
+        if not any(isinstance(b, dict) and b.get('type') == ACTION_FIND_IMAGE for b in binds.values()):
+            return {}
+        try:
+            from image_match import compile_profile_images
+        except ImportError as e:
+            errors.append(f"Image binds disabled: {e}")
+            return {}
+        targets, image_errors = compile_profile_images(binds, ACTION_FIND_IMAGE, self.settings['image_threshold'],
+                                                       self.settings['image_coarse_scale'], self.image_targets)
+        errors += image_errors
+        return targets
+
+    def update_guard_sampler(self, bind_guards):
+        # Guarded binds do not fire if their guards cannot be checked
+        if self.guard_sampler is None:
+            try:
+                from image_match import PilGrabber
+                from screen_sampler import ScreenSampler
+                self.guard_sampler = ScreenSampler(PilGrabber(), self.settings['guard_max_age_ms'])
+            except ImportError as e:
+                print(f"Pixel guards unavailable, guarded binds will not fire: {e}")
+                return
+        self.guard_sampler.set_guards(bind_guards)
+
+    def emit(self, event):
+        for observer in self.observers:
+            observer(event)
+
+    def save_profiles(self):
+        # Cheap: the write happens on the persistence worker once edits settle
+        self.persistence.request_save()
+
+    def write_profiles(self):
+        # Persistence worker thread: append the journal, fold it in when large
+        written = self.store.flush()
+        if self.store.needs_compaction():
+            self.store.compact()
+        return written
+
+    def on_profiles_saved(self, written, elapsed, error):
+        if error is not None:
+            print(f"Save failed: {error}")
+        if self.on_saved is not None:
+            self.on_saved(written, elapsed, error)
+
+    # --- Dispatch ---
+
+    def click_return(self, x, y, delay, motion=None):
+        backend = self.backend
+        original_position = backend.position()
+        if motion is not None:
+            self.glide(original_position, (x, y), motion)
+        backend.click(x, y)
+        self.executor.wait(delay)
+        self.glide((x, y), original_position, motion)
+
+    def click_stay(self, x, y, delay, motion=None):
+        if motion is not None:
+            self.glide(self.backend.position(), (x, y), motion)
+        self.backend.click(x, y)
+        # Do not return
+
+    def double_click_return(self, x, y, delay, motion=None):
+        backend = self.backend
+        original_position = backend.position()
+        if motion is not None:
+            self.glide(original_position, (x, y), motion)
+        backend.click(x, y, 2)
+        self.executor.wait(delay)
+        self.glide((x, y), original_position, motion)
+
+    def drag_return(self, x, y, delay, motion=None):
+        # Move to target, hold down, move back, release. With a motion the
+        # way back is a path of small moves, which some targets need to see
+        # a drag at all.
+        backend = self.backend
+        original_position = backend.position()
+        self.glide(original_position, (x, y), motion)
+        backend.mouse_down()
+        self.executor.wait(delay) # Hold for stability, cut short if preempted
+        try:
+            self.glide((x, y), original_position, motion)
+        finally:
+            backend.mouse_up()
+
+    def find_image_and_click(self, target):
+        # Executor thread: the screen is searched here, never on the listener thread
+        if self.image_matcher is None:
+            from image_match import ImageMatcher, PilGrabber
+            self.image_matcher = ImageMatcher(PilGrabber())
+        point = self.image_matcher.locate(target)
+        if point is not None:
+            self.click_return(point[0], point[1], self.action_delays.get(ACTION_FIND_IMAGE, 0.0))
+
+    def on_key_press(self, key):
+        pressed_at = now_ns()
+        if self.synthetic.is_own_key(key, True):
+            return
+        if self.session is not None:
+            self.session.key(True, key, pressed_at)
+        escape_handler = self.escape_handler
+        if escape_handler is not None and key == Key.esc:
+            escape_handler()
+            return
+        fresh = self.key_state.press(key)
+        self.check_and_perform_action(pressed_at, fresh)
+
+    def on_key_release(self, key):
+        if self.synthetic.is_own_key(key, False):
+            return
+        if self.session is not None:
+            self.session.key(False, key)
+        self.key_state.release(key)
+        self.sequences.release(now_ns())
+
+    def check_and_perform_action(self, pressed_at=None, fresh=True):
+        # Side and case rules (legacy lower-case binds, generic "Ctrl") are
+        # resolved when the index is compiled, so this is a single probe.
+        # Sequences add one more probe while one is in progress.
+        self.sequences.press(self.key_state.combo, fresh, pressed_at or now_ns())
+
+    def fire_bind(self, match, pressed_at, repeated):
+        # Called by the trigger engine (listener or repeat thread)
+        self.execute_bind(match[1], pressed_at, now_ns(), repeated)
+
+    def execute_bind(self, bind, pressed_at=None, resolved_at=None, repeated=False):
+        # bind is a CompiledBind from the index
+        if self.session is not None:
+            self.session.fired(bind.key, resolved_at)
+        if bind.is_macro and self.macros.is_running(bind.key):
+            # Pressing the key of a running macro cancels it (hold-to-repeat just waits)
+            if not repeated:
+                self.macros.cancel(bind.key)
+            return
+
+        if resolved_at is None:
+            resolved_at = now_ns()
+        sample = [bind.key, bind.action_type, pressed_at or resolved_at, resolved_at, 0, 0, 0]
+        sample[SAMPLE_QUEUED] = now_ns()
+        # Hand off to the executor so the keyboard hook returns immediately
+        self.executor.submit(bind.key, self.run_action, sample, bind.func, bind.args)
+        if self.observers:
+            self.emit({"event": "dispatch", "bind": bind.key, "action": bind.action_type, "repeated": repeated, "t_ns": resolved_at})
+
+    def run_guarded(self, bind_key, func, args):
+        # Executor thread: the screen is sampled here, not on the listener thread
+        sampler = self.guard_sampler
+        if sampler is not None and sampler.check(bind_key):
+            func(*args)
+
+    def run_action(self, sample, func, args):
+        # Executor thread: perform the action and record its latency sample
+        sample[SAMPLE_INJECT_START] = now_ns()
+        try:
+            func(*args)
+        finally:
+            sample[SAMPLE_INJECT_END] = now_ns()
+            self.latency.record(sample)
+
+    # --- Lifecycle ---
+
+    def start(self):
+        self.executor.start()
+        self.triggers.start()
+        # No mouse listener here: the window hooks the mouse only while capturing a location
+        self.keyboard_listener = Listener(on_press=self.on_key_press, on_release=self.on_key_release,
+                                          **self.synthetic.listener_kwargs("keyboard"))
+        self.keyboard_listener.start()
+        if self.persistence is not None:
+            self.persistence.start()
+        if self.settings['session_record_dir']:
+            self.start_session_recording(self.settings['session_record_dir'])
+
+    def stop(self):
+        if self.keyboard_listener is not None:
+            self.keyboard_listener.stop()
+        self.stop_session_recording()
+        self.triggers.stop()
+        self.executor.stop()
+        if self.persistence is not None:
+            self.persistence.stop() # Writes anything still pending
+
+    def start_session_recording(self, directory):
+        # Records keys and fired binds to <directory>/session-<time>.akbs (see session_log.py)
+        from session_log import SessionRecorder
+        try:
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, time.strftime("session-%Y%m%d-%H%M%S.akbs"))
+            recorder = SessionRecorder(path, self.settings['session_chunk_events'], info={"profile": self.active_profile})
+        except OSError as e:
+            print(f"Session recording disabled: {e}")
+            return None
+        recorder.binds(self.effective_binds)
+        self.session = recorder
+        return path
+
+    def stop_session_recording(self):
+        recorder = self.session
+        self.session = None
+        if recorder is not None:
+            recorder.close()
+
+    def stats(self):
+        counters = {"Triggers": self.triggers.stats(), "Sequences": self.sequences.stats(), "Executor": self.executor.stats(), "Macros": self.macros.stats.summary()}
+        if self.store is not None:
+            counters["Store"] = self.store.stats()
+        counters["Synthetic Input"] = self.synthetic.stats()
+        counters["Binds"] = {"active": self.active_binds, "invalid": len(self.bind_errors),
+                             "layers": max(0, len(self.active_stack) - 1)}
+        if self.session is not None:
+            counters["Session Recording"] = self.session.stats()
+        if self.motion_paths is not None:
+            counters["Motion"] = dict(self.motion_player.stats.summary(), **self.motion_paths.stats())
+        if self.guard_sampler is not None:
+            counters["Pixel Guards"] = self.guard_sampler.stats()
+        if self.image_matcher is not None:
+            for name, summary in self.image_matcher.stats.summary().items():
+                counters[f"Image {name}"] = summary
+        return counters
@@ -0,0 +1,55 @@
+import signal
+import threading
+from engine import DispatchEngine
+from settings import load_settings
+from control import start_control_server
+from window_rules import start_window_watcher
+
+# Hotkeys without a window: listeners, dispatch and persistence only. Uses the
+# same settings.json and profile store as the window (including the one-time
+# import of profiles.json). Runs until SIGINT/SIGTERM (Ctrl+C).
+
+STOP_SIGNALS = ("SIGINT", "SIGTERM", "SIGHUP", "SIGBREAK")
+
+
+def run(profile=None, startup_timer=None):
+    engine = DispatchEngine(load_settings())
+    for warning in engine.open_store():
+        print(warning)
+    engine.load_profiles(profile)
+    if profile is not None and engine.active_profile != profile:
+        print(f"No profile named '{profile}', using '{engine.active_profile}'")
+
+    stop = threading.Event()
+
+    def on_signal(signum, frame):
+        stop.set()
+
+    for name in STOP_SIGNALS:
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), on_signal)
+
+    engine.start()
+    # Control commands and window rules both change the active profile; one at a time
+    lock = threading.Lock()
+
+    def locked(fn):
+        with lock:
+            return fn()
+
+    control = start_control_server(engine, locked)
+    watcher = start_window_watcher(engine.settings, lambda profile: locked(lambda: engine.activate_profile(profile)))
+    if startup_timer is not None:
+        startup_timer.mark("listeners armed")
+        startup_timer.report()
+    print(f"Running headless with profile '{engine.active_profile}' ({len(engine.effective_binds)} binds). Ctrl+C to stop.")
+
+    # Wake up now and then; on Windows signals are only delivered between waits
+    while not stop.wait(0.5):
+        pass
+    if watcher is not None:
+        watcher.stop()
+    if control is not None:
+        control.stop()
+    engine.stop()
+    print("Stopped.")
@@ -0,0 +1,335 @@
+import sys
+import time
+import numpy as np
+
+# "Find Image & Click" targets.
+#
+# A bind stores the template image and, optionally, where to look:
+#   {"type": "Find Image & Click", "image": "ok_button.png",
+#    "region": [x, y, w, h], "threshold": 0.9, "offset": [dx, dy]}
+# Templates are decoded and prepared once, when the profile is loaded. A
+# lookup then:
+#   1. re-checks the last hit: one template-sized grab and a single score,
+#   2. otherwise grabs the search region, scores a downscaled copy to find
+#      candidates (coarse pass) and re-scores small full resolution windows
+#      around them (fine pass).
+# Scores are normalised cross-correlation (-1..1), computed for every window
+# position at once with FFTs and summed-area tables.
+
+# Best coarse positions re-scored at full size. Coarse scores are only used
+# to rank: block averaging lowers them a lot for fine-grained templates.
+COARSE_CANDIDATES = 4
+MIN_COARSE_SIZE = 4  # smallest template side worth scoring at the coarse scale
+
+
+class ImageMatchError(ValueError):
+    pass
+
+
+# --- Screen grabbing ---
+
+class ScreenGrabber:
+    def grab(self, region, color=False):
+        # Array for region (x, y, w, h), or the whole screen if None: grayscale
+        # float32 (h, w), or with color=True RGB (h, w, 3)
+        raise NotImplementedError
+
+    def origin(self):
+        # Screen position of the top-left pixel of a whole-screen grab
+        return 0, 0
+
+
+# GetSystemMetrics indices of the virtual screen's top-left corner
+SM_XVIRTUALSCREEN = 76
+SM_YVIRTUALSCREEN = 77
+
+
+class PilGrabber(ScreenGrabber):
+    def __init__(self):
+        from PIL import ImageGrab
+        self.image_grab = ImageGrab
+
+    def grab(self, region, color=False):
+        bbox = None if region is None else (region[0], region[1], region[0] + region[2], region[1] + region[3])
+        image = self.image_grab.grab(bbox=bbox, all_screens=True)
+        if color:
+            return np.asarray(image.convert('RGB'))
+        return np.asarray(image.convert('L'), dtype=np.float32)
+
+    def origin(self):
+        # On Windows all_screens grabs the virtual screen, which starts left
+        # of or above (0, 0) when a monitor sits there. Read every time:
+        # monitors can be rearranged while the app runs.
+        if sys.platform != 'win32':
+            return 0, 0
+        import ctypes
+        metrics = ctypes.windll.user32.GetSystemMetrics
+        return metrics(SM_XVIRTUALSCREEN), metrics(SM_YVIRTUALSCREEN)
+
+
+class ArrayGrabber(ScreenGrabber):
+    # Serves crops of a fixed grayscale or RGB array, e.g. a synthetic screenshot in tests.
+    # origin: screen position of the array's top-left pixel, like a virtual screen.
+
+    def __init__(self, screen, origin=(0, 0)):
+        self.screen = np.asarray(screen, dtype=np.float32)
+        self._origin = tuple(origin)
+        self.grabs = 0
+        self.pixels = 0
+
+    def grab(self, region, color=False):
+        self.grabs += 1
+        if region is None:
+            crop = self.screen
+        else:
+            x, y, w, h = region
+            x -= self._origin[0]
+            y -= self._origin[1]
+            crop = self.screen[max(0, y):max(0, y + h), max(0, x):max(0, x + w)]
+        self.pixels += crop.shape[0] * crop.shape[1]
+        if color:
+            return crop[..., :3] if crop.ndim == 3 else np.repeat(crop[..., None], 3, axis=2)
+        return to_gray(crop)
+
+    def origin(self):
+        return self._origin
+
+
+# --- Scoring ---
+
+def to_gray(pixels):
+    pixels = np.asarray(pixels, dtype=np.float32)
+    if pixels.ndim == 3:
+        pixels = pixels[..., :3].mean(axis=2)
+    return pixels
+
+
+def downscale(pixels, factor):
+    # Block mean; trailing rows/columns that do not fill a block are dropped
+    if factor <= 1:
+        return pixels
+    h = pixels.shape[0] // factor * factor
+    w = pixels.shape[1] // factor * factor
+    return pixels[:h, :w].reshape(h // factor, factor, w // factor, factor).mean(axis=(1, 3))
+
+
+def _window_sums(image, h, w):
+    # Sum over every h x w window, via a summed-area table
+    table = np.zeros((image.shape[0] + 1, image.shape[1] + 1))
+    np.cumsum(np.cumsum(image, axis=0), axis=1, out=table[1:, 1:])
+    return table[h:, w:] - table[:-h, w:] - table[h:, :-w] + table[:-h, :-w]
+
+
+class _Pattern:
+    # One scale of a template: zero-mean pixels, their norm and cached FFTs
+    __slots__ = ('pixels', 'norm', 'h', 'w', '_ffts')
+
+    def __init__(self, pixels):
+        self.h, self.w = pixels.shape
+        self.pixels = pixels - pixels.mean()
+        self.norm = float(np.sqrt((self.pixels ** 2).sum()))
+        self._ffts = {}
+
+    def fft(self, shape):
+        # The conjugate spectrum for an image of this shape, computed once per shape
+        spectrum = self._ffts.get(shape)
+        if spectrum is None:
+            if len(self._ffts) > 8:
+                self._ffts.clear()
+            spectrum = self._ffts[shape] = np.conj(np.fft.rfft2(self.pixels, s=shape))
+        return spectrum
+
+
+def score_map(image, pattern):
+    # Normalised cross-correlation of pattern at every position where it fits in image
+    H, W = image.shape
+    h, w = pattern.h, pattern.w
+    if H < h or W < w:
+        return np.empty((0, 0))
+    image = image.astype(np.float64, copy=False)
+    products = np.fft.irfft2(np.fft.rfft2(image) * pattern.fft((H, W)), s=(H, W))[:H - h + 1, :W - w + 1]
+    n = h * w
+    sums = _window_sums(image, h, w)
+    variance = _window_sums(image * image, h, w) - sums * sums / n
+    denominator = np.sqrt(np.maximum(variance, 0.0)) * pattern.norm
+    scores = np.zeros_like(products)
+    np.divide(products, denominator, out=scores, where=denominator > 1e-6 * n)
+    return scores
+
+
+def score_at(patch, pattern):
+    # Score of a single template-sized patch
+    if patch.shape != (pattern.h, pattern.w):
+        return -1.0
+    patch = patch - patch.mean()
+    denominator = float(np.sqrt((patch ** 2).sum())) * pattern.norm
+    if denominator <= 1e-6 * patch.size:
+        return 0.0
+    return float((patch * pattern.pixels).sum() / denominator)
+
+
+# --- Targets ---
+
+class ImageTarget:
+    __slots__ = ('name', 'fine', 'coarse', 'scale', 'region', 'threshold', 'offset', 'last_hit', 'source')
+
+    def __init__(self, name, pixels, region=None, threshold=0.9, offset=(0, 0), scale=4):
+        pixels = to_gray(pixels)
+        if pixels.ndim != 2 or pixels.shape[0] < 2 or pixels.shape[1] < 2:
+            raise ImageMatchError("template image is too small")
+        self.name = name
+        self.fine = _Pattern(pixels)
+        if self.fine.norm == 0:
+            raise ImageMatchError("template image is a single flat colour")
+        # Small templates are not worth (or able) to be downscaled much
+        self.scale = max(1, min(int(scale), min(pixels.shape) // MIN_COARSE_SIZE))
+        self.coarse = _Pattern(downscale(pixels, self.scale)) if self.scale > 1 else None
+        self.region = tuple(int(v) for v in region) if region else None
+        self.threshold = float(threshold)
+        self.offset = (int(offset[0]), int(offset[1]))
+        self.last_hit = None  # screen position of the template's top-left corner
+        self.source = None  # the bind data this was built from
+
+
+def load_image_target(name, bind_data, default_threshold=0.9, scale=4):
+    # Builds an ImageTarget from bind data; raises ImageMatchError
+    path = bind_data.get('image')
+    if not path:
+        raise ImageMatchError("no template image")
+    region = bind_data.get('region')
+    if region is not None and (not isinstance(region, (list, tuple)) or len(region) != 4):
+        raise ImageMatchError("region must be [x, y, w, h]")
+    try:
+        from PIL import Image
+        with Image.open(path) as image:
+            pixels = np.asarray(image.convert('L'), dtype=np.float32)
+    except (ImportError, OSError) as e:
+        raise ImageMatchError(f"cannot read {path}: {e}")
+    try:
+        target = ImageTarget(name, pixels, region, bind_data.get('threshold', default_threshold),
+                             bind_data.get('offset') or (0, 0), scale)
+    except (TypeError, ValueError) as e:
+        raise ImageMatchError(str(e))
+    target.source = dict(bind_data)
+    return target
+
+
+def compile_profile_images(binds, image_type, default_threshold=0.9, scale=4, previous=None):
+    # Returns ({bind key: ImageTarget}, [error messages]) for every image bind.
+    # Targets in previous whose bind is unchanged are reused as they are, so
+    # editing one bind does not reload every template (or forget last hits).
+    targets = {}
+    errors = []
+    previous = previous or {}
+    for key, bind_data in binds.items():
+        if not isinstance(bind_data, dict) or bind_data.get('type') != image_type:
+            continue
+        target = previous.get(key)
+        if target is not None and target.source == bind_data:
+            targets[key] = target
+            continue
+        try:
+            targets[key] = load_image_target(key, bind_data, default_threshold, scale)
+        except ImageMatchError as e:
+            errors.append(f"Image '{key}': {e}")
+    return targets, errors
+
+
+class ImageMatchStats:
+    # Lookup counts and timings per bind
+
+    def __init__(self):
+        self.binds = {}  # name -> [lookups, cache hits, found, total ns, max ns, last ns]
+
+    def add(self, name, cached, found, elapsed_ns):
+        entry = self.binds.get(name)
+        if entry is None:
+            entry = self.binds[name] = [0, 0, 0, 0, 0, 0]
+        entry[0] += 1
+        entry[1] += cached
+        entry[2] += found
+        entry[3] += elapsed_ns
+        entry[4] = max(entry[4], elapsed_ns)
+        entry[5] = elapsed_ns
+
+    def summary(self):
+        return {
+            name: {
+                "lookups": lookups,
+                "cache_hits": cache_hits,
+                "found": found,
+                "avg_ms": total / lookups / 1e6,
+                "max_ms": peak / 1e6,
+                "last_ms": last / 1e6,
+            }
+            for name, (lookups, cache_hits, found, total, peak, last) in list(self.binds.items())
+        }
+
+
+class ImageMatcher:
+    # Lookups run on the executor thread, one at a time
+    def __init__(self, grabber, stats=None):
+        self.grabber = grabber
+        self.stats = stats or ImageMatchStats()
+
+    def locate(self, target):
+        # Returns the screen point to click (template centre plus offset), or None
+        start = time.perf_counter_ns()
+        cached = False
+        hit = None
+        if target.last_hit is not None:
+            x, y = target.last_hit
+            patch = self.grabber.grab((x, y, target.fine.w, target.fine.h))
+            if score_at(patch, target.fine) >= target.threshold:
+                hit = target.last_hit
+                cached = True
+        if hit is None:
+            hit = self.search(target)
+            target.last_hit = hit
+        self.stats.add(target.name, cached, hit is not None, time.perf_counter_ns() - start)
+        if hit is None:
+            return None
+        return (hit[0] + target.fine.w // 2 + target.offset[0],
+                hit[1] + target.fine.h // 2 + target.offset[1])
+
+    def search(self, target):
+        # Full search of the target's region; returns the top-left screen position or None
+        origin = target.region[:2] if target.region else self.grabber.origin()
+        image = self.grabber.grab(target.region)
+        fine = target.fine
+        if image.shape[0] < fine.h or image.shape[1] < fine.w:
+            return None
+
+        if target.coarse is None:
+            scores = score_map(image, fine)
+            y, x = np.unravel_index(np.argmax(scores), scores.shape)
+            if scores[y, x] < target.threshold:
+                return None
+            return origin[0] + int(x), origin[1] + int(y)
+
+        scale = target.scale
+        coarse_scores = score_map(downscale(image, scale), target.coarse)
+        if coarse_scores.size == 0:
+            return None
+        flat = coarse_scores.ravel()
+        count = min(COARSE_CANDIDATES, flat.size)
+        candidates = np.argpartition(flat, -count)[-count:]
+        candidates = candidates[np.argsort(flat[candidates])[::-1]]
+
+        best_score = target.threshold
+        best = None
+        for index in candidates:
+            cy, cx = (int(v) for v in np.unravel_index(index, coarse_scores.shape))
+            # Full resolution window around the candidate, one coarse cell of slack each way
+            y0 = max(0, cy * scale - scale)
+            x0 = max(0, cx * scale - scale)
+            y1 = min(image.shape[0], cy * scale + scale + fine.h)
+            x1 = min(image.shape[1], cx * scale + scale + fine.w)
+            scores = score_map(image[y0:y1, x0:x1], fine)
+            if scores.size == 0:
+                continue
+            y, x = np.unravel_index(np.argmax(scores), scores.shape)
+            if scores[y, x] >= best_score:
+                best_score = float(scores[y, x])
+                best = (origin[0] + x0 + int(x), origin[1] + y0 + int(y))
+        return best
@@ -0,0 +1,165 @@
+import time
+
+# Input injection backends.
+#
+# Actions only talk to this interface, so the library that actually moves the
+# cursor can be swapped without touching the action code. None of the backends
+# sleep on their own; any pause between steps is up to the caller.
+
+class InjectionBackend:
+    name = None
+
+    def position(self):
+        raise NotImplementedError
+
+    def move(self, x, y):
+        raise NotImplementedError
+
+    def mouse_down(self):
+        raise NotImplementedError
+
+    def mouse_up(self):
+        raise NotImplementedError
+
+    def click(self, x, y, count=1):
+        raise NotImplementedError
+
+    # Keys are lower-case names: single characters or pynput Key names ("shift", "f5")
+    def key_down(self, key):
+        raise NotImplementedError
+
+    def key_up(self, key):
+        raise NotImplementedError
+
+
+class PynputBackend(InjectionBackend):
+    name = "pynput"
+
+    def __init__(self):
+        from pynput.mouse import Controller, Button
+        from pynput.keyboard import Controller as KeyboardController, Key
+        self.mouse = Controller()
+        self.button = Button.left
+        self.keyboard = KeyboardController()
+        self.special_keys = Key
+        self._keys = {}
+
+    def position(self):
+        return self.mouse.position
+
+    def move(self, x, y):
+        self.mouse.position = (x, y)
+
+    def mouse_down(self):
+        self.mouse.press(self.button)
+
+    def mouse_up(self):
+        self.mouse.release(self.button)
+
+    def click(self, x, y, count=1):
+        self.mouse.position = (x, y)
+        self.mouse.click(self.button, count)
+
+    def _key(self, name):
+        key = self._keys.get(name)
+        if key is None:
+            key = self._keys[name] = name if len(name) == 1 else self.special_keys[name]
+        return key
+
+    def key_down(self, key):
+        self.keyboard.press(self._key(key))
+
+    def key_up(self, key):
+        self.keyboard.release(self._key(key))
+
+
+class PyAutoGuiBackend(InjectionBackend):
+    name = "pyautogui"
+
+    def __init__(self):
+        import pyautogui
+        self.pyautogui = pyautogui
+
+    # _pause=False skips pyautogui.PAUSE (0.1s per call by default)
+    def position(self):
+        return tuple(self.pyautogui.position())
+
+    def move(self, x, y):
+        self.pyautogui.moveTo(x, y, _pause=False)
+
+    def mouse_down(self):
+        self.pyautogui.mouseDown(_pause=False)
+
+    def mouse_up(self):
+        self.pyautogui.mouseUp(_pause=False)
+
+    def click(self, x, y, count=1):
+        self.pyautogui.click(x, y, clicks=count, _pause=False)
+
+    # pyautogui spells a few keys differently from pynput
+    KEY_NAMES = {"ctrl_l": "ctrlleft", "ctrl_r": "ctrlright", "shift_l": "shiftleft", "shift_r": "shiftright",
+                 "alt_l": "altleft", "alt_r": "altright", "cmd": "win", "cmd_l": "winleft", "cmd_r": "winright",
+                 "page_up": "pageup", "page_down": "pagedown", "caps_lock": "capslock"}
+
+    def key_down(self, key):
+        self.pyautogui.keyDown(self.KEY_NAMES.get(key, key), _pause=False)
+
+    def key_up(self, key):
+        self.pyautogui.keyUp(self.KEY_NAMES.get(key, key), _pause=False)
+
+
+class RecordingBackend(InjectionBackend):
+    # Injects nothing; keeps a log of calls for tests and benchmarks.
+    # on_event(call) stands in for the OS echoing injected input back to the
+    # listeners, e.g. on_event(("key_down", "a")).
+    name = "recording"
+
+    def __init__(self, start_position=(0, 0), keep_log=True, on_event=None):
+        self._position = tuple(start_position)
+        self.keep_log = keep_log
+        self.on_event = on_event
+        self.calls = []
+        self.call_count = 0
+
+    def _record(self, *call):
+        self.call_count += 1
+        if self.keep_log:
+            self.calls.append((time.perf_counter(),) + call)
+        if self.on_event is not None:
+            self.on_event(call)
+
+    def position(self):
+        return self._position
+
+    def move(self, x, y):
+        self._position = (x, y)
+        self._record("move", x, y)
+
+    def mouse_down(self):
+        self._record("mouse_down")
+
+    def mouse_up(self):
+        self._record("mouse_up")
+
+    def click(self, x, y, count=1):
+        self._position = (x, y)
+        self._record("click", x, y, count)
+
+    def key_down(self, key):
+        self._record("key_down", key)
+
+    def key_up(self, key):
+        self._record("key_up", key)
+
+
+BACKENDS = {
+    PynputBackend.name: PynputBackend,
+    PyAutoGuiBackend.name: PyAutoGuiBackend,
+    RecordingBackend.name: RecordingBackend,
+}
+
+def create_backend(name):
+    if name not in BACKENDS:
+        print(f"Unknown injection backend '{name}', using '{PynputBackend.name}'")
+        name = PynputBackend.name
+    return BACKENDS[name]()
@@ -1,5 +1,21 @@
 from pynput.keyboard import Key, KeyCode
 
+MODIFIER_NAMES = ['ctrl', 'ctrl_l', 'ctrl_r', 'shift', 'shift_l', 'shift_r', 'alt', 'alt_l', 'alt_r', 'cmd', 'cmd_l', 'cmd_r']
+
+# One bit per modifier as reported by pynput. Generic names ("ctrl") get their
+# own bit because some platforms report them instead of the sided variants.
+MODIFIER_BITS = {name: 1 << i for i, name in enumerate(MODIFIER_NAMES)}
+
+# What a modifier written in a bind string may match when pressed.
+# "Ctrl" accepts either side, "Ctrl_L" only the left one.
+MODIFIER_MATCHES = {}
+for _name in MODIFIER_NAMES:
+    _base = _name.split('_')[0]
+    if _name == _base:
+        MODIFIER_MATCHES[_name] = [MODIFIER_BITS[_base], MODIFIER_BITS[_base + '_l'], MODIFIER_BITS[_base + '_r']]
+    else:
+        MODIFIER_MATCHES[_name] = [MODIFIER_BITS[_name]]
+
 def get_key_name(key):
     if isinstance(key, KeyCode):
         return key.char.upper() if key.char else str(key)
@@ -9,7 +25,61 @@ def get_key_name(key):
 
 def get_key_combo_string(keys):
     sorted_keys = sorted(keys, key=lambda k: (
-        0 if isinstance(k, Key) and k.name in ['ctrl', 'ctrl_l', 'ctrl_r', 'shift', 'shift_l', 'shift_r', 'alt', 'alt_l', 'alt_r', 'cmd', 'cmd_l', 'cmd_r'] else 1,
+        0 if isinstance(k, Key) and k.name in MODIFIER_NAMES else 1,
         str(k)
     ))
     return "+".join([get_key_name(k) for k in sorted_keys])
+
+def normalize_key_token(name):
+    # Case-folded form of a single key name, shared by bind strings and live keys
+    return name.lower()
+
+def get_key_token(key):
+    # Returns (modifier_bit, token). Exactly one of them is meaningful.
+    if isinstance(key, Key) and key.name in MODIFIER_BITS:
+        return MODIFIER_BITS[key.name], None
+    return 0, normalize_key_token(get_key_name(key))
+
+def get_injection_name(key):
+    # The name an injection backend would use for this key, or None if it has none
+    if isinstance(key, Key):
+        return key.name
+    if isinstance(key, KeyCode) and key.char:
+        return key.char.lower()
+    return None
+
+def is_injectable_key_name(name):
+    # Whether an injection backend can type this name: a single character or a pynput Key name
+    return len(name) == 1 or name in Key.__members__
+
+def split_combo_string(combo):
+    # "+" is both the separator and a valid key, e.g. "Ctrl_L++"
+    if combo == '+':
+        return ['+']
+    if combo.endswith('++'):
+        return combo[:-2].split('+') + ['+']
+    return combo.split('+')
+
+# Steps of a key sequence ("G, 3", "Ctrl+K, Ctrl+C"). Combos never contain
+# spaces, so ", " cannot be confused with the "," key ("Ctrl+,, G").
+SEQUENCE_SEPARATOR = ", "
+
+def is_sequence(combo):
+    return SEQUENCE_SEPARATOR in combo
+
+def split_sequence(combo):
+    return combo.split(SEQUENCE_SEPARATOR)
+
+def parse_combo_string(combo):
+    # Returns (list of modifier names, frozenset of key tokens) or None if malformed
+    modifiers = []
+    tokens = set()
+    for part in split_combo_string(combo):
+        if not part:
+            return None
+        name = normalize_key_token(part)
+        if name in MODIFIER_BITS:
+            modifiers.append(name)
+        else:
+            tokens.add(name)
+    return modifiers, frozenset(tokens)
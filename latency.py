@@ -0,0 +1,150 @@
+import csv
+import itertools
+import json
+import math
+import time
+
+# Dispatch latency samples.
+#
+# A sample is a list filled in as a bind travels through the pipeline:
+#   [bind key, action type, press, resolved, queued, inject start, inject end]
+# Timestamps are time.perf_counter_ns(). Samples go into a fixed-size ring
+# buffer without locking (itertools.count is atomic under the GIL); all
+# aggregation happens when someone asks for it, never on the hot path.
+
+SAMPLE_BIND = 0
+SAMPLE_ACTION = 1
+SAMPLE_PRESS = 2
+SAMPLE_RESOLVED = 3
+SAMPLE_QUEUED = 4
+SAMPLE_INJECT_START = 5
+SAMPLE_INJECT_END = 6
+
+# Reported spans: name -> (from stage, to stage)
+SPANS = {
+    "total": (SAMPLE_PRESS, SAMPLE_INJECT_END),
+    "resolve": (SAMPLE_PRESS, SAMPLE_RESOLVED),
+    "queue_wait": (SAMPLE_QUEUED, SAMPLE_INJECT_START),
+    "inject": (SAMPLE_INJECT_START, SAMPLE_INJECT_END),
+}
+
+PERCENTILES = (50, 95, 99)
+
+
+def now_ns():
+    return time.perf_counter_ns()
+
+
+# Longest single sleep in wait_until, so a set event is noticed during long waits
+MAX_SLEEP_SLICE_NS = 10000000
+
+
+def wait_until(deadline, spin_ns, events=()):
+    # Precise wait for macros, cursor paths and replays: sleeps until spin_ns
+    # before deadline (now_ns() time), then busy-waits. Returns True, early
+    # if need be, when any of events is set; the first one also wakes the
+    # sleep at once. None entries are ignored.
+    events = [event for event in events if event is not None]
+    waker = events[0] if events else None
+    clock = time.perf_counter_ns
+    while True:
+        if any(event.is_set() for event in events):
+            return True
+        remaining = deadline - clock()
+        if remaining <= spin_ns:
+            break
+        timeout = min(remaining - spin_ns, MAX_SLEEP_SLICE_NS) / 1e9
+        if waker is not None:
+            waker.wait(timeout)
+        else:
+            time.sleep(timeout)
+    while clock() < deadline:
+        pass
+    return any(event.is_set() for event in events)
+
+
+class LatencyRecorder:
+    def __init__(self, capacity=4096):
+        self.capacity = max(1, int(capacity))
+        self._buffer = [None] * self.capacity
+        self._counter = itertools.count()
+        self.recorded = 0
+
+    def record(self, sample):
+        i = next(self._counter)
+        self._buffer[i % self.capacity] = sample
+        self.recorded = i + 1
+
+    def clear(self):
+        self._buffer = [None] * self.capacity
+        self._counter = itertools.count()
+        self.recorded = 0
+
+    def samples(self):
+        return [s for s in list(self._buffer) if s is not None]
+
+    def summary(self):
+        samples = self.samples()
+        return {
+            "samples": len(samples),
+            "recorded": self.recorded,
+            "by_bind": _group_stats(samples, SAMPLE_BIND),
+            "by_action": _group_stats(samples, SAMPLE_ACTION),
+        }
+
+    def export_json(self, path):
+        data = self.summary()
+        data["raw"] = [_sample_row(s) for s in self.samples()]
+        with open(path, 'w') as file:
+            json.dump(data, file, indent=4)
+
+    def export_csv(self, path):
+        fields = ["group", "name", "span", "count"] + [f"p{p}_ms" for p in PERCENTILES] + ["max_ms"]
+        summary = self.summary()
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(fields)
+            for group in ("by_bind", "by_action"):
+                for name, spans in summary[group].items():
+                    for span, stats in spans.items():
+                        writer.writerow([group, name, span, stats["count"]] +
+                                        [round(stats[f"p{p}_ms"], 4) for p in PERCENTILES] +
+                                        [round(stats["max_ms"], 4)])
+
+
+def percentile(sorted_values, pct):
+    # Nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values), max(1, math.ceil(pct / 100.0 * len(sorted_values)))) - 1
+    return sorted_values[rank]
+
+
+def span_stats(values_ns):
+    values = sorted(values_ns)
+    stats = {"count": len(values)}
+    for p in PERCENTILES:
+        stats[f"p{p}_ms"] = percentile(values, p) / 1e6
+    stats["max_ms"] = (values[-1] / 1e6) if values else 0.0
+    return stats
+
+
+def _group_stats(samples, field):
+    groups = {}
+    for sample in samples:
+        groups.setdefault(str(sample[field]), []).append(sample)
+    result = {}
+    for name, group in groups.items():
+        result[name] = {}
+        for span, (start, end) in SPANS.items():
+            values = [s[end] - s[start] for s in group if s[start] and s[end]]
+            result[name][span] = span_stats(values)
+    return result
+
+
+def _sample_row(sample):
+    row = {"bind": str(sample[SAMPLE_BIND]), "action": sample[SAMPLE_ACTION]}
+    for span, (start, end) in SPANS.items():
+        if sample[start] and sample[end]:
+            row[span + "_ms"] = (sample[end] - sample[start]) / 1e6
+    return row
@@ -0,0 +1,276 @@
+import threading
+import time
+from key_utils import is_injectable_key_name
+from latency import wait_until
+
+# Macro actions.
+#
+# Steps are stored in the profile as small dicts, e.g.
+#   {"op": "click", "coords": [100, 200]}
+#   {"op": "wait", "ms": 15}
+#   {"op": "key_down", "key": "shift"}
+#   {"op": "drag", "from": [10, 20], "to": [300, 40]}
+# and compiled once into a flat list of (deadline offset ns, opcode, args).
+# Waits never become instructions; they only push later deadlines back, so
+# timing errors do not accumulate from step to step.
+
+OP_MOVE = 0
+OP_CLICK = 1
+OP_MOUSE_DOWN = 2
+OP_MOUSE_UP = 3
+OP_KEY_DOWN = 4
+OP_KEY_UP = 5
+
+OPCODE_NAMES = {
+    OP_MOVE: "move",
+    OP_CLICK: "click",
+    OP_MOUSE_DOWN: "mouse_down",
+    OP_MOUSE_UP: "mouse_up",
+    OP_KEY_DOWN: "key_down",
+    OP_KEY_UP: "key_up",
+}
+
+# Step op -> number of numeric arguments in the text form
+STEP_ARITY = {
+    "click": 2,
+    "double_click": 2,
+    "move": 2,
+    "wait": 1,
+    "mouse_down": 0,
+    "mouse_up": 0,
+    "key_down": None,  # takes a key name
+    "key_up": None,
+    "key_tap": None,
+    "drag": 4,
+}
+
+
+class MacroError(ValueError):
+    pass
+
+
+def _point(value, what):
+    if not isinstance(value, (list, tuple)) or len(value) != 2:
+        raise MacroError(f"{what} must be [x, y]")
+    try:
+        return int(value[0]), int(value[1])
+    except (TypeError, ValueError):
+        raise MacroError(f"{what} must be [x, y]")
+
+
+def compile_macro(steps):
+    # Returns the instruction list; raises MacroError on bad steps
+    if not isinstance(steps, list) or not steps:
+        raise MacroError("macro has no steps")
+    program = []
+    at = 0
+
+    def emit(opcode, *args):
+        program.append((at, opcode, args))
+
+    for number, step in enumerate(steps, 1):
+        if not isinstance(step, dict) or step.get('op') not in STEP_ARITY:
+            raise MacroError(f"step {number}: unknown step {step!r}")
+        op = step['op']
+        try:
+            if op == "wait":
+                ms = float(step['ms'])
+                if ms < 0:
+                    raise MacroError(f"step {number}: wait must not be negative")
+                at += int(ms * 1e6)
+            elif op == "click":
+                emit(OP_CLICK, *_point(step['coords'], f"step {number}: coords"), 1)
+            elif op == "double_click":
+                emit(OP_CLICK, *_point(step['coords'], f"step {number}: coords"), 2)
+            elif op == "move":
+                emit(OP_MOVE, *_point(step['coords'], f"step {number}: coords"))
+            elif op == "mouse_down":
+                emit(OP_MOUSE_DOWN)
+            elif op == "mouse_up":
+                emit(OP_MOUSE_UP)
+            elif op in ("key_down", "key_up", "key_tap"):
+                key = str(step['key']).strip().lower()
+                if not key:
+                    raise MacroError(f"step {number}: key is empty")
+                if not is_injectable_key_name(key):
+                    raise MacroError(f"step {number}: unknown key {key!r}")
+                if op != "key_up":
+                    emit(OP_KEY_DOWN, key)
+                if op != "key_down":
+                    emit(OP_KEY_UP, key)
+            elif op == "drag":
+                emit(OP_MOVE, *_point(step['from'], f"step {number}: from"))
+                emit(OP_MOUSE_DOWN)
+                emit(OP_MOVE, *_point(step['to'], f"step {number}: to"))
+                emit(OP_MOUSE_UP)
+        except KeyError as e:
+            raise MacroError(f"step {number}: missing {e}")
+    return program
+
+
+def parse_macro_text(text):
+    # One step per line: "click 100 200", "wait 15", "key_tap f", "drag 1 2 3 4".
+    # Blank lines and lines starting with # are ignored.
+    steps = []
+    for number, line in enumerate(text.splitlines(), 1):
+        parts = line.split('#', 1)[0].split()
+        if not parts:
+            continue
+        op = parts[0].lower()
+        args = parts[1:]
+        if op not in STEP_ARITY:
+            raise MacroError(f"line {number}: unknown step '{parts[0]}'")
+        arity = STEP_ARITY[op]
+        if arity is None:
+            if len(args) != 1:
+                raise MacroError(f"line {number}: {op} takes one key name")
+            steps.append({"op": op, "key": args[0]})
+            continue
+        if len(args) != arity:
+            raise MacroError(f"line {number}: {op} takes {arity} numbers")
+        try:
+            values = [float(a) if op == "wait" else int(a) for a in args]
+        except ValueError:
+            raise MacroError(f"line {number}: {op} takes {arity} numbers")
+        if op == "wait":
+            steps.append({"op": op, "ms": values[0]})
+        elif op == "drag":
+            steps.append({"op": op, "from": values[:2], "to": values[2:]})
+        elif arity == 2:
+            steps.append({"op": op, "coords": values})
+        else:
+            steps.append({"op": op})
+    compile_macro(steps)  # validate
+    return steps
+
+
+def format_macro_steps(steps):
+    lines = []
+    for step in steps or []:
+        op = step.get('op')
+        if op == "wait":
+            ms = step.get('ms', 0)
+            lines.append(f"wait {ms:g}" if isinstance(ms, (int, float)) else f"wait {ms}")
+        elif op == "drag":
+            lines.append("drag {} {} {} {}".format(*step.get('from', []), *step.get('to', [])))
+        elif op in ("key_down", "key_up", "key_tap"):
+            lines.append(f"{op} {step.get('key')}")
+        elif 'coords' in step:
+            lines.append("{} {} {}".format(op, *step['coords']))
+        else:
+            lines.append(str(op))
+    return "\n".join(lines)
+
+
+def compile_profile_macros(binds, macro_type):
+    # Returns ({bind key: program}, [error messages]) for every macro bind
+    programs = {}
+    errors = []
+    for key, bind_data in binds.items():
+        if isinstance(bind_data, dict) and bind_data.get('type') == macro_type:
+            try:
+                programs[key] = compile_macro(bind_data.get('steps'))
+            except MacroError as e:
+                errors.append(f"Macro '{key}': {e}")
+    return programs, errors
+
+
+class MacroStats:
+    # Timing drift per macro (actual minus scheduled start of each instruction)
+
+    def __init__(self):
+        self.runs = 0
+        self.cancelled = 0
+        self.steps = 0
+        self.total_abs_drift_ns = 0
+        self.max_drift_ns = 0
+        self.last_drift_ns = {}  # macro name -> per-instruction drift of its last run
+
+    def add_run(self, name, drifts, cancelled):
+        self.runs += 1
+        if cancelled:
+            self.cancelled += 1
+        self.steps += len(drifts)
+        for drift in drifts:
+            self.total_abs_drift_ns += abs(drift)
+            if drift > self.max_drift_ns:
+                self.max_drift_ns = drift
+        self.last_drift_ns[name] = drifts
+
+    def summary(self):
+        return {
+            "runs": self.runs,
+            "cancelled": self.cancelled,
+            "mean_drift_us": (self.total_abs_drift_ns / self.steps / 1000.0) if self.steps else 0.0,
+            "max_drift_us": self.max_drift_ns / 1000.0,
+        }
+
+
+class MacroScheduler:
+    # Runs compiled programs against an injection backend with sub-millisecond
+    # timing: sleep until spin_ns before each deadline, then busy-wait.
+
+    def __init__(self, backend, spin_ns=1500000, stats=None):
+        self.backend = backend
+        self.spin_ns = spin_ns
+        self.stats = stats or MacroStats()
+        self._lock = threading.Lock()
+        self._running = {}  # macro name -> cancel Event
+
+    def is_running(self, name):
+        return name in self._running
+
+    def cancel(self, name):
+        event = self._running.get(name)
+        if event is not None:
+            event.set()
+            return True
+        return False
+
+    def run(self, name, program, preempt_event=None):
+        # Blocks until the macro finishes or is cancelled. Returns per-step drift in ns.
+        cancel_event = threading.Event()
+        with self._lock:
+            self._running[name] = cancel_event
+        drifts = []
+        held_keys = []
+        mouse_held = False
+        cancelled = False
+        backend = self.backend
+        clock = time.perf_counter_ns
+        try:
+            start = clock()
+            for at, opcode, args in program:
+                deadline = start + at
+                if wait_until(deadline, self.spin_ns, (cancel_event, preempt_event)):
+                    cancelled = True
+                    break
+                drifts.append(clock() - deadline)
+                if opcode == OP_CLICK:
+                    backend.click(*args)
+                elif opcode == OP_MOVE:
+                    backend.move(*args)
+                elif opcode == OP_MOUSE_DOWN:
+                    backend.mouse_down()
+                    mouse_held = True
+                elif opcode == OP_MOUSE_UP:
+                    backend.mouse_up()
+                    mouse_held = False
+                elif opcode == OP_KEY_DOWN:
+                    backend.key_down(args[0])
+                    held_keys.append(args[0])
+                elif opcode == OP_KEY_UP:
+                    backend.key_up(args[0])
+                    if args[0] in held_keys:
+                        held_keys.remove(args[0])
+        finally:
+            # Never leave buttons or keys stuck down after a cancel or error
+            if mouse_held:
+                backend.mouse_up()
+            for key in reversed(held_keys):
+                backend.key_up(key)
+            with self._lock:
+                if self._running.get(name) is cancel_event:
+                    del self._running[name]
+            self.stats.add_run(name, drifts, cancelled)
+        return drifts
@@ -1,7 +1,33 @@
-import tkinter as tk
-from autokeybind import KeybindApp
+import time
+
+_started = time.perf_counter()
+
+import argparse
+from startup import StartupTimer
 
 if __name__ == "__main__":
-    root = tk.Tk()
-    app = KeybindApp(root)
-    root.mainloop()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="XvG Auto Keybind")
+    parser.add_argument("--profile-startup", action="store_true", help="print how long each startup phase takes")
+    parser.add_argument("--headless", action="store_true", help="run the hotkeys only, without window or tray")
+    parser.add_argument("--profile", help="profile to activate (headless mode)")
+    args = parser.parse_args()
+
+    timer = StartupTimer(_started) if args.profile_startup else None
+    if args.headless:
+        # Never imports tkinter, pystray or PIL
+        from headless import run
+        if timer:
+            timer.mark("import headless")
+        run(args.profile, timer)
+    else:
+        import tkinter as tk
+        if timer:
+            timer.mark("import tkinter")
+        from autokeybind import KeybindApp
+        if timer:
+            timer.mark("import autokeybind")
+        root = tk.Tk()
+        if timer:
+            timer.mark("Tk()")
+        app = KeybindApp(root, timer)
+        root.mainloop()
@@ -0,0 +1,147 @@
+import time
+from latency import wait_until
+
+# Mouse movement for Click and Drag binds.
+#
+#   {"coords": [640, 400], "type": "Drag & Return",
+#    "motion": {"profile": "curved", "duration_ms": 150, "rate_hz": 240}}
+#
+# Without "motion" the cursor jumps, as before. With it, every cursor move
+# of the action glides there along a path:
+#   linear  constant speed along the straight line
+#   eased   straight line, slow start and stop
+#   curved  eased along a gentle arc, like a hand on a mouse
+#
+# This module parses the setting and plays paths; the paths themselves are
+# built (with numpy) and cached by motion_path.py, once a profile uses them.
+
+MOTION_INSTANT = "instant"
+MOTION_LINEAR = "linear"
+MOTION_EASED = "eased"
+MOTION_CURVED = "curved"
+
+MOTION_PROFILES = [MOTION_INSTANT, MOTION_LINEAR, MOTION_EASED, MOTION_CURVED]
+
+DEFAULT_DURATION_MS = 150
+DEFAULT_RATE_HZ = 240
+MAX_DURATION_MS = 5000
+MAX_RATE_HZ = 1000
+
+
+class MotionError(ValueError):
+    pass
+
+
+class MotionSpec:
+    # A validated motion setting; equal settings share cached paths
+    __slots__ = ('profile', 'duration_ms', 'rate_hz', 'steps', 'interval_ns')
+
+    def __init__(self, profile, duration_ms, rate_hz):
+        self.profile = profile
+        self.duration_ms = duration_ms
+        self.rate_hz = rate_hz
+        self.steps = max(2, round(duration_ms / 1000.0 * rate_hz))
+        self.interval_ns = int(duration_ms * 1e6 / self.steps)
+
+    def key(self):
+        return self.profile, self.duration_ms, self.rate_hz
+
+    def __eq__(self, other):
+        return isinstance(other, MotionSpec) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+
+def compile_motion(value):
+    # Bind data "motion" (a profile name or a dict) -> MotionSpec, or None to jump
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = {"profile": value}
+    if not isinstance(value, dict):
+        raise MotionError(f"bad motion {value!r}")
+    profile = value.get('profile', MOTION_EASED)
+    if profile not in MOTION_PROFILES:
+        raise MotionError(f"unknown motion profile {profile!r}, expected one of {', '.join(MOTION_PROFILES)}")
+    if profile == MOTION_INSTANT:
+        return None
+    try:
+        duration_ms = float(value.get('duration_ms', DEFAULT_DURATION_MS))
+        rate_hz = float(value.get('rate_hz', DEFAULT_RATE_HZ))
+    except (TypeError, ValueError):
+        raise MotionError(f"motion duration_ms and rate_hz must be numbers: {value!r}")
+    if not 0 < duration_ms <= MAX_DURATION_MS or not 0 < rate_hz <= MAX_RATE_HZ:
+        raise MotionError(f"motion out of range (duration 0-{MAX_DURATION_MS} ms, rate 0-{MAX_RATE_HZ} Hz): {value!r}")
+    return MotionSpec(profile, duration_ms, rate_hz)
+
+
+class MotionStats:
+    def __init__(self):
+        self.moves = 0
+        self.steps = 0
+        self.skipped = 0
+        self.cut_short = 0
+        self.total_abs_drift_ns = 0
+        self.max_drift_ns = 0
+
+    def add_move(self, steps, skipped, drifts, cut_short):
+        self.moves += 1
+        self.steps += steps
+        self.skipped += skipped
+        if cut_short:
+            self.cut_short += 1
+        for drift in drifts:
+            self.total_abs_drift_ns += abs(drift)
+            if drift > self.max_drift_ns:
+                self.max_drift_ns = drift
+
+    def summary(self):
+        played = self.steps - self.skipped
+        return {
+            "moves": self.moves,
+            "steps": self.steps,
+            "skipped": self.skipped,
+            "cut_short": self.cut_short,
+            "mean_drift_us": (self.total_abs_drift_ns / played / 1000.0) if played else 0.0,
+            "max_drift_us": self.max_drift_ns / 1000.0,
+        }
+
+
+class MotionPlayer:
+    # Plays a path against an injection backend on absolute deadlines
+    # (start + i * interval), sleeping until spin_ns before each and then
+    # busy-waiting, like the macro scheduler. Late steps are dropped rather
+    # than played in a burst, so the move keeps its duration; the last point
+    # is always played.
+
+    def __init__(self, spin_ns=1500000, stats=None):
+        self.spin_ns = spin_ns
+        self.stats = stats or MotionStats()
+
+    def play(self, backend, points, interval_ns, cancel_event=None):
+        # Runs on the executor thread. Returns True if cut short by cancel_event
+        # (the cursor still ends on the last point).
+        clock = time.perf_counter_ns
+        last = len(points) - 1
+        drifts = []
+        skipped = 0
+        cut_short = False
+        start = clock()
+        for i, (x, y) in enumerate(points):
+            deadline = start + (i + 1) * interval_ns
+            if i < last:
+                now = clock()
+                if now >= deadline + interval_ns:
+                    skipped += 1  # More than a step behind: catch up
+                    continue
+                if wait_until(deadline, self.spin_ns, (cancel_event,)):
+                    cut_short = True
+                    backend.move(*points[last])
+                    break
+            else:
+                wait_until(deadline, self.spin_ns)
+            drifts.append(clock() - deadline)
+            backend.move(x, y)
+        self.stats.add_move(len(points), skipped, drifts, cut_short)
+        return cut_short
@@ -0,0 +1,88 @@
+import collections
+import threading
+import numpy as np
+from motion import MOTION_LINEAR, MOTION_EASED, MOTION_CURVED
+
+# Cursor paths for motion.py, built with numpy.
+#
+# Each MotionSpec gets a template once, when the profile is compiled: the
+# progress along the move and the sideways offset at each step, as arrays.
+# A path from start to end is the template stretched onto the displacement
+# (end - start). Paths are cached per displacement bucket: the cached path
+# is built for the bucket's centre and then nudged, step by step in
+# proportion to progress, onto the exact end point, so every path still
+# ends precisely on target. A cursor that keeps going between the same two
+# spots never rebuilds its path.
+
+BUCKET_PX = 16
+CURVE_BEND = 0.12  # sideways bulge of a curved path, as a share of its length
+CACHE_SIZE = 512
+
+
+def build_template(spec):
+    # -> (progress, lateral) arrays of spec.steps, progress ending at 1
+    t = np.arange(1, spec.steps + 1, dtype=np.float64) / spec.steps
+    if spec.profile == MOTION_LINEAR:
+        progress = t
+    else:
+        progress = (1.0 - np.cos(np.pi * t)) / 2.0  # Slow in, slow out
+    if spec.profile == MOTION_CURVED:
+        lateral = CURVE_BEND * np.sin(np.pi * progress)
+    else:
+        lateral = np.zeros_like(t)
+    return progress, lateral
+
+
+class PathCache:
+    # Shared by every bind; used from the executor thread, prepared from the Tk thread
+
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self._templates = {}
+        self._paths = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def prepare(self, spec):
+        # Builds the template ahead of time, so the first move does not
+        if spec not in self._templates:
+            self._templates[spec] = build_template(spec)
+
+    def path(self, spec, start, end):
+        # -> list of (x, y) integer points, the last one exactly end
+        dx = end[0] - start[0]
+        dy = end[1] - start[1]
+        bucket = (spec, round(dx / BUCKET_PX), round(dy / BUCKET_PX))
+        with self._lock:
+            cached = self._paths.get(bucket)
+            if cached is not None:
+                self._paths.move_to_end(bucket)
+                self.hits += 1
+        if cached is None:
+            cached = self._build(spec, bucket[1] * BUCKET_PX, bucket[2] * BUCKET_PX)
+            with self._lock:
+                self.misses += 1
+                self._paths[bucket] = cached
+                if len(self._paths) > self.size:
+                    self._paths.popitem(last=False)
+        offsets, progress, bucket_dx, bucket_dy = cached
+        # Correct the bucket's path onto the real displacement
+        points = offsets + np.outer(progress, (dx - bucket_dx, dy - bucket_dy))
+        points += (start[0], start[1])
+        points = np.rint(points).astype(np.int64)
+        points[-1] = end
+        return points.tolist()
+
+    def _build(self, spec, dx, dy):
+        template = self._templates.get(spec)
+        if template is None:
+            template = self._templates[spec] = build_template(spec)
+        progress, lateral = template
+        # Along the displacement, plus sideways (perpendicular, to the left of travel)
+        offsets = np.outer(progress, (dx, dy)) + np.outer(lateral, (-dy, dx))
+        return offsets, progress, dx, dy
+
+    def stats(self):
+        return {"templates": len(self._templates), "cached_paths": len(self._paths),
+                "hits": self.hits, "misses": self.misses}
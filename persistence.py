@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Write-behind persistence.
+#
+# The UI thread only calls request_save(). A worker thread waits until changes
+# stop arriving for `delay` seconds (or `max_delay` has passed since the first
+# unsaved change) and then writes once, so a burst of edits costs one write.
+
+
+def atomic_write(path, data):
+    # Write to a temp file next to the target and rename over it, so a crash
+    # leaves either the old file or the new one, never a partial write.
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+class PersistenceWorker:
+    # write_fn() does the actual write and returns False if it had nothing to do.
+    # on_result(written, seconds, error) is called from the worker thread.
+
+    def __init__(self, write_fn, delay=0.25, max_delay=2.0, on_result=None):
+        self.write_fn = write_fn
+        self.delay = delay
+        self.max_delay = max(delay, max_delay)
+        self.on_result = on_result
+
+        self._cond = threading.Condition()
+        self._dirty_since = None
+        self._last_request = None
+        self._stopped = False
+        self._write_lock = threading.Lock()  # serialises worker writes and flush()
+        self._thread = None
+
+        self.writes = 0
+        self.skipped = 0
+        self.failures = 0
+        self.last_error = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="PersistenceWorker", daemon=True)
+        self._thread.start()
+
+    def request_save(self):
+        now = time.monotonic()
+        with self._cond:
+            if self._dirty_since is None:
+                self._dirty_since = now
+            self._last_request = now
+            self._cond.notify()
+
+    def flush(self):
+        # Synchronous write of anything pending, used at shutdown
+        with self._cond:
+            pending = self._dirty_since is not None
+            self._dirty_since = None
+        if pending:
+            self._write()
+
+    def stop(self, flush=True):
+        if flush:
+            self.flush()
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(1.0)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._dirty_since is None and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                # Coalesce: wait for a quiet period, bounded by max_delay
+                while self._dirty_since is not None and not self._stopped:
+                    now = time.monotonic()
+                    due = min(self._last_request + self.delay, self._dirty_since + self.max_delay)
+                    if now >= due:
+                        break
+                    self._cond.wait(due - now)
+                if self._dirty_since is None or self._stopped:
+                    continue
+                self._dirty_since = None
+            self._write()
+
+    def _write(self):
+        with self._write_lock:
+            start = time.perf_counter()
+            error = None
+            written = False
+            try:
+                written = self.write_fn()
+            except Exception as e:
+                error = e
+            elapsed = time.perf_counter() - start
+
+            if error is not None:
+                self.failures += 1
+                self.last_error = error
+            elif written:
+                self.writes += 1
+            else:
+                self.skipped += 1
+
+        if self.on_result:
+            try:
+                self.on_result(written, elapsed, error)
+            except Exception as e:
+                # A broken callback must not kill the save thread
+                print(f"Save result callback failed: {e}")
+
+
+class ProfileFile:
+    # profiles.json on disk. save() skips the write when the content is unchanged.
+
+    def __init__(self, path='profiles.json'):
+        self.path = path
+        self._last_digest = None
+
+    def load(self):
+        # Returns (profiles dict or None, warning message or None)
+        if not os.path.exists(self.path):
+            return None, None
+        try:
+            with open(self.path, 'rb') as file:
+                raw = file.read()
+            profiles = json.loads(raw)
+            if not isinstance(profiles, dict):
+                raise ValueError("top level is not an object")
+        except (OSError, ValueError) as e:
+            # Keep the unreadable copy instead of silently overwriting it later
+            backup = f"{self.path}.corrupt-{time.strftime('%Y%m%d-%H%M%S')}"
+            try:
+                os.replace(self.path, backup)
+            except OSError:
+                backup = None
+            message = f"Could not read {self.path} ({e})"
+            if backup:
+                message += f", saved a copy as {backup}"
+            return None, message
+        self._last_digest = hashlib.sha1(raw).digest()
+        return profiles, None
+
+    def save(self, profiles):
+        data = json.dumps(profiles, indent=4).encode('utf-8')
+        digest = hashlib.sha1(data).digest()
+        if digest == self._last_digest:
+            return False
+        atomic_write(self.path, data)
+        self._last_digest = digest
+        return True
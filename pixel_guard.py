@@ -0,0 +1,100 @@
+import re
+
+# Pixel guards: a bind only fires while the screen looks as expected.
+#
+#   {"coords": [640, 400], "type": "Click & Return",
+#    "guards": [{"x": 20, "y": 30, "color": "#1e90ff", "tolerance": 12}]}
+#
+# Every guard of a bind has to match: each colour channel of the pixel at
+# (x, y) within tolerance of the given colour. The screen is read by
+# screen_sampler.py; this module only parses and formats guards, so the
+# editor can use it without numpy.
+
+DEFAULT_TOLERANCE = 8
+
+_COLOR_RE = re.compile(r'^#?([0-9a-fA-F]{6})$')
+
+
+class GuardError(ValueError):
+    pass
+
+
+def parse_color(value):
+    # "#rrggbb" or [r, g, b] -> (r, g, b)
+    if isinstance(value, str):
+        match = _COLOR_RE.match(value.strip())
+        if not match:
+            raise GuardError(f"bad colour {value!r}, expected #RRGGBB")
+        number = int(match.group(1), 16)
+        return (number >> 16) & 0xFF, (number >> 8) & 0xFF, number & 0xFF
+    if isinstance(value, (list, tuple)) and len(value) == 3 and all(isinstance(c, int) and 0 <= c <= 255 for c in value):
+        return tuple(value)
+    raise GuardError(f"bad colour {value!r}")
+
+
+def compile_guard(guard):
+    # Bind data guard -> (x, y, (r, g, b), tolerance)
+    if not isinstance(guard, dict):
+        raise GuardError(f"bad guard {guard!r}")
+    try:
+        x = int(guard['x'])
+        y = int(guard['y'])
+        tolerance = int(guard.get('tolerance', DEFAULT_TOLERANCE))
+    except (KeyError, TypeError, ValueError):
+        raise GuardError(f"guard needs integer x and y: {guard!r}")
+    # x and y may be negative: monitors left of or above the primary one
+    if not 0 <= tolerance <= 255:
+        raise GuardError(f"guard tolerance out of range (0-255): {guard!r}")
+    return x, y, parse_color(guard.get('color')), tolerance
+
+
+def compile_profile_guards(binds):
+    # Returns ({bind key: [compiled guard, ...]}, [error messages]). A bind
+    # with a broken guard is kept with no guards at all and never fires.
+    guards = {}
+    errors = []
+    for key, bind_data in binds.items():
+        if not isinstance(bind_data, dict) or not bind_data.get('guards'):
+            continue
+        try:
+            if not isinstance(bind_data['guards'], list):
+                raise GuardError("guards must be a list")
+            guards[key] = [compile_guard(guard) for guard in bind_data['guards']]
+        except GuardError as e:
+            guards[key] = []
+            errors.append(f"Guard '{key}': {e}")
+    return guards, errors
+
+
+def parse_guard_text(text):
+    # Editor format, guards separated by ";": "X Y #RRGGBB [TOLERANCE]"
+    guards = []
+    for number, part in enumerate(text.split(';'), 1):
+        fields = part.split()
+        if not fields:
+            continue
+        if len(fields) not in (3, 4):
+            raise GuardError(f"guard {number}: expected X Y #RRGGBB [TOLERANCE]")
+        try:
+            guard = {"x": int(fields[0]), "y": int(fields[1]), "color": fields[2]}
+            if len(fields) == 4:
+                guard["tolerance"] = int(fields[3])
+        except ValueError:
+            raise GuardError(f"guard {number}: X, Y and TOLERANCE must be whole numbers")
+        compile_guard(guard)
+        guards.append(guard)
+    return guards
+
+
+def format_guards(guards):
+    parts = []
+    for guard in guards or []:
+        try:
+            x, y, (r, g, b), tolerance = compile_guard(guard)
+        except GuardError:
+            continue
+        text = f"{x} {y} #{r:02x}{g:02x}{b:02x}"
+        if 'tolerance' in guard:
+            text += f" {tolerance}"
+        parts.append(text)
+    return "; ".join(parts)
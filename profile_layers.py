@@ -0,0 +1,94 @@
+# Profile stacks: a profile can be layered on top of other profiles, so
+# shared binds (global utility keys) live in one profile and are edited in
+# one place.
+#
+#   "Shooter": {"keybinds": {...}, "layers": ["Global", "FPS"]}
+#
+# Layers are listed bottom to top. On the same key a higher layer overrides
+# a lower one, and the profile's own binds override all of its layers.
+# Layers may have layers of their own; a profile reached twice is used once,
+# at its highest position, and cycles and missing profiles are reported.
+#
+# The engine merges the stack into one bind table whenever the active
+# profile or any profile in its stack changes, so key presses never walk
+# the layers.
+
+
+class LayerError(ValueError):
+    pass
+
+
+def get_layers(profile):
+    layers = profile.get('layers') if isinstance(profile, dict) else None
+    if not isinstance(layers, list):
+        return []
+    return [name for name in layers if isinstance(name, str)]
+
+
+def resolve_stack(profiles, name, errors=None, overrides=None):
+    # Profile names bottom to top, ending with name itself. overrides maps
+    # profile names to layer lists to use instead of the stored ones.
+    stack = []
+    visiting = []
+
+    def visit(current):
+        if current in visiting:
+            if errors is not None:
+                errors.append(f"Profile '{visiting[-1]}': layer cycle through '{current}'")
+            return
+        if current not in profiles:
+            if errors is not None:
+                errors.append(f"Profile '{visiting[-1]}': no layer profile '{current}'")
+            return
+        visiting.append(current)
+        if overrides and current in overrides:
+            layers = overrides[current]
+        else:
+            layers = get_layers(profiles[current])
+        for layer in layers:
+            visit(layer)
+        visiting.pop()
+        if current in stack:
+            stack.remove(current)  # Keep the highest position
+        stack.append(current)
+
+    if name in profiles:
+        visit(name)
+    return stack
+
+
+def merge_stack(profiles, stack):
+    # -> (effective binds, {key: profile it comes from})
+    binds = {}
+    sources = {}
+    for name in stack:
+        for key, bind_data in profiles[name]['keybinds'].items():
+            binds[key] = bind_data
+            sources[key] = name
+    return binds, sources
+
+
+def rename_layer(profiles, old_name, new_name):
+    # {profile: new layer list} for every profile that listed old_name
+    changes = {}
+    for name in profiles:
+        layers = get_layers(profiles[name])
+        if old_name in layers:
+            changes[name] = [new_name if layer == old_name else layer for layer in layers]
+    return changes
+
+
+def parse_layer_text(text, profiles, name):
+    # Editor format: layer names separated by commas, bottom first
+    layers = [part.strip() for part in text.split(',') if part.strip()]
+    for layer in layers:
+        if layer not in profiles:
+            raise LayerError(f"No profile named '{layer}'")
+        if layer == name:
+            raise LayerError("A profile cannot be its own layer")
+    errors = []
+    resolve_stack(profiles, name, errors, {name: layers})
+    for error in errors:
+        if "cycle" in error:
+            raise LayerError("Those layers would include this profile again")
+    return layers
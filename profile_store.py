@@ -0,0 +1,386 @@
+import json
+import os
+import threading
+import time
+from persistence import atomic_write, ProfileFile
+
+# Journaled profile storage.
+#
+#   <dir>/index.json    which data file is current, the journal sequence number
+#                       it already contains, profile order and per-profile
+#                       (offset, length) into the data file
+#   <dir>/data-N.bin    every profile's JSON, back to back
+#   <dir>/journal.log   one JSON line per change made since the data file was written
+#
+# Only the active profile is decoded at startup; others are decoded the first
+# time they are accessed. Edits append a journal line (O(change)), and the
+# journal is folded back into a new data file by compact() once it grows past
+# a threshold. Every journal entry carries a sequence number, so replaying a
+# journal that was already compacted (e.g. after a crash mid-compaction) is
+# harmless.
+
+INDEX_FILE = 'index.json'
+JOURNAL_FILE = 'journal.log'
+STORE_VERSION = 1
+
+OP_ADD_PROFILE = "add_profile"
+OP_REMOVE_PROFILE = "remove_profile"
+OP_RENAME_PROFILE = "rename_profile"
+OP_SET_BIND = "set_bind"
+OP_DELETE_BIND = "delete_bind"
+OP_CLEAR_BINDS = "clear_binds"
+OP_SET_PROFILE_FIELD = "set_field"
+
+
+def _encode(data):
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+
+def _apply_to_profile(profile, op):
+    # Ops that only touch one profile's contents
+    kind = op['op']
+    if kind == OP_SET_BIND:
+        profile['keybinds'][op['key']] = op['value']
+    elif kind == OP_DELETE_BIND:
+        profile['keybinds'].pop(op['key'], None)
+    elif kind == OP_CLEAR_BINDS:
+        profile['keybinds'].clear()
+    elif kind == OP_SET_PROFILE_FIELD:
+        profile[op['field']] = op['value']
+
+
+class ProfileStore:
+    def __init__(self, directory='profiles.store', legacy_path='profiles.json', compact_threshold=256 * 1024):
+        self.directory = directory
+        self.legacy_path = legacy_path
+        self.compact_threshold = compact_threshold
+        self.on_change = None  # called after every mutation, e.g. to schedule flush()
+
+        self._lock = threading.RLock()
+        self._order = []
+        self._loaded = {}       # name -> decoded profile
+        self._offsets = {}      # name -> (offset, length) in the current data file
+        self._pending_ops = {}  # name -> journal ops not yet applied to an undecoded profile
+        self._unsaved = []      # journal entries not yet on disk
+        self._data_file = None
+        self._generation = 0
+        self._seq = 0
+        self._compacted_seq = 0
+        self._journal_bytes = 0
+
+        self.loads = 0
+        self.compactions = 0
+        self.journal_writes = 0
+        self.last_compaction_ms = 0.0
+        self.warnings = []
+
+    # --- Opening / migration ---
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def open(self):
+        # Returns a list of warnings for the status bar (empty if all went well)
+        self.warnings = []
+        index_path = self._path(INDEX_FILE)
+        if not os.path.exists(index_path):
+            self._migrate()
+            return self.warnings
+        try:
+            with open(index_path, 'r') as file:
+                index = json.load(file)
+            data_file = index['data']
+            generation = index['generation']
+            seq = index['journal_seq']
+            order = list(index['order'])
+            offsets = {name: tuple(span) for name, span in index['profiles'].items()}
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            # Set the whole store aside rather than writing over its files
+            backup = f"{self.directory}.corrupt-{time.strftime('%Y%m%d-%H%M%S')}"
+            os.replace(self.directory, backup)
+            self.warnings.append(f"Profile store unreadable ({e}), moved to {backup}")
+            self._migrate()
+            return self.warnings
+        self._data_file = data_file
+        self._generation = generation
+        self._compacted_seq = self._seq = seq
+        self._order = order
+        self._offsets = offsets
+        self._replay_journal()
+        return self.warnings
+
+    def _migrate(self):
+        # One-time import of the flat profiles.json used by older versions
+        profiles, warning = ProfileFile(self.legacy_path).load()
+        if warning:
+            self.warnings.append(warning)
+        os.makedirs(self.directory, exist_ok=True)
+        self._loaded = {}
+        for name, profile in (profiles or {}).items():
+            if not isinstance(profile, dict):
+                continue
+            if not isinstance(profile.get('keybinds'), dict):
+                profile['keybinds'] = {}
+            self._loaded[name] = profile
+        self._order = list(self._loaded)
+        self.compact()
+        if profiles is not None:
+            migrated = self.legacy_path + '.migrated'
+            try:
+                os.replace(self.legacy_path, migrated)
+                self.warnings.append(f"Imported {self.legacy_path} (original kept as {migrated})")
+            except OSError:
+                pass
+
+    def _replay_journal(self):
+        path = self._path(JOURNAL_FILE)
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb') as file:
+            lines = file.readlines()
+        self._journal_bytes = sum(len(line) for line in lines)
+        for number, line in enumerate(lines):
+            try:
+                op = json.loads(line)
+            except ValueError:
+                # A torn final line from a crash mid-append is expected; anything else is not
+                if number != len(lines) - 1:
+                    self.warnings.append(f"Skipped unreadable journal entry {number + 1}")
+                continue
+            if op.get('seq', 0) <= self._compacted_seq:
+                continue
+            self._seq = max(self._seq, op['seq'])
+            self._apply(op)
+
+    # --- Read access (mapping-like, decodes lazily) ---
+
+    def __contains__(self, name):
+        return name in self._loaded or name in self._offsets
+
+    def __iter__(self):
+        return iter(list(self._order))
+
+    def __len__(self):
+        return len(self._order)
+
+    def keys(self):
+        return list(self._order)
+
+    def is_loaded(self, name):
+        return name in self._loaded
+
+    def __getitem__(self, name):
+        profile = self._loaded.get(name)
+        if profile is not None:
+            return profile
+        with self._lock:
+            if name in self._loaded:
+                return self._loaded[name]
+            if name not in self._offsets:
+                raise KeyError(name)
+            return self._load(name)
+
+    def _load(self, name, data_file=None):
+        profile = self._decode(name, data_file)
+        for op in self._pending_ops.pop(name, []):
+            _apply_to_profile(profile, op)
+        self._loaded[name] = profile
+        self.loads += 1
+        return profile
+
+    def _read_raw(self, data_file, span):
+        offset, length = span
+        with open(self._path(data_file), 'rb') as file:
+            file.seek(offset)
+            return file.read(length)
+
+    def _decode(self, name, data_file=None):
+        try:
+            profile = json.loads(self._read_raw(data_file or self._data_file, self._offsets[name]))
+        except (OSError, ValueError) as e:
+            self.warnings.append(f"Profile '{name}' could not be read ({e})")
+            profile = {}
+        if not isinstance(profile, dict):
+            profile = {}
+        if not isinstance(profile.get('keybinds'), dict):
+            profile['keybinds'] = {}
+        return profile
+
+    # --- Mutations (UI thread) ---
+
+    def add_profile(self, name, data=None):
+        self._record({'op': OP_ADD_PROFILE, 'profile': name, 'data': data or {'keybinds': {}}})
+
+    def remove_profile(self, name):
+        self._record({'op': OP_REMOVE_PROFILE, 'profile': name})
+
+    def rename_profile(self, name, new_name):
+        self._record({'op': OP_RENAME_PROFILE, 'profile': name, 'new_name': new_name})
+
+    def set_bind(self, profile, key, value):
+        self._record({'op': OP_SET_BIND, 'profile': profile, 'key': key, 'value': value})
+
+    def delete_bind(self, profile, key):
+        self._record({'op': OP_DELETE_BIND, 'profile': profile, 'key': key})
+
+    def clear_binds(self, profile):
+        self._record({'op': OP_CLEAR_BINDS, 'profile': profile})
+
+    def set_profile_field(self, profile, field, value):
+        self._record({'op': OP_SET_PROFILE_FIELD, 'profile': profile, 'field': field, 'value': value})
+
+    def _record(self, op):
+        with self._lock:
+            self._seq += 1
+            op['seq'] = self._seq
+            self._apply(op)
+            self._unsaved.append(op)
+        if self.on_change:
+            self.on_change()
+
+    def _apply(self, op):
+        kind = op['op']
+        name = op['profile']
+        if kind == OP_ADD_PROFILE:
+            if name not in self:
+                self._order.append(name)
+            self._offsets.pop(name, None)
+            self._pending_ops.pop(name, None)
+            self._loaded[name] = json.loads(json.dumps(op['data']))
+        elif kind == OP_REMOVE_PROFILE:
+            if name in self._order:
+                self._order.remove(name)
+            self._loaded.pop(name, None)
+            self._offsets.pop(name, None)
+            self._pending_ops.pop(name, None)
+        elif kind == OP_RENAME_PROFILE:
+            new_name = op['new_name']
+            if name not in self or new_name in self:
+                return
+            self._order[self._order.index(name)] = new_name
+            for table in (self._loaded, self._offsets, self._pending_ops):
+                if name in table:
+                    table[new_name] = table.pop(name)
+        elif name in self._loaded:
+            _apply_to_profile(self._loaded[name], op)
+        elif name in self._offsets:
+            self._pending_ops.setdefault(name, []).append(op)
+
+    # --- Persistence (persistence worker thread) ---
+
+    def flush(self):
+        # Appends unsaved journal entries. Returns False if there were none.
+        with self._lock:
+            entries, self._unsaved = self._unsaved, []
+        if not entries:
+            return False
+        data = b''.join(_encode(op) + b'\n' for op in entries)
+        try:
+            with open(self._path(JOURNAL_FILE), 'ab') as file:
+                file.write(data)
+                file.flush()
+                os.fsync(file.fileno())
+        except OSError:
+            with self._lock:
+                self._unsaved[:0] = entries  # retry on the next flush
+            raise
+        self._journal_bytes += len(data)
+        self.journal_writes += 1
+        return True
+
+    def needs_compaction(self):
+        return self._journal_bytes >= self.compact_threshold
+
+    def compact(self):
+        # Rewrites the data file with the journal folded in
+        start = time.perf_counter()
+        with self._lock:
+            seq = self._seq
+            order = list(self._order)
+            loaded = {name: dict(p, keybinds=dict(p['keybinds'])) for name, p in self._loaded.items()}
+            pending = {name: list(ops) for name, ops in self._pending_ops.items()}
+            snapshot_offsets = dict(self._offsets)
+            old_data_file = self._data_file
+
+        chunks = []
+        offsets = {}
+        position = 0
+        for name in order:
+            if name in loaded:
+                raw = _encode(loaded[name])
+            else:
+                raw = self._read_raw(old_data_file, snapshot_offsets[name])
+                if pending.get(name):
+                    profile = json.loads(raw)
+                    for op in pending[name]:
+                        _apply_to_profile(profile, op)
+                    raw = _encode(profile)
+            offsets[name] = (position, len(raw))
+            chunks.append(raw)
+            position += len(raw)
+
+        generation = self._generation + 1
+        data_file = f"data-{generation}.bin"
+        atomic_write(self._path(data_file), b''.join(chunks))
+        index = {
+            "version": STORE_VERSION,
+            "generation": generation,
+            "data": data_file,
+            "journal_seq": seq,
+            "order": order,
+            "profiles": offsets,
+        }
+        atomic_write(self._path(INDEX_FILE), json.dumps(index).encode('utf-8'))
+
+        # Keep only journal entries newer than what the data file now holds
+        journal_path = self._path(JOURNAL_FILE)
+        kept = []
+        if os.path.exists(journal_path):
+            with open(journal_path, 'rb') as file:
+                for line in file:
+                    try:
+                        if json.loads(line).get('seq', 0) > seq:
+                            kept.append(line)
+                    except ValueError:
+                        pass
+        atomic_write(journal_path, b''.join(kept))
+
+        with self._lock:
+            self._generation = generation
+            self._data_file = data_file
+            self._compacted_seq = seq
+            self._journal_bytes = sum(len(line) for line in kept)
+            for name, span in list(self._offsets.items()):
+                if name in offsets and snapshot_offsets.get(name) == span:
+                    self._offsets[name] = offsets[name]
+                    ops = [op for op in self._pending_ops.get(name, []) if op['seq'] > seq]
+                    if ops:
+                        self._pending_ops[name] = ops
+                    else:
+                        self._pending_ops.pop(name, None)
+                elif name not in self._loaded:
+                    # Renamed while compacting: decode from the old file before it goes
+                    self._load(name, old_data_file)
+                    del self._offsets[name]
+            for name, span in offsets.items():
+                if name in self._loaded and name not in self._offsets:
+                    self._offsets[name] = span
+
+        if old_data_file and old_data_file != data_file:
+            try:
+                os.remove(self._path(old_data_file))
+            except OSError:
+                pass
+        self.compactions += 1
+        self.last_compaction_ms = (time.perf_counter() - start) * 1000.0
+
+    def stats(self):
+        return {
+            "profiles": len(self._order),
+            "decoded": len(self._loaded),
+            "lazy_loads": self.loads,
+            "journal_kb": self._journal_bytes / 1024.0,
+            "journal_writes": self.journal_writes,
+            "compactions": self.compactions,
+            "last_compaction_ms": self.last_compaction_ms,
+        }
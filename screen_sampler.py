@@ -0,0 +1,124 @@
+import threading
+import time
+import numpy as np
+
+# Evaluates the pixel guards of the active profile (see pixel_guard.py).
+#
+# One grab covers the bounding box of every guard in the profile, and every
+# guard is checked against it at once; the per-bind results are kept with
+# the sample. Binds firing again within max_age_ms reuse them, so a burst of
+# key presses costs one grab. Runs on the executor thread.
+
+
+class GuardTable:
+    # All guards of a profile as arrays, grouped by bind
+
+    def __init__(self, bind_guards):
+        keys = [key for key, guards in bind_guards.items() if guards]
+        rows = [guard for key in keys for guard in bind_guards[key]]
+        self.index = {key: i for i, key in enumerate(keys)}
+        # Binds whose guards could not be compiled never pass
+        self.blocked = {key for key, guards in bind_guards.items() if not guards}
+        if not rows:
+            self.region = None
+            return
+        xs = np.array([row[0] for row in rows])
+        ys = np.array([row[1] for row in rows])
+        x0, y0 = int(xs.min()), int(ys.min())
+        self.region = (x0, y0, int(xs.max()) - x0 + 1, int(ys.max()) - y0 + 1)
+        # Positions inside the region's sample
+        self.xs = xs - x0
+        self.ys = ys - y0
+        self.colors = np.array([row[2] for row in rows], dtype=np.int16)
+        self.tolerances = np.array([row[3] for row in rows], dtype=np.int16)[:, None]
+        # Where each bind's guards start, for reduceat
+        self.starts = np.cumsum([0] + [len(bind_guards[key]) for key in keys[:-1]])
+
+    def __len__(self):
+        return len(self.colors) if self.region else 0
+
+    def evaluate(self, sample):
+        # One pass over every guard -> one bool per bind (in self.index order)
+        if sample.shape[0] < self.region[3] or sample.shape[1] < self.region[2]:
+            return np.zeros(len(self.index), dtype=bool)  # Region is (partly) off screen
+        pixels = sample[self.ys, self.xs].astype(np.int16)
+        matches = (np.abs(pixels - self.colors) <= self.tolerances).all(axis=1)
+        return np.logical_and.reduceat(matches, self.starts)
+
+
+class ScreenSampler:
+    def __init__(self, grabber, max_age_ms=50):
+        self.grabber = grabber
+        self.max_age_ns = int(max_age_ms * 1e6)
+        self._lock = threading.Lock()
+        self.table = None
+        self._results = None
+        self._sampled_at = 0
+
+        self.checks = 0
+        self.passed = 0
+        self.blocked = 0
+        self.grabs = 0
+        self.reused = 0
+        self.errors = 0
+        self.grab_ns = 0
+        self.eval_ns = 0
+
+    def set_guards(self, bind_guards):
+        # Called on profile changes; the arrays are built before the swap
+        table = GuardTable(bind_guards)
+        with self._lock:
+            self.table = table
+            self._results = None
+
+    def check(self, bind_key):
+        # True if every guard of bind_key matches the (recent) screen
+        with self._lock:
+            self.checks += 1
+            table = self.table
+            if table is None or bind_key in table.blocked:
+                self.blocked += 1
+                return False
+            position = table.index.get(bind_key)
+            if position is None:
+                self.passed += 1
+                return True
+            now = time.perf_counter_ns()
+            if self._results is None or now - self._sampled_at > self.max_age_ns:
+                try:
+                    sample = self.grabber.grab(table.region, color=True)
+                except Exception as e:
+                    self.errors += 1
+                    if self.errors == 1:
+                        print(f"Pixel guards: screen grab failed: {e}")
+                    self.blocked += 1
+                    return False
+                grabbed = time.perf_counter_ns()
+                self._results = table.evaluate(sample)
+                self._sampled_at = now
+                self.grabs += 1
+                self.grab_ns += grabbed - now
+                self.eval_ns += time.perf_counter_ns() - grabbed
+            else:
+                self.reused += 1
+            if self._results[position]:
+                self.passed += 1
+                return True
+            self.blocked += 1
+            return False
+
+    def stats(self):
+        table = self.table
+        region = table.region if table is not None else None
+        return {
+            "guards": len(table) if table is not None else 0,
+            "region": f"{region[2]}x{region[3]}" if region else "-",
+            "checks": self.checks,
+            "passed": self.passed,
+            "blocked": self.blocked,
+            "grabs": self.grabs,
+            "reused": self.reused,
+            "errors": self.errors,
+            "avg_grab_ms": (self.grab_ns / self.grabs / 1e6) if self.grabs else 0.0,
+            "avg_eval_us": (self.eval_ns / self.grabs / 1000.0) if self.grabs else 0.0,
+        }
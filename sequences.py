@@ -0,0 +1,224 @@
+import threading
+import time
+from bind_index import expand_combo
+from key_utils import is_sequence, split_sequence
+from triggers import compile_trigger, TRIGGER_DOUBLE_TAP
+
+# Key sequences ("G, 3", "Ctrl+K, Ctrl+C") and double taps.
+#
+# Every sequence of the active profile is compiled into a prefix trie keyed
+# by the same (modifier mask, tokens) lookups as the bind index; a double
+# tap of X is the sequence "X, X" with the bind's tap_ms as its step time.
+# The matcher keeps a pointer into the trie and moves it with one dict probe
+# per key press, however many sequences there are:
+#
+#   - a press that starts no sequence goes straight to the bind index, as
+#     before, so plain combos cost nothing extra
+#   - a press that continues the current sequence moves down; reaching a
+#     bind with nothing below it fires it
+#   - a bind that is also the start of longer sequences (plain "G" with
+#     "G, 3" defined) waits ambiguity_ms for the next step, then fires
+#   - a step timeout, or a key that does not continue the sequence, drops
+#     back to the root (firing a waiting bind first)
+#
+# Modifier-only presses (the Ctrl of Ctrl+C) never break a sequence.
+
+
+class SequenceNode:
+    __slots__ = ('children', 'match', 'timeout_ns')
+
+    def __init__(self):
+        self.children = {}
+        self.match = None  # bind index style entry ending here
+        self.timeout_ns = 0  # how long to wait for the next step
+
+
+def compile_sequence_trie(binds, compiled, step_timeout_ms, errors=None):
+    # Returns the root children {lookup: SequenceNode}; empty if there are no sequences
+    root = {}
+    for combo, bind_data in binds.items():
+        bind = compiled.get(combo)
+        if bind is None:
+            continue
+        trigger = compile_trigger(bind_data)
+        if is_sequence(combo):
+            steps = split_sequence(combo)
+            step_ns = int(step_timeout_ms * 1e6)
+        elif trigger.mode == TRIGGER_DOUBLE_TAP:
+            steps = [combo, combo]
+            step_ns = trigger.tap_ns
+        else:
+            continue
+        expanded = [expand_combo(step) for step in steps]
+        if any(lookups is None for lookups in expanded):
+            if errors is not None:
+                errors.append(f"Bind '{combo}': not a key sequence")
+            continue
+        level = [root]
+        for depth, lookups in enumerate(expanded):
+            # Generic modifiers expand to several lookups; they share one node
+            node = None
+            for children in level:
+                for lookup in lookups:
+                    node = node or children.get(lookup)
+            if node is None:
+                node = SequenceNode()
+            for children in level:
+                for lookup in lookups:
+                    children.setdefault(lookup, node)
+            if depth < len(expanded) - 1:
+                node.timeout_ns = max(node.timeout_ns, step_ns)
+            elif node.match is None:
+                node.match = (combo, bind, trigger)
+            else:
+                if errors is not None:
+                    errors.append(f"Bind '{combo}': same sequence as '{node.match[0]}'")
+            level = [node.children]
+    return root
+
+
+def trie_binds(root):
+    # Combo strings of every bind in the trie
+    combos = set()
+    stack = list(set(root.values()))
+    seen = set()
+    while stack:
+        node = stack.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        if node.match is not None:
+            combos.add(node.match[0])
+        stack.extend(node.children.values())
+    return combos
+
+
+class SequenceMatcher:
+    # Sits between the key listener and the trigger engine. press() and
+    # release() run on the listener thread, timeouts on the trigger engine's
+    # deadline timer thread.
+
+    def __init__(self, triggers, ambiguity_ms=300):
+        self.triggers = triggers
+        self.ambiguity_ns = int(ambiguity_ms * 1e6)
+        self.index = {}
+        self.trie = {}
+        self._lock = threading.Lock()
+        self._node = None  # current position; None = at the root
+        self._deadline = 0
+        self._pending = None  # (match, pressed at) waiting out the ambiguity time
+        self._pending_released = False
+        self._generation = 0
+
+        self.started = 0
+        self.completed = 0
+        self.timed_out = 0
+        self.broken = 0
+        self.ambiguous = 0
+
+    def set_tables(self, index, trie):
+        # Swapped in by the engine after a rebuild; any sequence in progress is dropped
+        with self._lock:
+            self.index = index
+            self.trie = trie
+            self._reset()
+
+    def _reset(self):
+        self._node = None
+        self._pending = None
+        self._generation += 1
+
+    def press(self, combo, fresh, now):
+        if self._node is None and (not fresh or not self.trie):
+            # Idle, or OS auto-repeat: the plain path
+            self.triggers.press(self.index.get(combo), fresh, now)
+            return
+        if not fresh:
+            return  # Auto-repeat in the middle of a sequence
+        actions = []  # (match, pressed at, released since) for the trigger engine, in order
+        with self._lock:
+            if self._node is not None and now > self._deadline:
+                self.timed_out += self._pending is None
+                self._flush(actions)
+            child = None
+            if self._node is not None:
+                child = self._node.children.get(combo)
+                if child is None:
+                    if not combo[1]:
+                        return  # A modifier on its way to the next step
+                    # Not part of the sequence: fire whatever waited, start over from the root
+                    self.broken += 1
+                    self._flush(actions)
+            if child is not None:
+                self._advance(child, child.match, now, actions)
+            else:
+                node = self.trie.get(combo)
+                plain = self.index.get(combo)
+                if node is None:
+                    actions.append((plain, now, False))
+                else:
+                    self.started += 1
+                    self._advance(node, plain, now, actions)
+        for match, pressed_at, released in actions:
+            self.triggers.press(match, True, pressed_at)
+            if released:
+                self.triggers.release(now)
+
+    def release(self, now):
+        if self._pending is not None:
+            with self._lock:
+                self._pending_released = True
+        self.triggers.release(now)
+
+    def _advance(self, node, match, now, actions):
+        # Lock held. Moves to node; match is the bind ending there, if any.
+        if not node.children:
+            self.completed += 1
+            self._reset()
+            actions.append((match, now, False))
+            return
+        # The chord changed: end any hold, release or repeat of the previous one
+        actions.append((None, now, False))
+        self._node = node
+        self._generation += 1
+        if match is not None:
+            # Could be this bind or the start of a longer sequence
+            self.ambiguous += 1
+            self._pending = (match, now)
+            self._pending_released = False
+            self._deadline = now + self.ambiguity_ns
+        else:
+            self._pending = None
+            self._deadline = now + node.timeout_ns
+        generation = self._generation
+        self.triggers.timer.set("sequence", self._deadline, lambda: self._timeout(generation))
+
+    def _flush(self, actions):
+        # Lock held. Back to the root, firing the bind that waited (if any).
+        if self._pending is not None:
+            match, pressed_at = self._pending
+            actions.append((match, pressed_at, self._pending_released))
+        self._reset()
+
+    def _timeout(self, generation):
+        # Deadline timer thread
+        actions = []
+        with self._lock:
+            if generation != self._generation or self._node is None:
+                return  # Moved on since this was scheduled
+            self.timed_out += self._pending is None
+            self._flush(actions)
+        now = time.perf_counter_ns()
+        for match, pressed_at, released in actions:
+            self.triggers.press(match, True, pressed_at)
+            if released:
+                self.triggers.release(now)
+
+    def stats(self):
+        return {
+            "started": self.started,
+            "completed": self.completed,
+            "timed_out": self.timed_out,
+            "broken": self.broken,
+            "ambiguous_waits": self.ambiguous,
+        }
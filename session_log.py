@@ -0,0 +1,377 @@
+import hashlib
+import json
+import queue
+import struct
+import sys
+import threading
+import time
+from array import array
+from pynput.keyboard import Key, KeyCode
+from latency import now_ns, percentile, wait_until
+
+# Input sessions: the keys the engine saw and the binds they fired, recorded
+# to a compact binary file and replayed through the dispatch path later, to
+# reproduce bugs and to benchmark dispatch changes on real traffic.
+#
+# File layout:
+#   MAGIC, uint32 header length, header JSON ({"version", "byteorder", ...})
+#   then chunks, each:
+#     b'C', uint32 string count, uint32 event count,
+#     new strings (uint32 length + UTF-8 each),
+#     kinds (uint8 each), time deltas (uint32 microseconds each),
+#     codes (uint32 each: index into the session's string table)
+#
+# Strings (key names, bind keys, bind table snapshots) are written once and
+# then referred to by index. Snapshots are only remembered by digest, so a
+# long session with many profile swaps does not keep every table in memory,
+# and one is only recorded when the binds actually changed. Times are perf_counter deltas from the previous
+# event, so a session is 9 bytes per event. Events are buffered in arrays of
+# chunk_events and handed to a writer thread; if the disk falls behind by
+# more than max_chunks, chunks are dropped (and counted) rather than held.
+
+MAGIC = b"AKBSESS1"
+SESSION_VERSION = 1
+
+EVENT_PRESS = 0
+EVENT_RELEASE = 1
+EVENT_FIRE = 2  # code: bind key
+EVENT_BINDS = 3  # code: JSON of the effective binds from here on
+
+MAX_DELTA_US = 0xFFFFFFFF
+REPLAY_SPIN_NS = 1000000
+
+_CHUNK = struct.Struct('<cII')
+_LENGTH = struct.Struct('<I')
+
+
+class SessionError(Exception):
+    pass
+
+
+def encode_key(key):
+    # pynput key -> string that decode_key turns back into an equal key
+    if isinstance(key, Key):
+        return "Key." + key.name
+    if isinstance(key, KeyCode):
+        if key.char is not None:
+            return "char:" + key.char
+        if key.vk is not None:
+            return f"vk:{key.vk}"
+    return "str:" + str(key)
+
+
+def decode_key(text):
+    if text.startswith("Key."):
+        try:
+            return Key[text[4:]]
+        except KeyError:
+            raise SessionError(f"unknown key {text!r}")
+    kind, _, value = text.partition(':')
+    if kind == "char":
+        return KeyCode.from_char(value)
+    if kind == "vk":
+        return KeyCode.from_vk(int(value))
+    raise SessionError(f"cannot replay key {text!r}")
+
+
+class SessionRecorder:
+    # key(), fired() and binds() are called from the listener, trigger and
+    # Tk threads; they only append to the current chunk.
+
+    def __init__(self, path, chunk_events=4096, max_chunks=8, info=None):
+        self.path = path
+        self.chunk_events = max(1, int(chunk_events))
+        self._file = open(path, 'wb')
+        header = dict(info or {}, version=SESSION_VERSION, byteorder=sys.byteorder, started=time.time())
+        data = json.dumps(header).encode('utf-8')
+        self._file.write(MAGIC + _LENGTH.pack(len(data)) + data)
+        self._lock = threading.Lock()
+        self._strings = {}  # key names and bind keys -> code
+        self._snapshot_codes = {}  # digest of a bind table snapshot -> code
+        self._last_snapshot = None
+        self._string_count = 0
+        self._new_strings = []
+        self._new_chunk()
+        self._last_us = now_ns() // 1000
+        self._queue = queue.Queue(max(1, int(max_chunks)))
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+        self.closed = False
+
+        self.events = 0
+        self.dropped = 0
+        self.bytes_written = self._file.tell()
+        self.write_errors = 0
+
+    def _new_chunk(self):
+        self._kinds = array('B')
+        self._deltas = array('I')
+        self._codes = array('I')
+
+    def _intern(self, text):
+        # Lock held: queue text for the file and return its new code
+        code = self._string_count
+        self._string_count += 1
+        self._new_strings.append(text)
+        return code
+
+    def _code(self, text):
+        # Lock held
+        code = self._strings.get(text)
+        if code is None:
+            code = self._strings[text] = self._intern(text)
+        return code
+
+    def _append(self, kind, code, t_ns):
+        # Lock held
+        t_us = (t_ns or now_ns()) // 1000
+        self._kinds.append(kind)
+        self._deltas.append(min(MAX_DELTA_US, max(0, t_us - self._last_us)))
+        self._codes.append(code)
+        self._last_us = max(self._last_us, t_us)
+        self.events += 1
+        if len(self._kinds) >= self.chunk_events:
+            self._hand_off()
+
+    def _add(self, kind, text, t_ns):
+        with self._lock:
+            if not self.closed:
+                self._append(kind, self._code(text), t_ns)
+
+    def key(self, pressed, key, t_ns=None):
+        self._add(EVENT_PRESS if pressed else EVENT_RELEASE, encode_key(key), t_ns)
+
+    def fired(self, bind_key, t_ns=None):
+        self._add(EVENT_FIRE, bind_key, t_ns)
+
+    def binds(self, binds):
+        # Called after every rebuild, so a replay uses the binds that were live.
+        # Rebuilds that left the binds as they were are not recorded; a table
+        # seen before (swapping back to a profile) reuses its string.
+        text = json.dumps(binds, sort_keys=True, separators=(',', ':'))
+        digest = hashlib.sha1(text.encode('utf-8')).digest()
+        with self._lock:
+            if self.closed or digest == self._last_snapshot:
+                return
+            self._last_snapshot = digest
+            code = self._snapshot_codes.get(digest)
+            if code is None:
+                code = self._snapshot_codes[digest] = self._intern(text)
+            self._append(EVENT_BINDS, code, None)
+
+    def _hand_off(self):
+        # Lock held: seal the current chunk and queue it for the writer
+        chunk = (self._new_strings, self._kinds, self._deltas, self._codes)
+        self._new_strings = []
+        self._new_chunk()
+        try:
+            self._queue.put_nowait(chunk)
+        except queue.Full:
+            # The strings still have to reach the file, the events are lost
+            self.dropped += len(chunk[1])
+            self._new_strings = chunk[0]
+
+    def _write_loop(self):
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                return
+            try:
+                self._write_chunk(*chunk)
+            except OSError as e:
+                self.write_errors += 1
+                if self.write_errors == 1:
+                    print(f"Session recording: write failed: {e}")
+
+    def _write_chunk(self, strings, kinds, deltas, codes):
+        parts = [_CHUNK.pack(b'C', len(strings), len(kinds))]
+        for text in strings:
+            data = text.encode('utf-8')
+            parts.append(_LENGTH.pack(len(data)))
+            parts.append(data)
+        parts += [kinds.tobytes(), deltas.tobytes(), codes.tobytes()]
+        data = b"".join(parts)
+        self._file.write(data)
+        self.bytes_written += len(data)
+
+    def close(self):
+        with self._lock:
+            if self.closed:
+                return
+            if len(self._kinds) or self._new_strings:
+                self._hand_off()
+            self.closed = True
+        self._queue.put(None)
+        self._writer.join()
+        self._file.close()
+
+    def stats(self):
+        return {
+            "events": self.events,
+            "dropped": self.dropped,
+            "bytes_written": self.bytes_written,
+            "write_errors": self.write_errors,
+        }
+
+
+def read_session(path):
+    # -> (header, iterator of (kind, t_ns since start, text)); reads chunk by chunk
+    file = open(path, 'rb')
+    try:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise SessionError(f"{path} is not a session recording")
+        (length,) = _LENGTH.unpack(file.read(_LENGTH.size))
+        header = json.loads(file.read(length).decode('utf-8'))
+    except (struct.error, ValueError) as e:
+        file.close()
+        raise SessionError(f"{path}: bad header: {e}")
+    except Exception:
+        file.close()
+        raise
+    if header.get('version') != SESSION_VERSION:
+        file.close()
+        raise SessionError(f"{path}: unsupported version {header.get('version')}")
+    return header, _read_events(file, header.get('byteorder') != sys.byteorder)
+
+
+def _read_events(file, swap):
+    strings = []
+    t_us = 0
+    with file:
+        while True:
+            head = file.read(_CHUNK.size)
+            if not head:
+                return
+            if len(head) < _CHUNK.size:
+                return  # Cut short (crash while recording); keep what was read
+            tag, string_count, event_count = _CHUNK.unpack(head)
+            if tag != b'C':
+                raise SessionError(f"bad chunk at offset {file.tell() - _CHUNK.size}")
+            for _ in range(string_count):
+                (length,) = _LENGTH.unpack(file.read(_LENGTH.size))
+                strings.append(file.read(length).decode('utf-8'))
+            kinds = array('B')
+            deltas = array('I')
+            codes = array('I')
+            try:
+                kinds.frombytes(file.read(event_count))
+                deltas.frombytes(file.read(event_count * deltas.itemsize))
+                codes.frombytes(file.read(event_count * codes.itemsize))
+            except ValueError:
+                return
+            if swap:
+                deltas.byteswap()
+                codes.byteswap()
+            for kind, delta, code in zip(kinds, deltas, codes):
+                t_us += delta
+                yield kind, t_us * 1000, strings[code]
+
+
+class _FireCollector:
+    # Stands in for the recorder while replaying: notes which binds fire
+    def __init__(self):
+        self.bind_keys = []
+
+    def key(self, pressed, key, t_ns=None):
+        pass
+
+    def fired(self, bind_key, t_ns=None):
+        self.bind_keys.append(bind_key)
+
+    def binds(self, binds):
+        pass
+
+    def close(self):
+        pass
+
+    def stats(self):
+        return {"replaying": True, "fired": len(self.bind_keys)}
+
+
+class SessionReplayer:
+    # Feeds a recording back into an engine's on_key_press/on_key_release.
+    # Meant for an offline engine (recording injection backend, no listener,
+    # synthetic_filter "off", see benchmarks/replay_session.py): each bind
+    # table snapshot in the recording replaces the engine's profiles.
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def run(self, path, realtime=False, settle_s=0.5):
+        # realtime: keep the recorded gaps (timers, repeats and sequences
+        # behave as they did); otherwise as fast as possible.
+        engine = self.engine
+        header, events = read_session(path)
+        collector = _FireCollector()
+        recorded = []
+        lateness = []
+        keys = {}  # text -> decoded key
+        replayed_keys = 0
+        previous = engine.session
+        engine.session = collector
+        started = now_ns()
+        last_t = 0
+        try:
+            for kind, t_ns, text in events:
+                last_t = t_ns
+                if kind == EVENT_FIRE:
+                    recorded.append(text)
+                    continue
+                if realtime:
+                    lateness.append(self._wait_until(started + t_ns))
+                if kind == EVENT_BINDS:
+                    engine.profiles = {"Replay": {"keybinds": json.loads(text)}}
+                    engine.active_profile = "Replay"
+                    engine.rebuild_bind_index()
+                    continue
+                key = keys.get(text)
+                if key is None:
+                    key = keys[text] = decode_key(text)
+                if kind == EVENT_PRESS:
+                    engine.on_key_press(key)
+                else:
+                    engine.on_key_release(key)
+                replayed_keys += 1
+            elapsed_ns = now_ns() - started
+            time.sleep(settle_s)  # Let pending timers (sequences, long presses) fire
+        finally:
+            engine.session = previous
+        return self._report(header, recorded, collector.bind_keys, replayed_keys, last_t, elapsed_ns, lateness, realtime)
+
+    def _wait_until(self, target_ns):
+        # Returns how late we are (ns)
+        wait_until(target_ns, REPLAY_SPIN_NS)
+        return now_ns() - target_ns
+
+    def _report(self, header, recorded, replayed, key_events, duration_ns, elapsed_ns, lateness, realtime):
+        report = {
+            "session": {k: header.get(k) for k in ("profile", "started") if k in header},
+            "mode": "realtime" if realtime else "fast",
+            "key_events": key_events,
+            "recorded_s": duration_ns / 1e9,
+            "replay_s": elapsed_ns / 1e9,
+            "events_per_sec": key_events / (elapsed_ns / 1e9) if elapsed_ns else 0.0,
+            "fired_recorded": len(recorded),
+            "fired_replayed": len(replayed),
+        }
+        if lateness:
+            lateness.sort()
+            report["lateness_ms"] = {"p50": percentile(lateness, 50) / 1e6, "p99": percentile(lateness, 99) / 1e6,
+                                     "max": lateness[-1] / 1e6}
+        first = next((i for i, (a, b) in enumerate(zip(recorded, replayed)) if a != b), None)
+        if first is None and len(recorded) != len(replayed):
+            first = min(len(recorded), len(replayed))
+        report["diverged"] = first is not None
+        if first is not None:
+            report["first_divergence"] = {
+                "index": first,
+                "recorded": recorded[first] if first < len(recorded) else None,
+                "replayed": replayed[first] if first < len(replayed) else None,
+            }
+            counts = {}
+            for key in recorded:
+                counts[key] = counts.get(key, 0) - 1
+            for key in replayed:
+                counts[key] = counts.get(key, 0) + 1
+            report["count_differences"] = {key: diff for key, diff in sorted(counts.items()) if diff}
+        return report
@@ -0,0 +1,69 @@
+import os
+import json
+
+SETTINGS_FILE = 'settings.json'
+
+# Tunables that are not tied to a profile. Missing keys in settings.json fall
+# back to these, so the file only needs to list what the user changed.
+DEFAULT_SETTINGS = {
+    # Action executor: "queue", "drop_if_busy", "coalesce" or "preempt"
+    "executor_policy": "coalesce",
+    "executor_queue_size": 16,
+    # Input injection: "pynput", "pyautogui" or "recording" (no-op, for tests)
+    "injection_backend": "pynput",
+    # Per action type step delays in seconds, e.g. {"Drag & Return": 0.05}
+    "action_delays": {},
+    # Number of dispatch latency samples kept for the stats window
+    "latency_buffer_size": 4096,
+    # Quiet period before profile changes are written to disk
+    "save_delay_ms": 250,
+    # Journaled profile store; the journal is compacted once it exceeds this size
+    "profile_store_dir": "profiles.store",
+    "compact_threshold_kb": 256,
+    # Macros sleep until this close to each step, then spin for accuracy
+    "macro_spin_us": 1500,
+    # Location capture gives up if no click arrives within this many seconds (0 = wait forever)
+    "capture_timeout_s": 30,
+    # Ignoring our own injected input: "auto", "flags" (Windows), "ledger" or "off"
+    "synthetic_filter": "auto",
+    # Ledger only: how long an injected event is expected back before it is forgotten
+    "synthetic_ttl_ms": 500,
+    # Path of the local control socket (see control.py); empty = no socket
+    "control_socket": "",
+    # Automatic profile switching, e.g. [{"class": "steam_app_.*", "profile": "Game"}]
+    "window_rules": [],
+    # Foreground window lookup: "auto", "x11" (needs python-xlib), "win32" or "fake"
+    "window_provider": "auto",
+    "window_poll_ms": 250,
+    # Find Image & Click: default match score (0-1) and coarse search downscale factor
+    "image_threshold": 0.9,
+    "image_coarse_scale": 4,
+    # Key sequences ("G, 3"): longest wait between steps, and how long a bind
+    # that also starts a longer sequence waits for the next step before firing
+    "sequence_timeout_ms": 1000,
+    "sequence_ambiguity_ms": 300,
+    # How often the window applies updates posted by other threads
+    "ui_tick_ms": 33,
+    # CPU profiles and memory snapshots from the tray menu go into a
+    # timestamped folder here; the profiler samples every thread this often
+    "diagnostics_dir": "diagnostics",
+    "profiler_interval_ms": 5,
+    # Record every session's keys and fired binds into this folder for
+    # benchmarks/replay_session.py ("" = off), in chunks of this many events
+    "session_record_dir": "",
+    "session_chunk_events": 4096,
+    # Pixel guards reuse a screen sample taken within this many milliseconds
+    "guard_max_age_ms": 50,
+}
+
+def load_settings(path=SETTINGS_FILE):
+    settings = dict(DEFAULT_SETTINGS)
+    if os.path.exists(path):
+        try:
+            with open(path, 'r') as file:
+                user_settings = json.load(file)
+            if isinstance(user_settings, dict):
+                settings.update(user_settings)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Failed to load settings: {e}")
+    return settings
@@ -0,0 +1,46 @@
+import threading
+import time
+
+# Per-phase startup timing for --profile-startup.
+#
+# mark() is called as each phase ends. Phases that finish in the background
+# (the tray) are registered with defer() and the breakdown is printed once all
+# of them are done.
+
+
+class StartupTimer:
+    def __init__(self, start=None):
+        self.start = start if start is not None else time.perf_counter()
+        self._last = self.start
+        self._lock = threading.Lock()
+        self.phases = []  # (name, seconds since previous mark, seconds since start)
+        self._deferred = set()
+
+    def mark(self, name):
+        now = time.perf_counter()
+        with self._lock:
+            self.phases.append((name, now - self._last, now - self.start))
+            self._last = now
+
+    def mark_since(self, name, since):
+        # For background phases, which overlap the ones on the main thread
+        now = time.perf_counter()
+        with self._lock:
+            self.phases.append((name, now - since, now - self.start))
+
+    def defer(self, name):
+        with self._lock:
+            self._deferred.add(name)
+
+    def done(self, name):
+        with self._lock:
+            self._deferred.discard(name)
+            finished = not self._deferred
+        if finished:
+            self.report()
+
+    def report(self):
+        print("Startup timing (ms):")
+        print(f"  {'phase':<28}{'took':>9}{'at':>9}")
+        for name, took, at in self.phases:
+            print(f"  {name:<28}{took * 1000:>9.1f}{at * 1000:>9.1f}")
@@ -0,0 +1,113 @@
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+from tkinter.ttk import Button, Label, Frame
+from latency import PERCENTILES
+
+REFRESH_MS = 1000
+
+
+class StatsWindow(tk.Toplevel):
+    # Latency histograms per bind and per action type, plus pipeline counters.
+    # counters_fn returns {section name: {counter: value}}.
+
+    def __init__(self, parent, recorder, counters_fn=None):
+        super().__init__(parent)
+        self.title("Dispatch Stats")
+        self.geometry("720x420")
+        self.recorder = recorder
+        self.counters_fn = counters_fn
+        self.auto_refresh = tk.BooleanVar(value=True)
+
+        list_frame = Frame(self, padding=10)
+        list_frame.pack(fill=tk.BOTH, expand=True)
+
+        columns = ("span", "count") + tuple(f"p{p}" for p in PERCENTILES) + ("max",)
+        self.tree = ttk.Treeview(list_frame, columns=columns, show="tree headings")
+        self.tree.heading("#0", text="Bind / Action")
+        self.tree.column("#0", width=200)
+        self.tree.heading("span", text="Span")
+        self.tree.column("span", width=90)
+        self.tree.heading("count", text="Count")
+        self.tree.column("count", width=60, anchor=tk.E)
+        for name in columns[2:]:
+            self.tree.heading(name, text=f"{name} (ms)")
+            self.tree.column(name, width=80, anchor=tk.E)
+
+        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscroll=scrollbar.set)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.counters_var = tk.StringVar()
+        Label(self, textvariable=self.counters_var, foreground="#666", justify=tk.LEFT, padding=(10, 0)).pack(fill=tk.X)
+
+        btn_frame = Frame(self, padding=10)
+        btn_frame.pack(fill=tk.X)
+        Button(btn_frame, text="Export JSON", command=self.export_json).pack(side=tk.LEFT, padx=5)
+        Button(btn_frame, text="Export CSV", command=self.export_csv).pack(side=tk.LEFT, padx=5)
+        Button(btn_frame, text="Reset", command=self.reset).pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(btn_frame, text="Auto Refresh", variable=self.auto_refresh).pack(side=tk.LEFT, padx=5)
+        Button(btn_frame, text="Close", command=self.destroy).pack(side=tk.RIGHT)
+
+        self.refresh()
+        self._after_id = self.after(REFRESH_MS, self._tick)
+
+    def destroy(self):
+        self.after_cancel(self._after_id)
+        super().destroy()
+
+    def refresh(self):
+        summary = self.recorder.summary()
+        open_items = {item for item in self.tree.get_children() if self.tree.item(item, "open")}
+        self.tree.delete(*self.tree.get_children())
+
+        for group, title in (("by_action", "Action"), ("by_bind", "Bind")):
+            for name, spans in sorted(summary[group].items()):
+                parent_id = f"{group}:{name}"
+                total = spans["total"]
+                self.tree.insert("", tk.END, iid=parent_id, text=f"{title}: {name}",
+                                 values=self._row("total", total), open=parent_id in open_items)
+                for span, stats in spans.items():
+                    if span != "total":
+                        self.tree.insert(parent_id, tk.END, text="", values=self._row(span, stats))
+
+        lines = [f"Samples: {summary['samples']} in buffer, {summary['recorded']} recorded"]
+        if self.counters_fn:
+            for section, counters in self.counters_fn().items():
+                values = ", ".join(f"{k}={_format(v)}" for k, v in counters.items())
+                lines.append(f"{section}: {values}")
+        self.counters_var.set("\n".join(lines))
+
+    def _tick(self):
+        if self.auto_refresh.get():
+            self.refresh()
+        self._after_id = self.after(REFRESH_MS, self._tick)
+
+    def _row(self, span, stats):
+        return (span, stats["count"]) + tuple(f"{stats[f'p{p}_ms']:.3f}" for p in PERCENTILES) + (f"{stats['max_ms']:.3f}",)
+
+    def reset(self):
+        self.recorder.clear()
+        self.refresh()
+
+    def export_json(self):
+        path = filedialog.asksaveasfilename(parent=self, defaultextension=".json", filetypes=[("JSON", "*.json")])
+        if path:
+            self._export(self.recorder.export_json, path)
+
+    def export_csv(self):
+        path = filedialog.asksaveasfilename(parent=self, defaultextension=".csv", filetypes=[("CSV", "*.csv")])
+        if path:
+            self._export(self.recorder.export_csv, path)
+
+    def _export(self, export_fn, path):
+        try:
+            export_fn(path)
+        except OSError as e:
+            messagebox.showerror("Export Failed", str(e), parent=self)
+
+
+def _format(value):
+    if isinstance(value, float):
+        return f"{value:.3f}"
+    return str(value)
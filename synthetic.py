@@ -0,0 +1,191 @@
+import sys
+import threading
+import time
+from collections import deque
+from key_utils import MODIFIER_NAMES, get_injection_name
+
+# Keeps our own injected input out of our own listeners.
+#
+# Every click or key the backend injects comes straight back through the
+# pynput hooks. Two ways to recognise it:
+#   flags   Windows marks injected events (LLKHF_INJECTED / LLMHF_INJECTED);
+#           a win32_event_filter drops them before pynput calls us at all.
+#   ledger  The backend is wrapped so it notes every event it is about to
+#           emit; the listener consumes a matching note and ignores the event.
+#           Notes expire after ttl_ms so a lost event cannot hide a real one.
+# "auto" picks flags on Windows and the ledger elsewhere.
+
+FILTER_AUTO = "auto"
+FILTER_FLAGS = "flags"
+FILTER_LEDGER = "ledger"
+FILTER_OFF = "off"
+
+SYNTHETIC_FILTERS = [
+    FILTER_AUTO,
+    FILTER_FLAGS,
+    FILTER_LEDGER,
+    FILTER_OFF
+]
+
+LLKHF_INJECTED = 0x10
+LLMHF_INJECTED = 0x01
+
+
+def _event_key_name(name):
+    # Sides are not reliable for injected modifiers, "shift_l" may come back as "shift"
+    if name in MODIFIER_NAMES:
+        return name.split('_')[0]
+    return name
+
+
+class EventLedger:
+    def __init__(self, ttl_ns):
+        self.ttl_ns = ttl_ns
+        self._lock = threading.Lock()
+        self._pending = {}  # event -> deque of expiry times
+        self.expected = 0
+        self.consumed = 0
+        self.expired = 0
+
+    def expect(self, event, count=1):
+        now = time.perf_counter_ns()
+        expires = now + self.ttl_ns
+        with self._lock:
+            queue = self._pending.get(event)
+            if queue is None:
+                queue = self._pending[event] = deque()
+            # Clicks only come back while a capture hooks the mouse, so the
+            # queue is pruned here as well as on consume
+            while queue and queue[0] < now:
+                queue.popleft()
+                self.expired += 1
+            queue.extend([expires] * count)
+            self.expected += count
+
+    def consume(self, event):
+        # Returns True if event is one we injected
+        if not self._pending:
+            return False
+        with self._lock:
+            queue = self._pending.get(event)
+            if not queue:
+                return False
+            now = time.perf_counter_ns()
+            while queue and queue[0] < now:
+                queue.popleft()
+                self.expired += 1
+            if not queue:
+                del self._pending[event]
+                return False
+            queue.popleft()
+            if not queue:
+                del self._pending[event]
+            self.consumed += 1
+            return True
+
+    def pending(self):
+        with self._lock:
+            return sum(len(queue) for queue in self._pending.values())
+
+
+class TrackedBackend:
+    # Wraps an injection backend and notes what each call will emit
+
+    def __init__(self, inner, ledger):
+        self.inner = inner
+        self.ledger = ledger
+        self.name = inner.name
+
+    def position(self):
+        return self.inner.position()
+
+    def move(self, x, y):
+        # No move listener, so nothing to expect
+        self.inner.move(x, y)
+
+    def mouse_down(self):
+        self.ledger.expect(("button", True))
+        self.inner.mouse_down()
+
+    def mouse_up(self):
+        self.ledger.expect(("button", False))
+        self.inner.mouse_up()
+
+    def click(self, x, y, count=1):
+        self.ledger.expect(("button", True), count)
+        self.ledger.expect(("button", False), count)
+        self.inner.click(x, y, count)
+
+    def key_down(self, key):
+        self.ledger.expect(("key", _event_key_name(key), True))
+        self.inner.key_down(key)
+
+    def key_up(self, key):
+        self.ledger.expect(("key", _event_key_name(key), False))
+        self.inner.key_up(key)
+
+
+class SyntheticFilter:
+    def __init__(self, mode=FILTER_AUTO, ttl_ms=500):
+        if mode not in SYNTHETIC_FILTERS:
+            print(f"Unknown synthetic_filter '{mode}', using '{FILTER_AUTO}'")
+            mode = FILTER_AUTO
+        if mode == FILTER_AUTO:
+            mode = FILTER_FLAGS if sys.platform == 'win32' else FILTER_LEDGER
+        self.mode = mode
+        self.ledger = EventLedger(int(ttl_ms * 1e6)) if mode == FILTER_LEDGER else None
+        self.keys_filtered = 0
+        self.clicks_filtered = 0
+
+    def wrap(self, backend):
+        if self.ledger is None:
+            return backend
+        return TrackedBackend(backend, self.ledger)
+
+    def listener_kwargs(self, kind):
+        # Extra pynput Listener arguments for a "keyboard" or "mouse" listener
+        if self.mode != FILTER_FLAGS:
+            return {}
+        if kind == "keyboard":
+            return {"win32_event_filter": self._win32_key_filter}
+        return {"win32_event_filter": self._win32_mouse_filter}
+
+    # Returning False stops pynput from calling the listener callbacks
+    def _win32_key_filter(self, msg, data):
+        if data.flags & LLKHF_INJECTED:
+            self.keys_filtered += 1
+            return False
+        return True
+
+    def _win32_mouse_filter(self, msg, data):
+        if data.flags & LLMHF_INJECTED:
+            self.clicks_filtered += 1
+            return False
+        return True
+
+    def is_own_key(self, key, pressed):
+        if self.ledger is None:
+            return False
+        name = get_injection_name(key)
+        if name is None or not self.ledger.consume(("key", _event_key_name(name), pressed)):
+            return False
+        self.keys_filtered += 1
+        return True
+
+    def is_own_click(self, pressed):
+        if self.ledger is None or not self.ledger.consume(("button", pressed)):
+            return False
+        self.clicks_filtered += 1
+        return True
+
+    def stats(self):
+        stats = {
+            "mode": self.mode,
+            "keys_filtered": self.keys_filtered,
+            "clicks_filtered": self.clicks_filtered,
+        }
+        if self.ledger is not None:
+            stats["expected"] = self.ledger.expected
+            stats["expired"] = self.ledger.expired
+            stats["pending"] = self.ledger.pending()
+        return stats
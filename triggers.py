@@ -0,0 +1,284 @@
+import threading
+import time
+
+# When a matched bind actually fires.
+#
+#   press    once per physical press; OS auto-repeat presses are ignored
+#   release  when the chord is released
+#   repeat   on press, then at repeat_hz from our own scheduler until released
+#   double_tap  on the second press within tap_ms (matched as a two-step
+#            sequence, see sequences.py)
+#   long_press  once the chord has been held for hold_ms
+#
+# Every bind can also have a minimum interval between fires and a debounce
+# window that ignores presses arriving too soon after the previous one.
+
+TRIGGER_PRESS = "press"
+TRIGGER_RELEASE = "release"
+TRIGGER_REPEAT = "repeat"
+TRIGGER_DOUBLE_TAP = "double_tap"
+TRIGGER_LONG_PRESS = "long_press"
+
+TRIGGER_MODES = [
+    TRIGGER_PRESS,
+    TRIGGER_RELEASE,
+    TRIGGER_REPEAT,
+    TRIGGER_DOUBLE_TAP,
+    TRIGGER_LONG_PRESS
+]
+
+DEFAULT_REPEAT_HZ = 10.0
+DEFAULT_TAP_MS = 300
+DEFAULT_HOLD_MS = 500
+
+
+class BindTrigger:
+    __slots__ = ('mode', 'repeat_interval_ns', 'min_interval_ns', 'debounce_ns', 'tap_ns', 'hold_ns',
+                 'last_press', 'last_fire')
+
+    def __init__(self, mode=TRIGGER_PRESS, repeat_hz=DEFAULT_REPEAT_HZ, min_interval_ms=0, debounce_ms=0,
+                 tap_ms=DEFAULT_TAP_MS, hold_ms=DEFAULT_HOLD_MS):
+        self.mode = mode if mode in TRIGGER_MODES else TRIGGER_PRESS
+        self.repeat_interval_ns = int(1e9 / max(0.1, float(repeat_hz)))
+        self.min_interval_ns = int(max(0.0, float(min_interval_ms)) * 1e6)
+        self.debounce_ns = int(max(0.0, float(debounce_ms)) * 1e6)
+        self.tap_ns = int(max(1.0, float(tap_ms)) * 1e6)
+        self.hold_ns = int(max(1.0, float(hold_ms)) * 1e6)
+        self.last_press = None
+        self.last_fire = None
+
+
+def compile_trigger(bind_data):
+    # Each bind gets its own instance, it carries the press/fire timestamps
+    if not isinstance(bind_data, dict):
+        return BindTrigger()
+    try:
+        return BindTrigger(bind_data.get('trigger', TRIGGER_PRESS),
+                           bind_data.get('repeat_hz', DEFAULT_REPEAT_HZ),
+                           bind_data.get('min_interval_ms', 0),
+                           bind_data.get('debounce_ms', 0),
+                           bind_data.get('tap_ms', DEFAULT_TAP_MS),
+                           bind_data.get('hold_ms', DEFAULT_HOLD_MS))
+    except (TypeError, ValueError):
+        return BindTrigger()
+
+
+class RepeatScheduler:
+    # Re-fires the one bind currently held in repeat mode at its own rate
+
+    def __init__(self, fire):
+        self.fire = fire
+        self._cond = threading.Condition()
+        self._match = None
+        self._next_due = 0
+        self._stopped = False
+        self._thread = None
+
+    def start_thread(self):
+        self._thread = threading.Thread(target=self._run, name="RepeatScheduler", daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        with self._cond:
+            self._stopped = True
+            self._match = None
+            self._cond.notify()
+
+    def start(self, match, now):
+        with self._cond:
+            self._match = match
+            self._next_due = now + match[2].repeat_interval_ns
+            self._cond.notify()
+
+    def stop(self):
+        if self._match is None:
+            return
+        with self._cond:
+            self._match = None
+            self._cond.notify()
+
+    def _run(self):
+        clock = time.perf_counter_ns
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    if self._match is None:
+                        self._cond.wait()
+                        continue
+                    remaining = self._next_due - clock()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining / 1e9)
+                if self._stopped:
+                    return
+                match = self._match
+                now = clock()
+                # Skip missed ticks instead of bursting to catch up
+                interval = match[2].repeat_interval_ns
+                self._next_due += interval * max(1, (now - self._next_due) // interval + 1)
+            self.fire(match, now, True)
+
+
+class DeadlineTimer:
+    # Calls fn() on its own thread once a deadline passes. One pending call
+    # per name; setting a name again replaces it.
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._deadlines = {}  # name -> (due ns, fn)
+        self._stopped = False
+        self._thread = None
+
+    def start_thread(self):
+        self._thread = threading.Thread(target=self._run, name="DeadlineTimer", daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        with self._cond:
+            self._stopped = True
+            self._deadlines.clear()
+            self._cond.notify()
+
+    def set(self, name, due, fn):
+        with self._cond:
+            self._deadlines[name] = (due, fn)
+            self._cond.notify()
+
+    def cancel(self, name):
+        if name not in self._deadlines:
+            return
+        with self._cond:
+            self._deadlines.pop(name, None)
+
+    def _run(self):
+        clock = time.perf_counter_ns
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    if not self._deadlines:
+                        self._cond.wait()
+                        continue
+                    name = min(self._deadlines, key=lambda n: self._deadlines[n][0])
+                    remaining = self._deadlines[name][0] - clock()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining / 1e9)
+                if self._stopped:
+                    return
+                fn = self._deadlines.pop(name)[1]
+            fn()
+
+
+class TriggerEngine:
+    # Listener-thread state machine. Matches are the bind index entries:
+    # (combo string, CompiledBind, BindTrigger). fire(match, now, repeated) runs the bind.
+    # press() and release() may also come from the deadline timer thread
+    # (sequences resolved late), hence the lock.
+
+    def __init__(self, fire):
+        self._fire = fire
+        self._lock = threading.Lock()
+        self.repeater = RepeatScheduler(self._fire_limited)
+        self.timer = DeadlineTimer()
+        self.armed = None  # release-mode match waiting for its chord to be released
+        self.holding = None  # long-press match waiting for its hold time
+
+        self.fired = 0
+        self.os_repeats_suppressed = 0
+        self.debounced = 0
+        self.rate_limited = 0
+        self.release_fires = 0
+        self.repeat_fires = 0
+        self.long_press_fires = 0
+        self.long_press_cancelled = 0
+
+    def start(self):
+        self.repeater.start_thread()
+        self.timer.start_thread()
+
+    def stop(self):
+        self.repeater.shutdown()
+        self.timer.shutdown()
+
+    def press(self, match, fresh, now):
+        # Called for every key press; match is None if the held keys bind nothing
+        if not fresh:
+            if match is not None:
+                self.os_repeats_suppressed += 1
+            return
+        with self._lock:
+            self._press(match, now)
+
+    def _press(self, match, now):
+        # The held chord changed, so any hold or pending release is over
+        self.armed = None
+        self.repeater.stop()
+        self._cancel_hold()
+        if match is None:
+            return
+
+        trigger = match[2]
+        if trigger.debounce_ns and trigger.last_press is not None and now - trigger.last_press < trigger.debounce_ns:
+            trigger.last_press = now
+            self.debounced += 1
+            return
+        trigger.last_press = now
+
+        if trigger.mode == TRIGGER_RELEASE:
+            self.armed = match
+            return
+        if trigger.mode == TRIGGER_LONG_PRESS:
+            self.holding = match
+            self.timer.set("long_press", now + trigger.hold_ns, self._hold_elapsed)
+            return
+        self._fire_limited(match, now, False)
+        if trigger.mode == TRIGGER_REPEAT:
+            self.repeater.start(match, now)
+
+    def release(self, now):
+        self.repeater.stop()
+        if self.armed is None and self.holding is None:
+            return
+        with self._lock:
+            self._cancel_hold()
+            if self.armed is not None:
+                match, self.armed = self.armed, None
+                if self._fire_limited(match, now, False):
+                    self.release_fires += 1
+
+    def _cancel_hold(self):
+        if self.holding is not None:
+            self.holding = None
+            self.timer.cancel("long_press")
+            self.long_press_cancelled += 1
+
+    def _hold_elapsed(self):
+        # Timer thread: the long-press chord is still down
+        with self._lock:
+            match, self.holding = self.holding, None
+            if match is not None and self._fire_limited(match, time.perf_counter_ns(), False):
+                self.long_press_fires += 1
+
+    def _fire_limited(self, match, now, repeated):
+        trigger = match[2]
+        if trigger.min_interval_ns and trigger.last_fire is not None and now - trigger.last_fire < trigger.min_interval_ns:
+            self.rate_limited += 1
+            return False
+        trigger.last_fire = now
+        self.fired += 1
+        if repeated:
+            self.repeat_fires += 1
+        self._fire(match, now, repeated)
+        return True
+
+    def stats(self):
+        return {
+            "fired": self.fired,
+            "os_repeats_suppressed": self.os_repeats_suppressed,
+            "debounced": self.debounced,
+            "rate_limited": self.rate_limited,
+            "release_fires": self.release_fires,
+            "repeat_fires": self.repeat_fires,
+            "long_press_fires": self.long_press_fires,
+            "long_press_cancelled": self.long_press_cancelled,
+        }
@@ -0,0 +1,97 @@
+import collections
+
+# The one way other threads reach the window.
+#
+# Listener, capture, tray, save and control threads post here instead of
+# calling root.after() themselves: posting is a deque append, never touches
+# Tk and never blocks. The Tk main loop drains the queue every tick_ms.
+#
+#   post(name, fn, *args)  only the latest post under a name runs per tick
+#                          (status text, labels, profile switches)
+#   call(fn, *args)        runs once, in order (capture results, menu items)
+#
+# A burst of input therefore costs one widget update per tick instead of
+# one Tk event per key.
+
+
+class UIEventBus:
+    def __init__(self, root, tick_ms=33):
+        self.root = root
+        self.tick_ms = max(1, int(tick_ms))
+        self._queue = collections.deque()
+        self._after_id = None
+        self._stopped = True
+
+        self.posted = 0
+        self.coalesced = 0
+        self.ran = 0
+        self.batches = 0
+        self.max_batch = 0
+        self.errors = 0
+
+    def post(self, name, fn, *args):
+        # Any thread. Replaces an earlier post under name that has not run yet.
+        self.posted += 1
+        self._queue.append((name, fn, args))
+
+    def call(self, fn, *args):
+        self.posted += 1
+        self._queue.append((None, fn, args))
+
+    def start(self):
+        self._stopped = False
+        if self._after_id is None:
+            self._after_id = self.root.after(self.tick_ms, self._tick)
+
+    def stop(self):
+        # Also safe from inside a drained callback (tray Exit): no next tick
+        self._stopped = True
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _tick(self):
+        self._after_id = None
+        # drain() contains callback errors; whatever still gets out (SystemExit
+        # from on_close) propagates without scheduling another tick on a root
+        # that may be gone
+        self.drain()
+        if not self._stopped:
+            self._after_id = self.root.after(self.tick_ms, self._tick)
+
+    def drain(self):
+        # Tk thread: runs what was queued before this call
+        queue = self._queue
+        count = len(queue)
+        if not count:
+            return
+        batch = [queue.popleft() for _ in range(count)]
+        self.batches += 1
+        self.max_batch = max(self.max_batch, count)
+        # Named posts run at the position of their last occurrence
+        last = {}
+        for i, (name, _, _) in enumerate(batch):
+            if name is not None:
+                last[name] = i
+        for i, (name, fn, args) in enumerate(batch):
+            if name is not None and last[name] != i:
+                self.coalesced += 1
+                continue
+            self.ran += 1
+            try:
+                fn(*args)
+            except Exception as e:
+                self.errors += 1
+                print(f"UI update failed: {e}")
+
+    def stats(self):
+        return {
+            "tick_ms": self.tick_ms,
+            "posted": self.posted,
+            "ran": self.ran,
+            "batches": self.batches,
+            "coalesced": self.coalesced,
+            "pending": len(self._queue),
+            "max_batch": self.max_batch,
+            "errors": self.errors,
+        }
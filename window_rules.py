@@ -0,0 +1,276 @@
+import re
+import sys
+import threading
+import time
+
+# Automatic profile switching by foreground window.
+#
+# Rules come from "window_rules" in settings.json, first match wins:
+#   [{"class": "steam_app_.*", "profile": "Game"},
+#    {"title": "- Visual Studio Code$", "profile": "Editor"}]
+# Patterns are case-insensitive regular expressions searched in the window
+# class and/or title; a rule needs at least one of them.
+#
+# A background thread polls the foreground window every window_poll_ms and
+# only looks at the rules when the window (or its title) changed, so nothing
+# here runs on the keyboard listener thread.
+
+
+class WindowRuleError(ValueError):
+    pass
+
+
+# --- Providers ---
+
+class WindowProvider:
+    name = None
+
+    def active_window(self):
+        # Returns (handle, window class, title), or None if there is no foreground window
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class X11WindowProvider(WindowProvider):
+    # Needs python-xlib; reads _NET_ACTIVE_WINDOW from the root window
+    name = "x11"
+
+    def __init__(self):
+        from Xlib import X, display, error
+        self.X = X
+        self.errors = (error.XError, error.ConnectionClosedError)
+        self.display = display.Display()
+        self.root = self.display.screen().root
+        self.active_atom = self.display.intern_atom('_NET_ACTIVE_WINDOW')
+        self.name_atom = self.display.intern_atom('_NET_WM_NAME')
+        self.utf8_atom = self.display.intern_atom('UTF8_STRING')
+
+    def active_window(self):
+        try:
+            prop = self.root.get_full_property(self.active_atom, self.X.AnyPropertyType)
+            if not prop or not len(prop.value) or not prop.value[0]:
+                return None
+            handle = prop.value[0]
+            window = self.display.create_resource_object('window', handle)
+            wm_class = window.get_wm_class()
+            name = window.get_full_property(self.name_atom, self.utf8_atom)
+            if name is not None:
+                title = name.value.decode('utf-8', 'replace') if isinstance(name.value, bytes) else str(name.value)
+            else:
+                title = window.get_wm_name() or ""
+        except self.errors:
+            return None  # The window went away between the two requests
+        return handle, wm_class[1] if wm_class else "", title
+
+    def close(self):
+        self.display.close()
+
+
+class Win32WindowProvider(WindowProvider):
+    name = "win32"
+
+    def __init__(self):
+        import ctypes
+        self.ctypes = ctypes
+        self.user32 = ctypes.windll.user32
+        self.class_buffer = ctypes.create_unicode_buffer(256)
+
+    def active_window(self):
+        user32 = self.user32
+        handle = user32.GetForegroundWindow()
+        if not handle:
+            return None
+        user32.GetClassNameW(handle, self.class_buffer, 256)
+        length = user32.GetWindowTextLengthW(handle)
+        title = self.ctypes.create_unicode_buffer(length + 1)
+        user32.GetWindowTextW(handle, title, length + 1)
+        return handle, self.class_buffer.value, title.value
+
+
+class FakeWindowProvider(WindowProvider):
+    # For tests: whatever was last passed to set_window() is in the foreground
+    name = "fake"
+
+    def __init__(self):
+        self.window = None
+        self.calls = 0
+
+    def set_window(self, handle, wm_class, title):
+        self.window = (handle, wm_class, title)
+
+    def active_window(self):
+        self.calls += 1
+        return self.window
+
+
+WINDOW_PROVIDERS = {
+    X11WindowProvider.name: X11WindowProvider,
+    Win32WindowProvider.name: Win32WindowProvider,
+    FakeWindowProvider.name: FakeWindowProvider,
+}
+
+
+def create_window_provider(name="auto"):
+    # Returns a provider, or None if foreground detection is unavailable here
+    if name == "auto":
+        if sys.platform == 'win32':
+            name = Win32WindowProvider.name
+        elif sys.platform.startswith('linux'):
+            name = X11WindowProvider.name
+        else:
+            print("Window rules: no foreground window provider for this platform")
+            return None
+    if name not in WINDOW_PROVIDERS:
+        print(f"Unknown window provider '{name}'")
+        return None
+    try:
+        return WINDOW_PROVIDERS[name]()
+    except Exception as e:
+        print(f"Window rules disabled, {name} provider failed: {e}")
+        return None
+
+
+# --- Rules ---
+
+class WindowMatcher:
+    # All rules compiled once; results cached per (class, title)
+
+    MAX_CACHE = 256
+
+    def __init__(self, rules):
+        self.rules = []  # (class regex or None, title regex or None, profile)
+        for number, rule in enumerate(rules or [], 1):
+            if not isinstance(rule, dict) or not isinstance(rule.get('profile'), str):
+                raise WindowRuleError(f"window rule {number}: needs a profile")
+            patterns = []
+            for field in ('class', 'title'):
+                pattern = rule.get(field)
+                try:
+                    patterns.append(re.compile(pattern, re.IGNORECASE) if pattern else None)
+                except (re.error, TypeError) as e:
+                    raise WindowRuleError(f"window rule {number}: bad {field} pattern: {e}")
+            if patterns == [None, None]:
+                raise WindowRuleError(f"window rule {number}: needs a class or title pattern")
+            self.rules.append((patterns[0], patterns[1], rule['profile']))
+        self._cache = {}
+        self.cache_hits = 0
+
+    def __len__(self):
+        return len(self.rules)
+
+    def match(self, wm_class, title):
+        # Returns the profile of the first matching rule, or None
+        key = (wm_class, title)
+        if key in self._cache:
+            self.cache_hits += 1
+            return self._cache[key]
+        profile = None
+        for class_re, title_re, rule_profile in self.rules:
+            if class_re is not None and not class_re.search(wm_class):
+                continue
+            if title_re is not None and not title_re.search(title):
+                continue
+            profile = rule_profile
+            break
+        if len(self._cache) >= self.MAX_CACHE:
+            self._cache.clear()
+        self._cache[key] = profile
+        return profile
+
+
+class WindowWatcher:
+    # on_match(profile) is called from the watcher thread when the foreground
+    # window changes to one a rule maps to a different profile than last time.
+
+    def __init__(self, provider, matcher, on_match, interval=0.25):
+        self.provider = provider
+        self.matcher = matcher
+        self.on_match = on_match
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_window = None
+        self._last_profile = None
+
+        self.polls = 0
+        self.changes = 0
+        self.switches = 0
+        self.errors = 0
+        self.lookup_ns = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="WindowWatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(1.0)
+        self.provider.close()
+
+    def poll(self):
+        # One lookup; also called directly by tests
+        start = time.perf_counter_ns()
+        self.polls += 1
+        try:
+            window = self.provider.active_window()
+        except Exception as e:
+            self.errors += 1
+            if self.errors == 1:
+                print(f"Window rules: lookup failed: {e}")
+            return
+        finally:
+            self.lookup_ns += time.perf_counter_ns() - start
+        if window == self._last_window:
+            return
+        self._last_window = window
+        self.changes += 1
+        if window is None:
+            return
+        profile = self.matcher.match(window[1], window[2])
+        # Only act when the rule outcome changes, so a manual switch sticks
+        # until another matching window comes to the front
+        if profile == self._last_profile:
+            return
+        self._last_profile = profile
+        if profile is None:
+            return
+        self.switches += 1
+        self.on_match(profile)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.poll()
+
+    def stats(self):
+        return {
+            "provider": self.provider.name,
+            "rules": len(self.matcher),
+            "polls": self.polls,
+            "window_changes": self.changes,
+            "switches": self.switches,
+            "cache_hits": self.matcher.cache_hits,
+            "errors": self.errors,
+            "avg_lookup_us": (self.lookup_ns / self.polls / 1000.0) if self.polls else 0.0,
+        }
+
+
+def start_window_watcher(settings, on_match, provider=None):
+    # Returns a running watcher, or None if there are no rules or no provider
+    rules = settings['window_rules']
+    if not rules:
+        return None
+    try:
+        matcher = WindowMatcher(rules)
+    except WindowRuleError as e:
+        print(f"Window rules disabled: {e}")
+        return None
+    if provider is None:
+        provider = create_window_provider(settings['window_provider'])
+        if provider is None:
+            return None
+    watcher = WindowWatcher(provider, matcher, on_match, settings['window_poll_ms'] / 1000.0)
+    watcher.start()
+    return watcher